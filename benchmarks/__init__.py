@@ -0,0 +1,7 @@
+"""
+Microbenchmarks.
+
+These are not collected by `pytest`.  Run them from the project root, e.g.:
+
+    python -m benchmarks.bench_container
+"""
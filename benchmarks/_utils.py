@@ -0,0 +1,32 @@
+# stdlib
+import timeit
+from typing import Callable
+
+# ==============================================================================
+
+
+class BenchRequest(object):
+    """
+    A minimal stand-in for a Pyramid ``Request``; the benchmarks only need the
+    parts of the API that SQLAssist touches.
+    """
+
+    def __init__(self):
+        self.finished_callbacks = []
+
+    def add_finished_callback(self, callback: Callable) -> None:
+        self.finished_callbacks.append(callback)
+
+
+def report(label: str, func: Callable, number: int = 10000, repeat: int = 5) -> float:
+    """
+    Runs ``func`` via ``timeit`` and prints the best per-call time.
+
+    :param label: string. Printed alongside the timing.
+    :param func: callable. The function to time.
+    :param number: int. Calls per timing run.
+    :param repeat: int. Number of timing runs; the fastest is reported.
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print("%-60s %10.3f usec" % (label, best * 1000000))
+    return best
@@ -0,0 +1,110 @@
+"""
+Compares serializing the columns of many instances:
+
+* the previous ``columns_as_dict``/``loaded_columns_as_dict``, which iterated
+  ``sa_class_mapper(cls).persist_selectable.c`` on every call (reproduced here)
+* the current per-instance methods, which use the class's cached column names
+* ``columns_as_bulk``, in each of its shapes
+
+    python -m benchmarks.bench_columns
+"""
+
+# stdlib
+import datetime
+from typing import Optional
+
+# pypi
+import sqlalchemy
+from sqlalchemy.orm import class_mapper as sa_class_mapper
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+# local
+import pyramid_sqlassist
+from ._utils import report
+
+# ==============================================================================
+
+ROWS = 1000
+
+
+class BenchColumns(pyramid_sqlassist.DeclaredTable, pyramid_sqlassist.UtilityObject):
+    __tablename__ = "bench_columns"
+
+    id: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    id_alt: Mapped[int] = mapped_column(sqlalchemy.Integer, nullable=False)
+    timestamp: Mapped[datetime.datetime] = mapped_column(
+        sqlalchemy.DateTime, nullable=False
+    )
+    status: Mapped[Optional[str]] = mapped_column(sqlalchemy.Unicode, nullable=True)
+    status_alt: Mapped[Optional[str]] = mapped_column(sqlalchemy.Unicode, nullable=True)
+
+
+def legacy_columns_as_dict(obj):
+    return dict(
+        (col.name, getattr(obj, col.name))
+        for col in sa_class_mapper(obj.__class__).persist_selectable.c
+    )
+
+
+def legacy_loaded_columns_as_dict(obj):
+    _dict = obj.__dict__
+    return {
+        col.name: _dict[col.name]
+        for col in sa_class_mapper(obj.__class__).persist_selectable.c
+        if col.name in _dict
+    }
+
+
+def main():
+    engine = sqlalchemy.create_engine("sqlite://")
+    BenchColumns.metadata.create_all(engine, tables=[BenchColumns.__table__])
+    sessionmaker = sqlalchemy.orm.sessionmaker(bind=engine)
+    with sessionmaker() as dbSession:
+        _utcnow = datetime.datetime.utcnow()
+        for i in range(ROWS):
+            dbSession.add(
+                BenchColumns(
+                    id=i,
+                    id_alt=i,
+                    timestamp=_utcnow,
+                    status="status %s" % i,
+                    status_alt="STATUS %s" % i,
+                )
+            )
+        dbSession.commit()
+    dbSession = sessionmaker()
+    rows = BenchColumns.get__range(dbSession)
+
+    number = 20
+    report(
+        "%s rows: legacy columns_as_dict" % ROWS,
+        lambda: [legacy_columns_as_dict(r) for r in rows],
+        number,
+    )
+    report(
+        "%s rows: columns_as_dict" % ROWS,
+        lambda: [r.columns_as_dict() for r in rows],
+        number,
+    )
+    report(
+        "%s rows: legacy loaded_columns_as_dict" % ROWS,
+        lambda: [legacy_loaded_columns_as_dict(r) for r in rows],
+        number,
+    )
+    report(
+        "%s rows: loaded_columns_as_dict" % ROWS,
+        lambda: [r.loaded_columns_as_dict() for r in rows],
+        number,
+    )
+    for shape in ("dicts", "tuples", "columns"):
+        report(
+            "%s rows: columns_as_bulk(shape=%s)" % (ROWS, shape),
+            lambda shape=shape: BenchColumns.columns_as_bulk(rows, shape=shape),
+            number,
+        )
+    dbSession.close()
+
+
+if __name__ == "__main__":
+    main()
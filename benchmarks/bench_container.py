@@ -0,0 +1,71 @@
+"""
+Compares the cost of first access to an engine's session on a
+``DbSessionsContainer``:
+
+* the stock path, which resolves the ``EngineWrapper`` from the registry via
+  ``_get_initialized_session`` (``getattr`` + ``get_wrapped_engine``)
+* the accessors generated by ``generate_container_class``, which are bound
+  directly to each ``EngineWrapper``
+
+    python -m benchmarks.bench_container
+"""
+
+# pypi
+import sqlalchemy
+
+# local
+import pyramid_sqlassist
+from ._utils import BenchRequest
+from ._utils import report
+
+# ==============================================================================
+
+ENGINE_NAMES = ["engine_%s" % i for i in range(9)]
+
+
+def main():
+    for engine_name in ENGINE_NAMES:
+        pyramid_sqlassist.initialize_engine(
+            engine_name,
+            sqlalchemy.create_engine("sqlite://"),
+            is_scoped=False,
+            is_configure_mappers=False,
+        )
+    GeneratedContainer = pyramid_sqlassist.generate_container_class()
+    StockContainer = pyramid_sqlassist.DbSessionsContainer
+
+    request = BenchRequest()
+
+    # registry resolution only; this is the overhead the generated accessors remove
+    def lookup_stock():
+        for engine_name in ENGINE_NAMES:
+            pyramid_sqlassist.get_wrapped_engine(engine_name)
+
+    accessors = [GeneratedContainer.__dict__[i] for i in ENGINE_NAMES]
+
+    def lookup_generated():
+        for accessor in accessors:
+            accessor.wrapped_engine
+
+    # first access to every engine on a fresh container
+    def access_stock():
+        dbSession = StockContainer(request)
+        for engine_name in ENGINE_NAMES:
+            dbSession._get_initialized_session(engine_name)
+        del request.finished_callbacks[:]
+
+    def access_generated():
+        dbSession = GeneratedContainer(request)
+        for engine_name in ENGINE_NAMES:
+            getattr(dbSession, engine_name)
+        del request.finished_callbacks[:]
+
+    print("%s engines per iteration" % len(ENGINE_NAMES))
+    report("lookup: get_wrapped_engine()", lookup_stock)
+    report("lookup: generated accessor", lookup_generated)
+    report("first access: _get_initialized_session()", access_stock, number=2000)
+    report("first access: generated accessor", access_generated, number=2000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares ``UtilityObject.get__by__column__exact_then_ilike`` with two
+statements (the default) and with one (``single_query="ilike"`` and
+``single_query="lower"``), on a SQLite database file with indexes on
+``username`` and ``lower(username)``, for an exact match, a case-insensitive
+match, and a miss.
+
+The number of statements (round trips) per call is printed with each timing.
+
+    python -m benchmarks.bench_exact_then_ilike
+"""
+
+# stdlib
+import os
+import tempfile
+
+# pypi
+import sqlalchemy
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+# local
+import pyramid_sqlassist
+from ._utils import report
+
+# ==============================================================================
+
+ROWS = 10000
+
+
+class BenchUser(pyramid_sqlassist.DeclaredTable, pyramid_sqlassist.UtilityObject):
+    __tablename__ = "bench_user"
+
+    id: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    username: Mapped[str] = mapped_column(
+        sqlalchemy.Unicode, nullable=False, index=True
+    )
+
+    __table_args__ = (
+        sqlalchemy.Index(
+            "ix_bench_user_username_lower", sqlalchemy.func.lower(username)
+        ),
+    )
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = sqlalchemy.create_engine(
+            "sqlite:///%s" % os.path.join(tmpdir, "bench.db")
+        )
+        BenchUser.metadata.create_all(engine, tables=[BenchUser.__table__])
+        with engine.begin() as conn:
+            conn.execute(
+                sqlalchemy.insert(BenchUser),
+                [{"id": i, "username": "User%s" % i} for i in range(ROWS)],
+            )
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sqlalchemy.event.listen(engine, "before_cursor_execute", _count)
+        sessionmaker = sqlalchemy.orm.sessionmaker(bind=engine)
+        dbSession = sessionmaker()
+
+        for label, seed in (
+            ("exact match", "User5000"),
+            ("case-insensitive match", "user5000"),
+            ("miss", "nobody"),
+        ):
+            for single_query in (None, "ilike", "lower"):
+
+                def _lookup(seed=seed, single_query=single_query):
+                    BenchUser.get__by__column__exact_then_ilike(
+                        dbSession, "username", seed, single_query=single_query
+                    )
+
+                del statements[:]
+                _lookup()
+                report(
+                    "%s, single_query=%s: %s statement(s)"
+                    % (label, single_query, len(statements)),
+                    _lookup,
+                    number=200,
+                )
+        dbSession.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares repeated ``UtilityObject.get__by__id`` lookups within one Session
+(one request), against the previous ``Query.filter_by().first()`` approach:
+
+* the primary key, which now uses ``Session.get()`` and is served from the
+  Session's identity map after the first lookup
+* another column, which now uses a cached ``select()`` with a bound parameter
+
+    python -m benchmarks.bench_get_by_id
+"""
+
+# stdlib
+import datetime
+
+# pypi
+import sqlalchemy
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+# local
+import pyramid_sqlassist
+from ._utils import report
+
+# ==============================================================================
+
+ROWS = 100
+
+
+class BenchObject(pyramid_sqlassist.DeclaredTable, pyramid_sqlassist.UtilityObject):
+    __tablename__ = "bench_object"
+
+    id: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    id_alt: Mapped[int] = mapped_column(sqlalchemy.Integer, nullable=False)
+    timestamp: Mapped[datetime.datetime] = mapped_column(
+        sqlalchemy.DateTime, nullable=False
+    )
+
+
+def main():
+    engine = sqlalchemy.create_engine("sqlite://")
+    BenchObject.metadata.create_all(engine, tables=[BenchObject.__table__])
+    sessionmaker = sqlalchemy.orm.sessionmaker(bind=engine)
+    with sessionmaker() as dbSession:
+        _utcnow = datetime.datetime.utcnow()
+        for i in range(1, ROWS + 1):
+            dbSession.add(BenchObject(id=i, id_alt=i + 1000, timestamp=_utcnow))
+        dbSession.commit()
+
+    dbSession = sessionmaker()
+    # keep the objects referenced, as a request would
+    loaded = [dbSession.get(BenchObject, i) for i in range(1, ROWS + 1)]
+    ids = list(range(1, ROWS + 1))
+    ids_alt = [i + 1000 for i in ids]
+
+    def legacy_pkey():
+        for i in ids:
+            dbSession.query(BenchObject).filter_by(id=i).first()
+
+    def current_pkey():
+        for i in ids:
+            BenchObject.get__by__id(dbSession, i)
+
+    def legacy_column():
+        for i in ids_alt:
+            dbSession.query(BenchObject).filter_by(id_alt=i).first()
+
+    def current_column():
+        for i in ids_alt:
+            BenchObject.get__by__id(dbSession, i, id_column="id_alt")
+
+    number = 100
+    report("%s pkey lookups: Query.filter_by().first()" % ROWS, legacy_pkey, number)
+    report("%s pkey lookups: get__by__id" % ROWS, current_pkey, number)
+    report("%s column lookups: Query.filter_by().first()" % ROWS, legacy_column, number)
+    report("%s column lookups: get__by__id" % ROWS, current_column, number)
+    dbSession.close()
+    del loaded
+
+
+if __name__ == "__main__":
+    main()
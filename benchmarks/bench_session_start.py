@@ -0,0 +1,83 @@
+"""
+Compares the cost of starting a scoped session on a ``DbSessionsContainer``
+under each ``session_start_policy``:
+
+* ``rollback``, the historical behavior, which always calls ``Session.rollback()``
+* ``none``, which does not reset the Session
+* ``verify``, which only calls ``Session.rollback()`` on a Session with a
+  transaction or pending changes
+
+Each policy is timed for a full request (container, session start and the
+``scoped_session.remove()`` cleanup), and for the reset alone on a clean
+Session and on a Session left in a transaction.  The ``none`` policy leaves
+the transaction open, so its last timing is not a like-for-like comparison;
+it only shows the floor.
+
+    python -m benchmarks.bench_session_start
+"""
+
+# pypi
+import sqlalchemy
+
+# local
+import pyramid_sqlassist
+from ._utils import BenchRequest
+from ._utils import report
+
+# ==============================================================================
+
+
+def main():
+    request = BenchRequest()
+    for policy in pyramid_sqlassist.SESSION_START_POLICIES:
+        engine_name = "policy_%s" % policy
+        pyramid_sqlassist.initialize_engine(
+            engine_name,
+            sqlalchemy.create_engine("sqlite://"),
+            is_scoped=True,
+            is_configure_mappers=False,
+            session_start_policy=policy,
+        )
+
+    def bench_request(engine_name):
+        def _start():
+            dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+            dbSession._get_initialized_session(engine_name)
+            pyramid_sqlassist.request_cleanup(request, dbSession)
+            del request.finished_callbacks[:]
+
+        return _start
+
+    # the reset alone, on the thread's scoped Session
+    def bench_init(engine_name, in_transaction):
+        wrapped = pyramid_sqlassist.get_wrapped_engine(engine_name)
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        _session = wrapped.sa_session_scoped()
+        _select = sqlalchemy.text("SELECT 1")
+
+        def _init():
+            if in_transaction:
+                _session.execute(_select)
+            wrapped._session_init(request, dbSession)
+
+        return _init
+
+    for policy in pyramid_sqlassist.SESSION_START_POLICIES:
+        report(
+            "request start + cleanup: %s" % policy,
+            bench_request("policy_%s" % policy),
+        )
+    for policy in pyramid_sqlassist.SESSION_START_POLICIES:
+        report(
+            "_session_init, clean Session: %s" % policy,
+            bench_init("policy_%s" % policy, False),
+        )
+    for policy in pyramid_sqlassist.SESSION_START_POLICIES:
+        report(
+            "_session_init, Session in a transaction: %s" % policy,
+            bench_init("policy_%s" % policy, True),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -22,9 +22,10 @@ with open(os.path.join(HERE, "README.md")) as fp:
 requires = [
     "SQLAlchemy>=2.0",
     "pyramid",
-    "typing_extensions",  # required for <py3.8, TypedDict
+    "typing_extensions",  # required for <py3.8, Literal, TypedDict
 ]
 tests_require = [
+    "aiosqlite",
     "mypy",
     "pytest",
     "pyramid_mako",
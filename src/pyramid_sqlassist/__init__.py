@@ -2,8 +2,13 @@
 import logging
 
 # local
+from .async_interface import *  # noqa: F401, F403
+from .cache import *  # noqa: F401, F403
+from .instrumentation import *  # noqa: F401, F403
 from .interface import *  # noqa: F401, F403
+from .metrics import *  # noqa: F401, F403
 from .objects import *  # noqa: F401, F403
+from .replicas import *  # noqa: F401, F403
 
 # ==============================================================================
 
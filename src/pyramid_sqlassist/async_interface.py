@@ -0,0 +1,361 @@
+# stdlib
+import logging
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Type
+from typing import TYPE_CHECKING
+
+# pypi
+from pyramid.decorator import reify
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from typing_extensions import TypedDict
+
+# local
+from .interface import _generate_container_class
+from .interface import EngineStatusTracker
+from .interface import STATUS_CODES
+
+if TYPE_CHECKING:
+    from pyramid.config import Configurator
+    from pyramid.request import Request
+    from sqlalchemy.ext.asyncio import AsyncEngine
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# ==============================================================================
+
+log = logging.getLogger(__name__)
+
+
+# define an async engine registry (GLOBAL)
+# async engines are kept apart from `_ENGINE_REGISTRY`, as their lifecycle
+# must be awaited.
+_ASYNC_ENGINE_REGISTRY_TYPE = TypedDict(
+    "_ASYNC_ENGINE_REGISTRY_TYPE",
+    {
+        "!default": Optional[str],
+        "engines": Dict[str, "AsyncEngineWrapper"],
+    },
+)
+
+_ASYNC_ENGINE_REGISTRY: _ASYNC_ENGINE_REGISTRY_TYPE = {
+    "!default": None,
+    "engines": {},
+}
+
+
+# ------------------------------------------------------------------------------
+
+
+class AsyncEngineWrapper(object):
+    """
+    wraps SQLAlchemy's ``AsyncEngine`` object with convenience functions
+
+    Sessions are never scoped; each ``AsyncDbSessionsContainer`` holds its own
+    ``AsyncSession`` per engine, which is safe for concurrent requests on a
+    single event loop.
+    """
+
+    engine_name: str
+    sa_engine: "AsyncEngine"
+    sa_sessionmaker: "async_sessionmaker"
+
+    def __init__(
+        self,
+        engine_name: str,
+        sa_engine: "AsyncEngine",
+    ):
+        if __debug__:
+            log.debug("AsyncEngineWrapper[%s].__init__()", engine_name)
+        self.engine_name = engine_name
+        self.sa_engine = sa_engine
+
+    def init_sessionmaker(
+        self,
+        sa_sessionmaker_params: Dict,
+    ):
+        """
+        :param sa_sessionmaker_params: dict. Passed as-is to ``sqlalchemy.ext.asyncio.async_sessionmaker()``
+        """
+        if __debug__:
+            log.debug("AsyncEngineWrapper[%s].init_sessionmaker()", self.engine_name)
+        sa_sessionmaker_params["bind"] = self.sa_engine
+        self.sa_sessionmaker = async_sessionmaker(**sa_sessionmaker_params)
+
+    def request_start(
+        self,
+        request: Optional["Request"],
+        dbSessionsContainer: "AsyncDbSessionsContainer",
+    ) -> "AsyncSession":
+        """
+        This is called once per engine, per request.
+
+        Returns the ``AsyncSession`` to be used for this engine on the request.
+        Creating the ``AsyncSession`` does not require any IO, so this is not
+        a coroutine.
+
+        :param request: The active Pyramid `Request` instance, or ``None``.
+        :param dbSessionsContainer: An instance of ``AsyncDbSessionsContainer``
+        """
+        _engine_status = dbSessionsContainer._engine_status_tracker.engines.get(
+            self.engine_name
+        )
+        if _engine_status == STATUS_CODES.INIT:
+            dbSessionsContainer._engine_status_tracker.engines[self.engine_name] = (
+                STATUS_CODES.START
+            )
+            dbSessionsContainer._engines_started.append(self)
+            _session = self.sa_sessionmaker()
+            # stash the active Pyramid `request` into the SQLAlchemy "info" dict.
+            _session.info["request"] = request
+            dbSessionsContainer._sessions[self.engine_name] = _session
+            return _session
+        if self.engine_name not in dbSessionsContainer._sessions:
+            raise RuntimeError(
+                "The `%s` session has ended for this request" % self.engine_name
+            )
+        return dbSessionsContainer._sessions[self.engine_name]
+
+    async def request_end(
+        self,
+        request: Optional["Request"],
+        dbSessionsContainer: "AsyncDbSessionsContainer",
+    ) -> None:
+        """
+        This is called once per engine, per request.
+
+        :param request: The active Pyramid `Request` instance, or ``None``.
+        :param dbSessionsContainer: An instance of ``AsyncDbSessionsContainer``
+        """
+        if (
+            dbSessionsContainer._engine_status_tracker.engines.get(self.engine_name)
+            != STATUS_CODES.START
+        ):
+            return
+        dbSessionsContainer._engine_status_tracker.engines[self.engine_name] = (
+            STATUS_CODES.END
+        )
+        _session = dbSessionsContainer._sessions.pop(self.engine_name)
+        await _session.close()
+
+    async def dispose(self):
+        """
+        Exposes SQLAlchemy's ``AsyncEngine.dispose``;
+        needed for fork-like operations.
+        """
+        if __debug__:
+            log.debug("AsyncEngineWrapper[%s].dispose" % self.engine_name)
+        await self.sa_engine.dispose()
+
+
+async def reinit_async_engine(engine_name: str = "!all") -> None:
+    """
+    Calls ``dispose`` on registered async engines, instructing SQLAlchemy to
+    drop the connection pool and begin a new one.
+
+    By default this will call dispose on all async engines.
+    """
+    if engine_name == "!all":
+        for _engine_name in list(_ASYNC_ENGINE_REGISTRY["engines"].keys()):
+            await reinit_async_engine(_engine_name)
+        return
+    if engine_name not in _ASYNC_ENGINE_REGISTRY["engines"]:
+        raise KeyError("No async engine named `%s`" % engine_name)
+    await _ASYNC_ENGINE_REGISTRY["engines"][engine_name].dispose()
+
+
+def initialize_async_engine(
+    engine_name: str,
+    sa_engine: "AsyncEngine",
+    is_default: bool = False,
+    sa_sessionmaker_params: Optional[Dict] = None,
+    is_readonly: bool = False,
+) -> None:
+    """
+    Wraps an ``AsyncEngine`` in an ``AsyncEngineWrapper``
+    Registers it into the ``_ASYNC_ENGINE_REGISTRY``
+
+    :param is_default: boolean. default ``False``.  Used to declare the default engine.
+    :param sa_sessionmaker_params: dict. Passed to SQLAlchemy's ``async_sessionmaker``.
+        ``expire_on_commit`` defaults to ``False``, as expired attributes can
+        not be lazily loaded under asyncio.
+    :param is_readonly: boolean. default ``False``.  If set to ``True``,
+        ``autoflush=False`` is used.
+    """
+    if __debug__:
+        log.debug("initialize_async_engine(%s)", engine_name)
+
+    if engine_name == "!all":
+        raise ValueError("Invalid `engine_name`: `!all` is reserved")
+
+    wrapped_engine = AsyncEngineWrapper(engine_name, sa_engine)
+
+    if sa_sessionmaker_params is None:
+        sa_sessionmaker_params = {}
+    sa_sessionmaker_params.setdefault("expire_on_commit", False)
+    if is_readonly:
+        sa_sessionmaker_params["autoflush"] = False
+
+    wrapped_engine.init_sessionmaker(sa_sessionmaker_params)
+
+    # stash the wrapper
+    _ASYNC_ENGINE_REGISTRY["engines"][engine_name] = wrapped_engine
+    if is_default:
+        _ASYNC_ENGINE_REGISTRY["!default"] = engine_name
+
+
+def get_wrapped_async_engine(name: str = "!default") -> "AsyncEngineWrapper":
+    """
+    Retrieves an async engine from the registry.
+
+    :param name: string. Name of the wrapped engine to get. Default: `!default`.
+    """
+    if name == "!all":
+        raise ValueError("Invalid `engine_name`: `!all` is reserved")
+
+    try:
+        if name == "!default":
+            _name = _ASYNC_ENGINE_REGISTRY["!default"]
+            if _name is None:
+                raise KeyError()
+            name = _name
+        return _ASYNC_ENGINE_REGISTRY["engines"][name]
+    except KeyError:
+        raise RuntimeError("No async engine '%s' was configured" % name)
+
+
+class AsyncDbSessionsContainer(object):
+    """
+    AsyncDbSessionsContainer is the asyncio counterpart of ``DbSessionsContainer``.
+
+    -- it creates and stores an ``AsyncSession`` per engine, on demand
+    -- it provides memoized accessors for the sessions; everything is lazily handled
+    -- the sessions must be closed by awaiting ``request_end``, or by using
+       the container as an async context manager
+
+    usage:
+
+        async with AsyncDbSessionsContainer(request) as dbSession:
+            result = await dbSession.reader.execute(stmt)
+
+    ``register_async_request_method`` will register the container onto the
+    Pyramid request; the application must then await
+    ``request.dbSessionAsync.request_end()`` when the request is finished.
+    """
+
+    _engine_status_tracker: "EngineStatusTracker"
+    _engines_started: List["AsyncEngineWrapper"]
+    _request: Optional["Request"]
+    _sessions: Dict[str, "AsyncSession"]
+
+    def __init__(self, request: Optional["Request"] = None):
+        """
+        :param request: The active Pyramid `Request` instance. optional.
+        """
+        self._request = request
+        self._engines_started = []
+        self._sessions = {}
+        _engine_status_tracker = EngineStatusTracker()
+        _engine_status_tracker.engines = dict.fromkeys(
+            _ASYNC_ENGINE_REGISTRY["engines"].keys(), STATUS_CODES.INIT
+        )
+        self._engine_status_tracker = _engine_status_tracker
+
+    async def __aenter__(self) -> "AsyncDbSessionsContainer":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.request_end()
+
+    def get_session(self, engine_name: str) -> "AsyncSession":
+        """
+        :param engine_name: string. Name of the wrapped async engine.
+        """
+        _engine = get_wrapped_async_engine(engine_name)
+        return _engine.request_start(self._request, self)
+
+    async def request_end(self) -> None:
+        """
+        Closes every ``AsyncSession`` started by this container, in the order
+        they were started.
+        """
+        for _engine in self._engines_started:
+            await _engine.request_end(self._request, self)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+    @reify
+    def reader(self) -> "AsyncSession":
+        """
+        database `reader` session.  memoized accessor.
+        """
+        return self.get_session("reader")
+
+    @reify
+    def writer(self) -> "AsyncSession":
+        """
+        database `writer` session.  memoized accessor.
+        """
+        return self.get_session("writer")
+
+    @reify
+    def logger(self) -> "AsyncSession":
+        """
+        database `logger` session.  memoized accessor.
+        """
+        return self.get_session("logger")
+
+
+def generate_async_container_class(
+    dbContainerClass: Type[AsyncDbSessionsContainer] = AsyncDbSessionsContainer,
+) -> Type[AsyncDbSessionsContainer]:
+    """
+    Generates a subclass of ``dbContainerClass`` with a memoized accessor for
+    every engine currently in the ``_ASYNC_ENGINE_REGISTRY``.
+
+    See ``generate_container_class``.
+
+    :param dbContainerClass: class. default ``AsyncDbSessionsContainer``
+    """
+    return _generate_container_class(
+        dbContainerClass,
+        _ASYNC_ENGINE_REGISTRY["engines"],
+        AsyncDbSessionsContainer,
+    )
+
+
+def register_async_request_method(
+    config: "Configurator",
+    request_method_name: str,
+    dbContainerClass=AsyncDbSessionsContainer,
+    generate_accessors: bool = True,
+) -> None:
+    """
+    ``register_async_request_method`` invokes Pyramid's ``add_request_method``
+    for an ``AsyncDbSessionsContainer``.
+
+    Pyramid's finished callbacks can not await, so the application is
+    responsible for awaiting ``request_end()`` on the container.
+
+    :param config: object. Pyramid config object
+    :param request_method_name: string. name to be registered as Pyramid ``request`` attribute
+    :param dbContainerClass: class. default ``AsyncDbSessionsContainer``
+    :param generate_accessors: boolean. default ``True``.  Generate accessors for all registered async engines.
+    """
+    if generate_accessors:
+        dbContainerClass = generate_async_container_class(dbContainerClass)
+    config.add_request_method(dbContainerClass, request_method_name, reify=True)
+
+
+# ==============================================================================
+
+__all__ = (
+    "_ASYNC_ENGINE_REGISTRY",
+    "AsyncDbSessionsContainer",
+    "AsyncEngineWrapper",
+    "generate_async_container_class",
+    "get_wrapped_async_engine",
+    "initialize_async_engine",
+    "register_async_request_method",
+    "reinit_async_engine",
+)
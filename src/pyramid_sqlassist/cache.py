@@ -0,0 +1,262 @@
+# stdlib
+from collections import OrderedDict
+import itertools
+import logging
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import Hashable
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Type
+from typing import TYPE_CHECKING
+
+# pypi
+import sqlalchemy
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm.session import Session
+
+# ==============================================================================
+
+log = logging.getLogger(__name__)
+
+# the cached classes flushed by a Session are stored in `Session.info` under
+# this key, until the transaction is committed or rolled back
+_FLUSHED_KEY = "sqlassist.identity_cache.flushed"
+
+# track the registration of the global Session listeners (GLOBAL)
+_LISTENERS: Dict[str, bool] = {"registered": False}
+
+
+def _cached_classes(klass: type) -> Set[type]:
+    """``klass`` and its bases which use an ``IdentityCache``"""
+    return {
+        _klass
+        for _klass in klass.__mro__
+        if getattr(_klass, "__sqlassist_identity_cache__", None) is not None
+    }
+
+
+def _after_flush(session: "Session", flush_context) -> None:
+    # `new`, `dirty` and `deleted` still show the pre-flush state
+    flushed: Optional[Set[type]] = None
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        _classes = _cached_classes(type(obj))
+        if _classes:
+            if flushed is None:
+                flushed = session.info.setdefault(_FLUSHED_KEY, set())
+            flushed.update(_classes)
+
+
+def mark_written(session: "Session", klass: type) -> None:
+    """
+    Records that ``session`` wrote to the table of ``klass`` outside of the
+    unit of work (e.g. with an ``insert()`` or ``update()`` statement), so the
+    ``IdentityCache`` entries of ``klass`` and its bases are invalidated when
+    the transaction commits.
+
+    :param session: The SQLAlchemy ``Session``.
+    :param klass: The mapped class.
+    """
+    _classes = _cached_classes(klass)
+    if _classes:
+        session.info.setdefault(_FLUSHED_KEY, set()).update(_classes)
+
+
+def _after_commit(session: "Session") -> None:
+    flushed = session.info.pop(_FLUSHED_KEY, None)
+    if flushed:
+        for klass in flushed:
+            klass.__sqlassist_identity_cache__.invalidate_class(klass)
+
+
+def _after_soft_rollback(session: "Session", previous_transaction) -> None:
+    # a savepoint rollback leaves the enclosing transaction's flushes in place
+    if previous_transaction.nested:
+        return
+    session.info.pop(_FLUSHED_KEY, None)
+
+
+def _register_listeners() -> None:
+    """
+    Listens to every ``Session``; only done once an ``IdentityCache`` exists.
+    """
+    if _LISTENERS["registered"]:
+        return
+    sqlalchemy.event.listen(sqlalchemy.orm.Session, "after_flush", _after_flush)
+    sqlalchemy.event.listen(sqlalchemy.orm.Session, "after_commit", _after_commit)
+    sqlalchemy.event.listen(
+        sqlalchemy.orm.Session, "after_soft_rollback", _after_soft_rollback
+    )
+    _LISTENERS["registered"] = True
+
+
+class IdentityCache(object):
+    """
+    A per-process LRU cache, with a TTL, of detached snapshots of ORM objects,
+    keyed by ``(class, id)``.
+
+    A class opts in by declaring an ``IdentityCache`` as
+    ``__sqlassist_identity_cache__``; ``UtilityObject.get__by__id`` will then
+    use it.  Several classes may share one ``IdentityCache``.
+
+    Each snapshot is a detached instance with the column values that were
+    loaded.  On a hit, it is merged into the Session with ``load=False``, so no
+    SQL is emitted.
+
+    All of a class's entries are invalidated after any Session in this process
+    commits a transaction which flushed changes to that class (or a subclass).
+    Changes made outside of the ORM unit of work (``update()`` and
+    ``delete()`` statements, or other processes) are only bounded by ``ttl``.
+    """
+
+    max_entries: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        """
+        :param max_entries: int. default ``1024``.  The least recently used
+            entries are evicted past this many.
+        :param ttl: float. default ``60.0``.  Seconds an entry is valid for.
+        """
+        if max_entries < 1:
+            raise ValueError("`max_entries` must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple[type, Hashable], Tuple[float, Any]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        _register_listeners()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the counters, and the current number of entries.
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def get(
+        self,
+        dbSession: "Session",
+        klass: Type,
+        id: Hashable,
+    ) -> Optional[Any]:
+        """
+        Returns the cached object merged into ``dbSession``, or ``None``.
+
+        :param dbSession: The SQLAlchemy ``Session`` to merge into.
+        :param klass: The mapped class.
+        :param id: The identifier.
+        """
+        key = (klass, id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] < time.monotonic():
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return dbSession.merge(entry[1], load=False)
+
+    def set(
+        self,
+        dbSession: "Session",
+        klass: Type,
+        id: Hashable,
+        obj: Any,
+    ) -> None:
+        """
+        Stores a detached snapshot of ``obj``.
+
+        Nothing is stored if ``dbSession`` has flushed uncommitted changes to
+        ``klass``, or if ``obj`` has changes, as they may be rolled back.
+
+        :param dbSession: The SQLAlchemy ``Session`` ``obj`` was loaded in.
+        :param klass: The mapped class.
+        :param id: The identifier.
+        :param obj: The object.
+        """
+        flushed = dbSession.info.get(_FLUSHED_KEY)
+        if flushed and (klass in flushed):
+            return
+        state = sa_inspect(obj)
+        if state.modified or (state.key is None):
+            return
+        mapper = state.mapper
+        snapshot = mapper.class_manager.new_instance()
+        _dict = state.dict
+        for prop in mapper.column_attrs:
+            if prop.key in _dict:
+                set_committed_value(snapshot, prop.key, _dict[prop.key])
+        make_transient_to_detached(snapshot)
+        key = (klass, id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, klass: Type, id: Hashable) -> None:
+        """
+        :param klass: The mapped class.
+        :param id: The identifier.
+        """
+        with self._lock:
+            if self._entries.pop((klass, id), None) is not None:
+                self.invalidations += 1
+
+    def invalidate_class(self, klass: Type) -> None:
+        """
+        Drops every entry of ``klass``.
+
+        :param klass: The mapped class.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] is klass]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+
+    def clear(self) -> None:
+        """
+        Drops every entry; the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# ==============================================================================
+
+__all__ = (
+    "IdentityCache",
+    "mark_written",
+)
@@ -0,0 +1,434 @@
+# stdlib
+import logging
+import random
+import time
+import traceback
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Union
+import weakref
+
+# pypi
+import sqlalchemy
+from sqlalchemy.engine.cursor import BufferedRowCursorFetchStrategy
+from sqlalchemy.engine.cursor import CursorFetchStrategy
+
+if TYPE_CHECKING:
+    from pyramid.request import Request
+    from sqlalchemy.engine.base import Connection
+    from sqlalchemy.engine.base import Engine
+    from sqlalchemy.orm import scoped_session
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.orm.session import Session
+
+# ==============================================================================
+
+log = logging.getLogger(__name__)
+log_slow_query = logging.getLogger(__name__ + ".slow_query")
+
+
+# the `EngineStats` of a Session are stored in `Session.info` under this key,
+# and copied onto the `Connection.info` of every connection the Session begins,
+# along with the Session's Pyramid `request`.
+# The pool's "checkin" event removes them from the connection.
+STATS_KEY = "sqlassist.stats"
+REQUEST_KEY = "sqlassist.request"
+_START_KEY = "sqlassist.stats.start"
+_SLOW_START_KEY = "sqlassist.slow_query.start"
+
+# the engines and sessionmakers the shared listeners are attached to.
+# `sqlalchemy.event.contains` is keyed by `id()`, which a new object may reuse
+# before the listeners of a collected one are discarded.
+_LISTENING: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+# stack frames from these packages are trimmed from slow query stacks
+_STACK_TRIM = ("/sqlalchemy/", "/pyramid_sqlassist/instrumentation.py")
+
+
+class EngineStats(object):
+    """
+    Query statistics for a single engine, over a single request.
+
+    ``rows_affected`` is the sum of the DBAPI ``cursor.rowcount`` of each
+    ``INSERT``/``UPDATE``/``DELETE`` statement.
+
+    ``rows_returned`` is the number of rows fetched from result sets, such as
+    those of a ``SELECT``; it is counted as the rows are fetched, as most
+    drivers do not report a ``rowcount`` for them.  Rows which are never
+    fetched are not counted.
+    """
+
+    __slots__ = ("statements", "duration", "rows_affected", "rows_returned")
+
+    statements: int
+    duration: float
+    rows_affected: int
+    rows_returned: int
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.rows_affected = 0
+        self.rows_returned = 0
+
+    def __repr__(self) -> str:
+        return (
+            "<EngineStats statements=%s duration=%.6f rows_affected=%s rows_returned=%s>"
+            % (
+                self.statements,
+                self.duration,
+                self.rows_affected,
+                self.rows_returned,
+            )
+        )
+
+    def record(self, duration: float, rows_affected: int) -> None:
+        """
+        :param duration: float. seconds spent executing the statement.
+        :param rows_affected: int. the DBAPI ``cursor.rowcount`` of a DML
+            statement, or ``-1``; ignored if negative.
+        """
+        self.statements += 1
+        self.duration += duration
+        if rows_affected > 0:
+            self.rows_affected += rows_affected
+
+    def as_dict(self) -> Dict[str, Union[int, float]]:
+        return {
+            "statements": self.statements,
+            "duration": self.duration,
+            "rows_affected": self.rows_affected,
+            "rows_returned": self.rows_returned,
+        }
+
+
+class _CountingFetchStrategyBase(CursorFetchStrategy):
+    """adds the rows fetched from a cursor to ``EngineStats.rows_returned``"""
+
+    __slots__ = ()
+
+    _stats: EngineStats
+
+    def fetchone(self, result, dbapi_cursor, hard_close=False):
+        row = super().fetchone(result, dbapi_cursor, hard_close=hard_close)
+        if row is not None:
+            self._stats.rows_returned += 1
+        return row
+
+    def fetchmany(self, result, dbapi_cursor, size=None):
+        if size is None:
+            # `BufferedRowCursorFetchStrategy` delegates this to `fetchall`
+            return self.fetchall(result, dbapi_cursor)
+        rows = super().fetchmany(result, dbapi_cursor, size=size)
+        self._stats.rows_returned += len(rows)
+        return rows
+
+    def fetchall(self, result, dbapi_cursor):
+        rows = super().fetchall(result, dbapi_cursor)
+        self._stats.rows_returned += len(rows)
+        return rows
+
+
+class _CountingFetchStrategy(_CountingFetchStrategyBase):
+    __slots__ = ("_stats",)
+
+    def __init__(self, stats: EngineStats):
+        self._stats = stats
+
+
+class _CountingBufferedRowFetchStrategy(
+    _CountingFetchStrategyBase, BufferedRowCursorFetchStrategy
+):
+    __slots__ = ("_stats",)
+
+    def __init__(self, stats: EngineStats, dbapi_cursor, execution_options):
+        super().__init__(dbapi_cursor, execution_options)
+        self._stats = stats
+
+
+def _count_rows(stats: EngineStats, cursor, context) -> None:
+    """wraps the fetch strategy of a result set, to count the rows fetched"""
+    if (
+        context is None
+        or cursor.description is None
+        or type(context.cursor_fetch_strategy) is not CursorFetchStrategy
+    ):
+        # no result set, or the dialect fetches rows its own way
+        return
+    # mirrors the buffering `DefaultExecutionContext._setup_result_proxy` applies
+    # to the default strategy, which a replaced strategy would not receive
+    streaming = getattr(context, "_is_server_side", False)
+    if not streaming and not (context.is_crud or context.is_text):
+        streaming = bool(context.execution_options.get("stream_results", False))
+    if streaming:
+        context.cursor_fetch_strategy = _CountingBufferedRowFetchStrategy(
+            stats, cursor, context.execution_options
+        )
+    else:
+        context.cursor_fetch_strategy = _CountingFetchStrategy(stats)
+
+
+def _is_dml(cursor, context) -> bool:
+    """``True`` for an ``INSERT``/``UPDATE``/``DELETE``, even with ``RETURNING``"""
+    if context is not None and (
+        context.isinsert or context.isupdate or context.isdelete
+    ):
+        return True
+    # a textual statement; only a `SELECT` (or `RETURNING`) has a result set
+    return cursor.description is None
+
+
+def _before_cursor_execute(
+    conn: "Connection",
+    cursor,
+    statement,
+    parameters,
+    context,
+    executemany,
+) -> None:
+    _info = conn.info
+    if STATS_KEY in _info:
+        _info[_START_KEY] = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: "Connection",
+    cursor,
+    statement,
+    parameters,
+    context,
+    executemany,
+) -> None:
+    _info = conn.info
+    stats = _info.get(STATS_KEY)
+    if stats is None:
+        return
+    _finished = time.perf_counter()
+    stats.record(
+        _finished - _info.pop(_START_KEY, _finished),
+        cursor.rowcount if _is_dml(cursor, context) else -1,
+    )
+    _count_rows(stats, cursor, context)
+
+
+def _redact(parameters: Any) -> Any:
+    """replaces each bound parameter value with ``?``"""
+    if isinstance(parameters, dict):
+        return {k: "?" for k in parameters}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany
+            return [_redact(p) for p in parameters]
+        return tuple("?" for p in parameters)
+    return parameters
+
+
+def _format_stack(limit: int) -> str:
+    """formats the caller's stack, without SQLAlchemy's frames"""
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if not any(trim in frame.filename.replace("\\", "/") for trim in _STACK_TRIM)
+    ]
+    return "".join(traceback.format_list(frames[-limit:]))
+
+
+class SlowQueryLog(object):
+    """
+    Logs the statements of an engine which exceed ``threshold`` seconds to
+    the ``pyramid_sqlassist.instrumentation.slow_query`` logger.
+
+    The statement, parameters, duration, engine name and Pyramid route are
+    logged; the same values are available to handlers as the
+    ``sqlassist_slow_query`` attribute of the ``LogRecord``.
+
+    Only a statement which is slow is inspected further; a fast statement
+    costs one timer call before and after execution.
+    """
+
+    engine_name: str
+    threshold: float
+    redact_params: bool
+    stack_sample_rate: float
+    stack_limit: int
+
+    def __init__(
+        self,
+        engine_name: str,
+        threshold: float,
+        redact_params: bool = False,
+        stack_sample_rate: float = 0.0,
+        stack_limit: int = 10,
+    ):
+        """
+        :param engine_name: string. Name of the wrapped engine.
+        :param threshold: float. seconds.
+        :param redact_params: boolean. default ``False``. Replace parameter values with ``?``.
+        :param stack_sample_rate: float. default ``0.0``. The fraction of slow
+            statements, between ``0.0`` and ``1.0``, which will also log the
+            Python stack.
+        :param stack_limit: int. default ``10``. The number of stack frames to log.
+        """
+        if not (0.0 <= stack_sample_rate <= 1.0):
+            raise ValueError("`stack_sample_rate` must be between 0.0 and 1.0")
+        self.engine_name = engine_name
+        self.threshold = threshold
+        self.redact_params = redact_params
+        self.stack_sample_rate = stack_sample_rate
+        self.stack_limit = stack_limit
+
+    def before_cursor_execute(
+        self,
+        conn: "Connection",
+        cursor,
+        statement,
+        parameters,
+        context,
+        executemany,
+    ) -> None:
+        conn.info[_SLOW_START_KEY] = time.perf_counter()
+
+    def after_cursor_execute(
+        self,
+        conn: "Connection",
+        cursor,
+        statement,
+        parameters,
+        context,
+        executemany,
+    ) -> None:
+        _info = conn.info
+        _finished = time.perf_counter()
+        duration = _finished - _info.get(_SLOW_START_KEY, _finished)
+        if duration < self.threshold:
+            return
+        self.log(_info.get(REQUEST_KEY), statement, parameters, duration)
+
+    def log(
+        self,
+        request: Optional["Request"],
+        statement: str,
+        parameters: Any,
+        duration: float,
+    ) -> None:
+        """
+        Logs a slow statement.
+
+        :param request: The active Pyramid `Request` instance, or ``None``.
+        :param statement: string. The SQL statement.
+        :param parameters: The DBAPI parameters.
+        :param duration: float. seconds.
+        """
+        route = None
+        if request is not None:
+            matched_route = getattr(request, "matched_route", None)
+            if matched_route is not None:
+                route = matched_route.name
+        if self.redact_params:
+            parameters = _redact(parameters)
+        stack = None
+        if self.stack_sample_rate and (random.random() < self.stack_sample_rate):
+            stack = _format_stack(self.stack_limit)
+        log_slow_query.warning(
+            "slow query | engine=%s | route=%s | duration=%.6f\n%s\nparameters: %r%s",
+            self.engine_name,
+            route,
+            duration,
+            statement,
+            parameters,
+            ("\nstack:\n%s" % stack) if stack else "",
+            extra={
+                "sqlassist_slow_query": {
+                    "engine_name": self.engine_name,
+                    "route": route,
+                    "duration": duration,
+                    "statement": statement,
+                    "parameters": parameters,
+                    "stack": stack,
+                }
+            },
+        )
+
+
+def _after_begin(
+    session: "Session",
+    transaction,
+    connection: "Connection",
+) -> None:
+    _info = connection.info
+    _info[REQUEST_KEY] = session.info.get("request")
+    stats = session.info.get(STATS_KEY)
+    if stats is not None:
+        _info[STATS_KEY] = stats
+
+
+def _checkin(
+    dbapi_connection,
+    connection_record,
+) -> None:
+    if connection_record is not None:
+        _info = connection_record.info
+        _info.pop(STATS_KEY, None)
+        _info.pop(REQUEST_KEY, None)
+        _info.pop(_START_KEY, None)
+        _info.pop(_SLOW_START_KEY, None)
+
+
+def _listen_pool(sa_engine: "Engine") -> None:
+    # pool events on an `Engine` persist across `Engine.dispose()`
+    if sa_engine not in _LISTENING:
+        sqlalchemy.event.listen(sa_engine, "checkin", _checkin)
+        _LISTENING.add(sa_engine)
+
+
+def listen_engine(sa_engine: "Engine") -> None:
+    """
+    Attaches the cursor and pool listeners used to collect ``EngineStats``.
+    Connections which do not belong to a tracked Session are ignored.
+
+    :param sa_engine: A SQLAlchemy ``Engine``.
+    """
+    sqlalchemy.event.listen(sa_engine, "before_cursor_execute", _before_cursor_execute)
+    sqlalchemy.event.listen(sa_engine, "after_cursor_execute", _after_cursor_execute)
+    _listen_pool(sa_engine)
+
+
+def listen_engine_slow_query(sa_engine: "Engine", slow_query_log: SlowQueryLog) -> None:
+    """
+    Attaches the cursor and pool listeners of a ``SlowQueryLog``.
+
+    :param sa_engine: A SQLAlchemy ``Engine``.
+    :param slow_query_log: A ``SlowQueryLog``.
+    """
+    sqlalchemy.event.listen(
+        sa_engine, "before_cursor_execute", slow_query_log.before_cursor_execute
+    )
+    sqlalchemy.event.listen(
+        sa_engine, "after_cursor_execute", slow_query_log.after_cursor_execute
+    )
+    _listen_pool(sa_engine)
+
+
+def listen_sessionmaker(
+    sa_sessionmaker: Union["sessionmaker", "scoped_session"],
+) -> None:
+    """
+    Attaches the Session listener which binds a Session's ``EngineStats`` and
+    Pyramid `request` to the connections it begins.
+    The listener is only attached once.
+
+    :param sa_sessionmaker: A SQLAlchemy ``sessionmaker``.
+    """
+    if sa_sessionmaker not in _LISTENING:
+        sqlalchemy.event.listen(sa_sessionmaker, "after_begin", _after_begin)
+        _LISTENING.add(sa_sessionmaker)
+
+
+# ==============================================================================
+
+__all__ = (
+    "EngineStats",
+    "SlowQueryLog",
+)
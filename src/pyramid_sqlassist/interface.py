@@ -1,14 +1,24 @@
 # stdlib
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from contextvars import ContextVar
 import logging
 import os
+import threading
+import time
 from types import ModuleType
 from typing import Any
 from typing import Callable
 from typing import Dict
+from typing import Hashable
+from typing import Iterator
+from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Type
 from typing import TYPE_CHECKING
 from typing import Union
+import warnings
 
 # pypi
 from pyramid.decorator import reify
@@ -18,12 +28,25 @@ from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm import sessionmaker
 from typing_extensions import TypedDict
 
+# local
+from . import instrumentation
+from .instrumentation import EngineStats
+from .instrumentation import SlowQueryLog
+from .metrics import format_prometheus
+from .metrics import PoolMetrics
+from .replicas import CookieReadYourWritesStore
+from .replicas import EngineGroup
+from .replicas import ReadYourWrites
+from .replicas import ReadYourWritesStore
+
 if TYPE_CHECKING:
     from pyramid.config import Configurator
     from pyramid.request import Request
     from sqlalchemy.engine.base import Engine
     from sqlalchemy.orm.session import Session
 
+    from .async_interface import AsyncEngineWrapper
+
 # ==============================================================================
 
 log = logging.getLogger(__name__)
@@ -91,6 +114,42 @@ _metadata = sqlalchemy.MetaData(naming_convention=NAMING_CONVENTION)
 DeclaredTable = declarative_base(metadata=_metadata)
 
 
+# the policies for resetting a Session when it is started for a request
+# `rollback`: always call `Session.rollback()`
+# `none`: never call `Session.rollback()`
+# `verify`: call `Session.rollback()` only if the Session is in a transaction,
+#   or has modified objects
+SESSION_START_POLICIES = ("rollback", "none", "verify")
+
+
+# the active Pyramid `request` of the current context; used by `request_scopefunc`
+# this is set when a Session is started for a request, on engines with a
+# `scopefunc`, and reset by `request_cleanup`
+_REQUEST_CONTEXT: ContextVar[Optional["Request"]] = ContextVar(
+    "pyramid_sqlassist.request", default=None
+)
+
+
+def request_scopefunc() -> Hashable:
+    """
+    A ``scopefunc`` for ``scoped_session`` which scopes Sessions to the active
+    Pyramid request of the current ``contextvars`` context, instead of to the
+    current thread.  Each greenlet (gevent>=20.9) or asyncio task has its own
+    context, so concurrent requests on one thread have isolated Sessions.
+
+    Outside of a request, Sessions are scoped to the current thread; those
+    must be removed with ``scoped_session.remove()``.
+
+    usage:
+
+        initialize_engine("reader", engine_reader, scopefunc=request_scopefunc)
+    """
+    request = _REQUEST_CONTEXT.get()
+    if request is None:
+        return ("thread", threading.get_ident())
+    return ("request", id(request))
+
+
 class STATUS_CODES(object):
     INIT = 0
     START = 1
@@ -127,11 +186,17 @@ class EngineWrapper(object):
     """
 
     engine_name: str
+    read_your_writes: Optional["ReadYourWrites"] = None
     sa_engine: "Engine"
     sa_sessionmaker: "sessionmaker"
     sa_session: "Session"
     sa_session_scoped: "scoped_session"
     is_scoped: bool
+    pool_metrics: Optional[Dict[str, "PoolMetrics"]] = None
+    scopefunc: Optional[Callable[[], Hashable]] = None
+    session_start_policy: str = "rollback"
+    slow_query_log: Optional["SlowQueryLog"] = None
+    track_query_stats: bool = False
 
     def __init__(
         self,
@@ -142,17 +207,23 @@ class EngineWrapper(object):
             log.debug("EngineWrapper[%s].__init__()", engine_name)
         self.engine_name = engine_name
         self.sa_engine = sa_engine
+        # the process which created the pool(s)
+        self._pid = os.getpid()
 
     def init_sessionmaker(
         self,
         is_scoped: bool,
         sa_sessionmaker_params: Dict,
         use_zope: bool = False,
+        scopefunc: Optional[Callable[[], Hashable]] = None,
     ):
         """
         :param is_scoped: boolean.
         :param sa_sessionmaker_params: dict. Passed as-is to ``sqlalchemy.orm.sessionmaker()``
         :param use_zope: boolean. optional. Default ``False``.
+        :param scopefunc: callable. optional. Default ``None``.  Passed to
+            ``sqlalchemy.orm.scoped_session()``; by default, Sessions are
+            scoped to the current thread.
         """
         if __debug__:
             log.debug("EngineWrapper[%s].init_sessionmaker()", self.engine_name)
@@ -161,7 +232,10 @@ class EngineWrapper(object):
         self.sa_sessionmaker = sa_sessionmaker
         if is_scoped:
             self.is_scoped = True
-            self.sa_session_scoped = scoped_session(sa_sessionmaker)
+            self.sa_session_scoped = scoped_session(
+                sa_sessionmaker, scopefunc=scopefunc
+            )
+            self.scopefunc = scopefunc
             if use_zope:
                 if zope_register is None:
                     raise ValueError("`zope_register` was not imported")
@@ -171,14 +245,90 @@ class EngineWrapper(object):
         else:
             if use_zope:
                 raise ValueError("`use_zope=True` requires scoped sessions")
+            if scopefunc is not None:
+                raise ValueError("`scopefunc` requires scoped sessions")
             self.is_scoped = False
             self.sa_session = sa_sessionmaker()
 
+    def _iter_sa_engines(self) -> Iterator[Tuple[str, "Engine"]]:
+        """yields the (name, SQLAlchemy engine) managed by this wrapper"""
+        yield (self.engine_name, self.sa_engine)
+
+    def enable_query_stats(self) -> None:
+        """
+        Attaches the listeners which record ``EngineStats`` for each request.
+        The listeners are only attached once.
+        """
+        if self.track_query_stats:
+            return
+        for _name, sa_engine in self._iter_sa_engines():
+            instrumentation.listen_engine(sa_engine)
+        instrumentation.listen_sessionmaker(self.sa_sessionmaker)
+        self.track_query_stats = True
+
+    def enable_slow_query_log(
+        self,
+        threshold: float,
+        redact_params: bool = False,
+        stack_sample_rate: float = 0.0,
+    ) -> "SlowQueryLog":
+        """
+        Attaches a ``SlowQueryLog`` to the engine(s).
+        If one is already attached, it is reconfigured.
+
+        :param threshold: float. seconds.
+        :param redact_params: boolean. default ``False``.
+        :param stack_sample_rate: float. default ``0.0``.
+        """
+        slow_query_log = SlowQueryLog(
+            self.engine_name,
+            threshold,
+            redact_params=redact_params,
+            stack_sample_rate=stack_sample_rate,
+        )
+        if self.slow_query_log is not None:
+            self.slow_query_log.threshold = slow_query_log.threshold
+            self.slow_query_log.redact_params = slow_query_log.redact_params
+            self.slow_query_log.stack_sample_rate = slow_query_log.stack_sample_rate
+            return self.slow_query_log
+        for _name, sa_engine in self._iter_sa_engines():
+            instrumentation.listen_engine_slow_query(sa_engine, slow_query_log)
+        instrumentation.listen_sessionmaker(self.sa_sessionmaker)
+        self.slow_query_log = slow_query_log
+        return slow_query_log
+
+    def enable_pool_metrics(self) -> Dict[str, "PoolMetrics"]:
+        """
+        Attaches a ``PoolMetrics`` to the pool of each engine, keyed by the
+        engine name (or group member name).
+        The metrics are only attached once.
+        """
+        if self.pool_metrics is None:
+            pool_metrics = {}
+            for _name, sa_engine in self._iter_sa_engines():
+                pool_metrics[_name] = _metrics = PoolMetrics(sa_engine)
+                _metrics.listen()
+            self.pool_metrics = pool_metrics
+        return self.pool_metrics
+
     @property
     def session(self) -> "TYPES_SESSION":
-        """accessor property for sessions"""
+        """
+        accessor property for sessions
+
+        Non-scoped engines return ``sa_session``, a single Session shared by
+        the process, and not the Session of the active request, which is
+        stored on the ``DbSessionsContainer``.  This use is deprecated.
+        """
         if self.is_scoped:
             return self.sa_session_scoped
+        warnings.warn(
+            "`EngineWrapper.session` is deprecated for non-scoped engines; "
+            "it is not the request's Session. "
+            "Use the `DbSessionsContainer` instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         return self.sa_session
 
     @property
@@ -193,10 +343,37 @@ class EngineWrapper(object):
         request: "Request",
         dbSessionsContainer: "DbSessionsContainer",
         force: bool = False,
-    ) -> None:
+    ) -> "TYPES_SESSION":
         """
         This is called once per engine, per request.
 
+        Returns the session to be used for this engine on the request.
+
+        :param request: The active Pyramid `Request` instance.
+        :param dbSessionsContainer: An instance of ``DbSessionsContainer``
+        :param force: boolean. optional. Default ``False``.
+        """
+        if self._pid != os.getpid():
+            self._dispose_after_fork()
+        if self.read_your_writes is not None:
+            if self.read_your_writes.is_sticky(request):
+                _writer_engine = self.read_your_writes.writer_engine
+                dbSessionsContainer._engine_selections[self.engine_name] = (
+                    _writer_engine
+                )
+                return dbSessionsContainer._get_initialized_session(_writer_engine)
+        return self._request_start(request, dbSessionsContainer, force=force)
+
+    def _request_start(
+        self,
+        request: "Request",
+        dbSessionsContainer: "DbSessionsContainer",
+        force: bool = False,
+    ) -> "TYPES_SESSION":
+        """
+        Starts the Session for a request on the first use of the engine;
+        invoked by ``request_start``.
+
         :param request: The active Pyramid `Request` instance.
         :param dbSessionsContainer: An instance of ``DbSessionsContainer``
         :param force: boolean. optional. Default ``False``.
@@ -216,23 +393,17 @@ class EngineWrapper(object):
             self.engine_name
         )
 
-        if (_engine_status is not None) and (_engine_status == STATUS_CODES.INIT):
-            # reinit the session, this only requires invoking it like a function to modify in-place
+        # an engine initialized after the container was created is not tracked
+        if (_engine_status is None) or (_engine_status == STATUS_CODES.INIT):
             dbSessionsContainer._engine_status_tracker.engines[self.engine_name] = (
                 STATUS_CODES.START
             )
-            if self.is_scoped:
-                self.sa_session_scoped()
-                # stash the active Pyramid `request` into the SQLAlchemy "info" dict.
-                self.sa_session_scoped.info["request"] = request
-                self.sa_session_scoped.rollback()
-            else:
-                self.sa_session = self.sa_sessionmaker()
-                # stash the active Pyramid `request` into the SQLAlchemy "info" dict.
-                self.sa_session.info["request"] = request
-                self.sa_session.rollback()
-                # scoped sessions have a `session_factory`, but normal ones do not
-                self.sa_session.session_factory = self.sa_sessionmaker  # type: ignore[attr-defined]
+            # record the start, so only this engine is visited on cleanup
+            dbSessionsContainer._engines_started.append(self)
+            # the cleanup is only needed once a session has been started
+            if not dbSessionsContainer._cleanup_registered:
+                _ensure_cleanup(request, dbSessionsContainer)
+            self._session_init(request, dbSessionsContainer)
         else:
             if __debug__:
                 log.debug(
@@ -240,6 +411,54 @@ class EngineWrapper(object):
                     self.engine_name,
                     self._session_repr,
                 )
+        if self.is_scoped:
+            return self.sa_session_scoped
+        # non-scoped sessions are stored on the container, one per request
+        _session = dbSessionsContainer._sessions.get(self.engine_name)
+        if _session is None:
+            # e.g. a previous `_session_init` raised
+            _session = self._session_init(request, dbSessionsContainer)
+        return _session
+
+    def _session_init(
+        self,
+        request: "Request",
+        dbSessionsContainer: "DbSessionsContainer",
+    ) -> "Session":
+        """
+        Initializes and returns the Session for a request.
+        This is invoked by ``request_start`` on the first use of the engine.
+
+        :param request: The active Pyramid `Request` instance.
+        :param dbSessionsContainer: An instance of ``DbSessionsContainer``
+        """
+        _session: "Session"
+        if self.is_scoped:
+            if self.scopefunc is not None:
+                # a custom `scopefunc` may depend on the active request
+                _REQUEST_CONTEXT.set(request)
+            # reinit the session, this only requires invoking it like a function to modify in-place
+            _session = self.sa_session_scoped()
+        else:
+            # the session belongs to the container, so concurrent requests
+            # on a threaded server never share it
+            _session = self.sa_sessionmaker()
+            dbSessionsContainer._sessions[self.engine_name] = _session
+        # stash the active Pyramid `request` into the SQLAlchemy "info" dict.
+        _session.info["request"] = request
+        if self.track_query_stats:
+            _stats = dbSessionsContainer._stats.get(self.engine_name)
+            if _stats is None:
+                _stats = dbSessionsContainer._stats[self.engine_name] = EngineStats()
+            _session.info[instrumentation.STATS_KEY] = _stats
+        _session_start_policy = self.session_start_policy
+        if _session_start_policy == "rollback":
+            _session.rollback()
+        elif _session_start_policy == "verify":
+            # new and deleted objects imply a transaction, via autobegin
+            if _session.in_transaction() or _session.identity_map.check_modified():
+                _session.rollback()
+        return _session
 
     def request_end(
         self,
@@ -279,20 +498,308 @@ class EngineWrapper(object):
         # remove no matter what
         if self.is_scoped:
             self.sa_session_scoped.remove()
+        elif dbSessionsContainer is not None:
+            _session = dbSessionsContainer._sessions.get(self.engine_name)
+            if _session is not None:
+                _session.close()
         else:
             self.sa_session.close()
 
-    def dispose(self):
+    def dispose(self, close: bool = True):
         """
         Exposes SQLAlchemy's ``Engine.dispose``;
         needed for fork-like operations.
+
+        :param close: boolean. default ``True``.  If ``False``, the connections
+            of the old pool are de-referenced without being closed; this must
+            be used in a forked child, as the parent still uses them.
         """
         if __debug__:
             log.debug("EngineWrapper[%s].dispose" % self.engine_name)
-        self.sa_engine.dispose()
+        self.sa_engine.dispose(close=close)
+
+    def _dispose_after_fork(self) -> None:
+        """
+        Replaces the pool(s) inherited from the parent process, without closing
+        the parent's connections.
+        """
+        if __debug__:
+            log.debug(
+                "EngineWrapper[%s] | new process %s; disposing the pool",
+                self.engine_name,
+                os.getpid(),
+            )
+        self.dispose(close=False)
+        self._pid = os.getpid()
+
+
+class EngineGroupWrapper(EngineWrapper):
+    """
+    wraps an ``EngineGroup`` of SQLAlchemy engines under a single engine name.
+
+    The Session is bound to the group's first member by default. When the
+    Session is started for a request, a member is selected by the group and
+    the Session is bound to it for the remainder of the request.  The
+    selection is recorded in ``DbSessionsContainer._engine_selections``.
+
+    If the group has no healthy members, the Session of the group's
+    ``fallback_engine`` is returned instead; this engine is then recorded as
+    the selection, and pinned for the remainder of the request, and the
+    group's own Session is not started.
+    """
+
+    engine_group: "EngineGroup"
+
+    def __init__(
+        self,
+        engine_name: str,
+        engine_group: "EngineGroup",
+    ):
+        EngineWrapper.__init__(self, engine_name, engine_group.primary_engine)
+        self.engine_group = engine_group
+
+    def _request_start(
+        self,
+        request: "Request",
+        dbSessionsContainer: "DbSessionsContainer",
+        force: bool = False,
+    ) -> "TYPES_SESSION":
+        _engine_status = dbSessionsContainer._engine_status_tracker.engines.get(
+            self.engine_name
+        )
+        if (_engine_status is None) or (_engine_status == STATUS_CODES.INIT):
+            _selected = dbSessionsContainer._engine_selections.get(self.engine_name)
+            if (_selected is not None) and (_selected not in self.engine_group.engines):
+                # pinned to the fallback engine by an earlier access
+                return dbSessionsContainer._get_initialized_session(_selected)
+            member_name = self.engine_group.select()
+            if member_name is None:
+                fallback_engine = self.engine_group.fallback_engine
+                assert fallback_engine is not None
+                log.warning(
+                    "EngineGroupWrapper[%s] | no healthy members, using `%s`",
+                    self.engine_name,
+                    fallback_engine,
+                )
+                dbSessionsContainer._engine_selections[self.engine_name] = (
+                    fallback_engine
+                )
+                return dbSessionsContainer._get_initialized_session(fallback_engine)
+            if __debug__:
+                log.debug(
+                    "EngineGroupWrapper[%s].request_start() | selected `%s`",
+                    self.engine_name,
+                    member_name,
+                )
+            dbSessionsContainer._engine_selections[self.engine_name] = member_name
+        return EngineWrapper._request_start(
+            self, request, dbSessionsContainer, force=force
+        )
+
+    def _session_init(
+        self,
+        request: "Request",
+        dbSessionsContainer: "DbSessionsContainer",
+    ) -> "Session":
+        _session = EngineWrapper._session_init(self, request, dbSessionsContainer)
+        member_name = dbSessionsContainer._engine_selections[self.engine_name]
+        _session.bind = self.engine_group.engines[member_name]
+        return _session
+
+    def _iter_sa_engines(self) -> Iterator[Tuple[str, "Engine"]]:
+        """yields the (member name, SQLAlchemy engine) of every group member"""
+        for member_name, sa_engine in self.engine_group.engines.items():
+            yield (member_name, sa_engine)
+
+    def dispose(self, close: bool = True):
+        """
+        Exposes SQLAlchemy's ``Engine.dispose`` for every member of the group;
+        needed for fork-like operations.
+
+        :param close: boolean. default ``True``.  See ``EngineWrapper.dispose``.
+        """
+        if __debug__:
+            log.debug("EngineGroupWrapper[%s].dispose" % self.engine_name)
+        for _name, sa_engine in self._iter_sa_engines():
+            sa_engine.dispose(close=close)
+
+
+# track the registration of `register_fork_hook` (GLOBAL)
+_FORK_HOOK: Dict[str, bool] = {"registered": False}
+
+# the `warmup_connections` and `warmup_timeout` of each engine initialized with
+# a warmup, until ``warmup_engines`` is invoked
+_WARMUP_PENDING: Dict[str, Tuple[int, Optional[float]]] = {}
+
 
+def _after_fork_in_child() -> None:
+    """
+    The ``os.register_at_fork(after_in_child=)`` hook of ``register_fork_hook``
+    """
+    for wrapped_engine in list(_ENGINE_REGISTRY["engines"].values()):
+        wrapped_engine._dispose_after_fork()
+
+
+def register_fork_hook() -> bool:
+    """
+    Registers an ``os.register_at_fork(after_in_child=...)`` hook, which
+    replaces the pools of every engine in a forked child without closing the
+    parent's connections. The hook is only registered once.
+
+    Without the hook, each ``EngineWrapper`` still detects a new process on
+    the first Session start, and replaces its pool(s) then.
+
+    Returns ``False`` if the platform does not support ``os.register_at_fork``.
+    """
+    if _FORK_HOOK["registered"]:
+        return True
+    if not hasattr(os, "register_at_fork"):
+        log.info("pyramid_sqlassist: `os.register_at_fork` is not available")
+        return False
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+    _FORK_HOOK["registered"] = True
+    return True
 
-def reinit_engine(engine_name: str = "!all") -> None:
+
+def _warmup_sa_engine(
+    sa_engine: "Engine",
+    connections: int,
+    deadline: Optional[float],
+) -> int:
+    """
+    Opens up to ``connections`` connections on the engine's pool, then returns
+    them to the pool.  Returns the number of connections opened.
+
+    Only pools with a ``size()`` (``QueuePool``) are warmed, and never past
+    that size; overflow connections would be discarded on checkin.
+
+    :param sa_engine: A SQLAlchemy ``Engine``.
+    :param connections: int. The number of connections to open.
+    :param deadline: float. A ``time.monotonic()`` value; no connections are
+        opened after it.
+    """
+    _size = getattr(sa_engine.pool, "size", None)
+    if not callable(_size):
+        return 0
+    connections = min(connections, _size())
+    opened = []
+    try:
+        for _i in range(connections):
+            if (deadline is not None) and (time.monotonic() >= deadline):
+                break
+            opened.append(sa_engine.raw_connection())
+    except Exception as exc:
+        log.warning("pyramid_sqlassist: warmup failed for `%s`: %r", sa_engine, exc)
+    finally:
+        for _connection in opened:
+            _connection.close()
+    return len(opened)
+
+
+def warmup_engine(
+    engine_name: str = "!all",
+    connections: int = 1,
+    timeout: Optional[float] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Opens ``connections`` connections on the pool of an engine (or of every
+    engine, by default) and returns them to the pool, so the first requests
+    do not pay to connect.
+
+    Engines, and the members of an ``EngineGroup``, are warmed in parallel.
+    Errors are logged, not raised.
+
+    Returns a dict of engine name to a dict of engine (or group member) name
+    to the number of connections opened.
+
+    :param engine_name: string. default ``!all``.
+    :param connections: int. default ``1``.  Capped at each pool's ``size()``.
+    :param timeout: float. default ``None``.  Overall timeout, in seconds.
+        Connections which are being opened when it expires are returned to
+        the pool in the background.
+    """
+    if engine_name == "!all":
+        engine_names = list(_ENGINE_REGISTRY["engines"].keys())
+    elif engine_name not in _ENGINE_REGISTRY["engines"]:
+        raise KeyError("No engine named `%s`" % engine_name)
+    else:
+        engine_names = [engine_name]
+    return _warmup({i: connections for i in engine_names}, timeout)
+
+
+def warmup_engines() -> Dict[str, Dict[str, int]]:
+    """
+    Warms the pools of every engine which was initialized with
+    ``warmup_connections`` and has not been warmed yet.  The engines are warmed
+    in parallel, under the longest of their ``warmup_timeout``.
+
+    ``register_request_method`` registers this as a Pyramid configuration
+    action, so it runs once the configuration is committed; otherwise it
+    must be invoked by the application after the engines are initialized.
+
+    Returns the same results as ``warmup_engine``.
+    """
+    pending = {
+        k: v for (k, v) in _WARMUP_PENDING.items() if k in _ENGINE_REGISTRY["engines"]
+    }
+    _WARMUP_PENDING.clear()
+    timeout = None
+    if pending and all((v[1] is not None) for v in pending.values()):
+        timeout = max(v[1] for v in pending.values() if v[1] is not None)
+    return _warmup({k: v[0] for (k, v) in pending.items()}, timeout)
+
+
+def _warmup(
+    engine_connections: Dict[str, int],
+    timeout: Optional[float],
+) -> Dict[str, Dict[str, int]]:
+    """
+    Warms the pools of the engines in parallel; see ``warmup_engine``.
+
+    :param engine_connections: dict. engine name to the number of connections.
+    :param timeout: float. Overall timeout, in seconds.
+    """
+    deadline = (time.monotonic() + timeout) if (timeout is not None) else None
+    jobs = []
+    for _engine_name, connections in engine_connections.items():
+        if connections < 1:
+            continue
+        wrapped_engine = _ENGINE_REGISTRY["engines"][_engine_name]
+        for _name, sa_engine in wrapped_engine._iter_sa_engines():
+            jobs.append((_engine_name, _name, sa_engine, connections))
+    results: Dict[str, Dict[str, int]] = {i: {} for i in engine_connections}
+    if not jobs:
+        return results
+    executor = ThreadPoolExecutor(
+        max_workers=len(jobs), thread_name_prefix="sqlassist-warmup"
+    )
+    try:
+        futures = {
+            executor.submit(_warmup_sa_engine, sa_engine, connections, deadline): (
+                _engine_name,
+                _name,
+            )
+            for (_engine_name, _name, sa_engine, connections) in jobs
+        }
+        done, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            log.warning(
+                "pyramid_sqlassist: warmup timed out for `%s`",
+                ",".join("%s:%s" % futures[f] for f in not_done),
+            )
+        for future in done:
+            _engine_name, _name = futures[future]
+            results[_engine_name][_name] = future.result()
+    finally:
+        executor.shutdown(wait=False)
+    return results
+
+
+def reinit_engine(
+    engine_name: str = "!all",
+    warmup_connections: int = 0,
+    warmup_timeout: Optional[float] = None,
+) -> None:
     """
     Calls ``dispose`` on all registered engines, instructing SQLAlchemy to drop
     the connection pool and begin a new one.
@@ -300,15 +807,26 @@ def reinit_engine(engine_name: str = "!all") -> None:
     This is useful as a "postfork" hook in uwsgi or other frameworks, under which
     there can be issues with database connections due to forking (threads or processes).
 
-    By default this will call dispose on all engines.
+    By default this will call dispose on all engines.  If the engine is an
+    ``EngineGroup``, dispose will be called on every member of the group.
 
     reference:
          SQLAlchemy Documentation: How do I use engines / connections / sessions with Python multiprocessing, or os.fork()?
              http://docs.sqlalchemy.org/en/latest/faq/connections.html#how-do-i-use-engines-connections-sessions-with-python-multiprocessing-or-os-fork
+
+    :param engine_name: string. default ``!all``.
+    :param warmup_connections: int. default ``0``.  If set, the new pools are
+        warmed with this many connections; see ``warmup_engine``.
+    :param warmup_timeout: float. default ``None``.  Overall timeout for the
+        warmup, in seconds.
     """
     if engine_name == "!all":
         for _engine_name in _ENGINE_REGISTRY["engines"].keys():
             reinit_engine(_engine_name)
+        if warmup_connections:
+            warmup_engine(
+                "!all", connections=warmup_connections, timeout=warmup_timeout
+            )
         return
     if engine_name not in _ENGINE_REGISTRY["engines"]:
         log.info("pyramid_sqlassist: reinit_engine ERROR")
@@ -320,11 +838,15 @@ def reinit_engine(engine_name: str = "!all") -> None:
         raise KeyError("No engine named `%s`" % engine_name)
     wrapped_engine = _ENGINE_REGISTRY["engines"][engine_name]
     wrapped_engine.dispose()
+    if warmup_connections:
+        warmup_engine(
+            engine_name, connections=warmup_connections, timeout=warmup_timeout
+        )
 
 
 def initialize_engine(
     engine_name: str,
-    sa_engine: "Engine",
+    sa_engine: Union["Engine", EngineGroup],
     is_default: bool = False,
     use_zope: bool = False,
     sa_sessionmaker_params: Optional[Dict] = None,
@@ -334,11 +856,22 @@ def initialize_engine(
     reflect: bool = False,  # DEPRECATED
     is_configure_mappers: bool = True,
     is_autocommit: Optional[bool] = None,
+    track_query_stats: bool = False,
+    slow_query_threshold: Optional[float] = None,
+    slow_query_redact_params: bool = False,
+    slow_query_stack_sample_rate: float = 0.0,
+    track_pool_metrics: bool = False,
+    session_start_policy: str = "rollback",
+    warmup_connections: int = 0,
+    warmup_timeout: Optional[float] = None,
+    scopefunc: Optional[Callable[[], Hashable]] = None,
 ) -> None:
     """
     Wraps each engine in an ``EngineWrapper``
     Registers each engine into the ``_ENGINE_REGISTRY``
 
+    :param sa_engine: A SQLAlchemy ``Engine``, or an ``EngineGroup`` of them.
+        An ``EngineGroup`` is wrapped in an ``EngineGroupWrapper``.
     :param is_default: boolean. default ``False``.  Used to declare the default engine.
     :param use_zope: boolean. default ``False``.  Enable to use ``zope.sqlalchemy``.
     :param sa_sessionmaker_params: dict. Passed to SQLAlchemy's ``sessionmaker``.
@@ -350,6 +883,34 @@ def initialize_engine(
         are scoped_sessions.
     :param is_configure_mappers: boolean. default `True`.  Will call
         `sqlalchemy.orm.configure_mappers`. Useful as a startup hook.
+    :param track_query_stats: boolean. default `False`.  Record the number of
+        statements, execution time, rows affected and rows returned of each
+        request in ``DbSessionsContainer.stats``.
+    :param slow_query_threshold: float. default `None`.  If set, statements
+        which take longer than this many seconds are logged to the
+        ``pyramid_sqlassist.instrumentation.slow_query`` logger.
+    :param slow_query_redact_params: boolean. default `False`.  Replace the
+        parameter values of slow statements with ``?``.
+    :param slow_query_stack_sample_rate: float. default `0.0`.  The fraction of
+        slow statements, between ``0.0`` and ``1.0``, which also log the stack.
+    :param track_pool_metrics: boolean. default `False`.  Track the connection
+        pool with a ``PoolMetrics``; see ``get_pool_metrics``.
+    :param session_start_policy: string. default `rollback`.  How the Session
+        is reset when it is started for a request; one of
+        ``SESSION_START_POLICIES``:
+            ``rollback``: always call ``Session.rollback()``
+            ``none``: do nothing
+            ``verify``: call ``Session.rollback()`` only if the Session is in
+                a transaction, or has modified objects
+    :param warmup_connections: int. default `0`.  If set, the pool is warmed
+        with this many connections by ``warmup_engines``, together with the
+        other engines; see ``warmup_engine``.
+    :param warmup_timeout: float. default `None`.  Timeout for the warmup, in
+        seconds.
+    :param scopefunc: callable. default `None`.  The ``scopefunc`` of the
+        ``scoped_session``; Sessions are scoped to the current thread by
+        default.  Use ``request_scopefunc`` to scope Sessions to the Pyramid
+        request of the current ``contextvars`` context (greenlets, asyncio).
 
     # NOT WORKING
     :param model_package: package. Pass in the model for inspection. *DEPRECATED*
@@ -361,9 +922,15 @@ def initialize_engine(
 
     if engine_name == "!all":
         raise ValueError("Invalid `engine_name`: `!all` is reserved")
+    if session_start_policy not in SESSION_START_POLICIES:
+        raise ValueError("Invalid `session_start_policy`: `%s`" % session_start_policy)
 
     # configure the engine around a wrapper
-    wrapped_engine = EngineWrapper(engine_name, sa_engine)
+    wrapped_engine: EngineWrapper
+    if isinstance(sa_engine, EngineGroup):
+        wrapped_engine = EngineGroupWrapper(engine_name, sa_engine)
+    else:
+        wrapped_engine = EngineWrapper(engine_name, sa_engine)
 
     # these are some defaults that i once used for writers
     # loggers would autocommit as true
@@ -395,8 +962,19 @@ def initialize_engine(
 
     # this initializes the session
     wrapped_engine.init_sessionmaker(
-        is_scoped, sa_sessionmaker_params, use_zope=use_zope
+        is_scoped, sa_sessionmaker_params, use_zope=use_zope, scopefunc=scopefunc
     )
+    wrapped_engine.session_start_policy = session_start_policy
+    if track_query_stats:
+        wrapped_engine.enable_query_stats()
+    if slow_query_threshold is not None:
+        wrapped_engine.enable_slow_query_log(
+            slow_query_threshold,
+            redact_params=slow_query_redact_params,
+            stack_sample_rate=slow_query_stack_sample_rate,
+        )
+    if track_pool_metrics:
+        wrapped_engine.enable_pool_metrics()
 
     # stash the wrapper
     _ENGINE_REGISTRY["engines"][engine_name] = wrapped_engine
@@ -406,6 +984,12 @@ def initialize_engine(
     if is_configure_mappers:
         sqlalchemy.orm.configure_mappers()
 
+    # warmed by `warmup_engines`, so every engine is warmed in parallel
+    if warmup_connections:
+        _WARMUP_PENDING[engine_name] = (warmup_connections, warmup_timeout)
+    else:
+        _WARMUP_PENDING.pop(engine_name, None)
+
     # finally, reflect if needed
     if reflect:
         raise NotImplementedError
@@ -433,14 +1017,84 @@ def get_wrapped_engine(name: str = "!default") -> "EngineWrapper":
         raise RuntimeError("No engine '%s' was configured" % name)
 
 
+def get_pool_metrics() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Returns a snapshot of the ``PoolMetrics`` of every registered engine which
+    was initialized with ``track_pool_metrics=True``.
+
+    The snapshot is a dict of engine name to a dict of engine (or group member)
+    name to ``PoolMetrics.snapshot()``.
+    """
+    snapshot = {}
+    for engine_name, wrapped_engine in _ENGINE_REGISTRY["engines"].items():
+        if wrapped_engine.pool_metrics is None:
+            continue
+        snapshot[engine_name] = {
+            _name: _metrics.snapshot()
+            for (_name, _metrics) in wrapped_engine.pool_metrics.items()
+        }
+    return snapshot
+
+
+def get_pool_metrics_prometheus() -> str:
+    """
+    Returns ``get_pool_metrics`` in the Prometheus text exposition format.
+    """
+    return format_prometheus(get_pool_metrics())
+
+
+def enable_read_your_writes(
+    reader_engine: str = "reader",
+    writer_engine: str = "writer",
+    store: Optional[ReadYourWritesStore] = None,
+    window: float = 5.0,
+) -> ReadYourWrites:
+    """
+    Enables read-your-writes stickiness: after a Session of ``writer_engine``
+    commits changes, ``reader_engine`` resolves to the writer's Session for
+    ``window`` seconds.
+
+    This must be invoked after both engines are initialized.
+
+    :param reader_engine: string. default ``reader``
+    :param writer_engine: string. default ``writer``
+    :param store: ``ReadYourWritesStore``. Tracks the sticky window.
+        default ``CookieReadYourWritesStore()``
+    :param window: float. default ``5.0``. Seconds the reader is sticky.
+    """
+    if store is None:
+        store = CookieReadYourWritesStore(max_window=window)
+    elif isinstance(store, CookieReadYourWritesStore) and (store.max_window < window):
+        raise ValueError("`window` exceeds the `max_window` of the `store`")
+    wrapped_reader = get_wrapped_engine(reader_engine)
+    wrapped_writer = get_wrapped_engine(writer_engine)
+    read_your_writes = ReadYourWrites(reader_engine, writer_engine, store, window)
+    read_your_writes.listen(wrapped_writer.sa_sessionmaker)
+    wrapped_reader.read_your_writes = read_your_writes
+    return read_your_writes
+
+
 def get_session(engine_name: str) -> "TYPES_SESSION":
     """
     Wraps get_wrapped_engine and returns the sa_session_scoped
 
+    Non-scoped engines return a single Session shared by the process, and not
+    the Session of the active request.  This use is deprecated; use the
+    ``DbSessionsContainer`` instead.
+
     :param engine_name: string. Name of the wrapped engine to get the ``.session`` from.
     """
-    session = get_wrapped_engine(engine_name).session
-    return session
+    wrapped_engine = get_wrapped_engine(engine_name)
+    if wrapped_engine.is_scoped:
+        return wrapped_engine.sa_session_scoped
+    warnings.warn(
+        "`get_session` is deprecated for non-scoped engines; "
+        "it is not the request's Session. "
+        "Use the `DbSessionsContainer` instead.",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    return wrapped_engine.sa_session
 
 
 def request_cleanup(
@@ -452,14 +1106,24 @@ def request_cleanup(
 
     This was a cleanup activity once-upon-a-time
 
+    If a ``DbSessionsContainer`` is submitted, only the engines it started are
+    cleaned up (in the order they were started); otherwise every registered
+    engine is visited.
+
     :param request: The active Pyramid `Request` instance.
     :param dbSessionsContainer: An instance of ``DbSessionsContainer``
     """
     if __debug__:
         log.debug("request_cleanup()")
-    for engine_name in _ENGINE_REGISTRY["engines"].keys():
-        _engine = get_wrapped_engine(engine_name)
-        _engine.request_end(request, dbSessionsContainer=dbSessionsContainer)
+    if dbSessionsContainer is not None:
+        for _engine in dbSessionsContainer._engines_started:
+            _engine.request_end(request, dbSessionsContainer=dbSessionsContainer)
+    else:
+        for engine_name in _ENGINE_REGISTRY["engines"].keys():
+            _engine = get_wrapped_engine(engine_name)
+            _engine.request_end(request, dbSessionsContainer=dbSessionsContainer)
+    if _REQUEST_CONTEXT.get() is request:
+        _REQUEST_CONTEXT.set(None)
 
 
 def _ensure_cleanup(
@@ -469,18 +1133,19 @@ def _ensure_cleanup(
     """
     Ensures we have a cleanup action.
 
+    If a ``DbSessionsContainer`` is submitted, the callback is deduplicated by
+    the container's ``_cleanup_registered`` flag.
+
     :param request: The active Pyramid `Request` instance.
     :param dbSessionsContainer: An instance of ``DbSessionsContainer``
     """
-    if request_cleanup not in request.finished_callbacks:
-        if dbSessionsContainer is not None:
-
-            def f_cleanup(req: "Request"):
-                request_cleanup(req, dbSessionsContainer=dbSessionsContainer)
-
-            request.add_finished_callback(f_cleanup)
-        else:
-            request.add_finished_callback(request_cleanup)
+    if dbSessionsContainer is not None:
+        if dbSessionsContainer._cleanup_registered:
+            return
+        dbSessionsContainer._cleanup_registered = True
+        request.add_finished_callback(dbSessionsContainer._request_cleanup)
+    elif request_cleanup not in request.finished_callbacks:
+        request.add_finished_callback(request_cleanup)
 
 
 class DbSessionsContainer(object):
@@ -489,7 +1154,7 @@ class DbSessionsContainer(object):
 
     This is used to store, access and manage SQLAlchemy/SQLAssist
 
-    -- on __init__, it attaches a sqlassist.cleanup_callback to the request
+    -- on the first session start, it attaches a cleanup callback to the request
     -- it creates, inits, and stores database sessions
     -- it provides memoized accessors for the database sessions; everything is lazily handled
 
@@ -510,30 +1175,53 @@ class DbSessionsContainer(object):
         when setting up an object, utilize dbSession.get_reader and memoize the reader connection
     """
 
+    _cleanup_registered: bool = False
+    _engine_selections: Dict[str, str]
     _engine_status_tracker: "EngineStatusTracker"
+    _engines_started: List["EngineWrapper"]
     _request: "Request"
+    _sessions: Dict[str, "Session"]
+    _stats: Dict[str, "EngineStats"]
 
     def __init__(self, request: "Request"):
         """
         :param request: The active Pyramid `Request` instance.
         """
         self._request = request
+        self._engine_selections = {}
+        self._engines_started = []
+        self._sessions = {}
+        self._stats = {}
 
         # build a tracker
         _engine_status_tracker = EngineStatusTracker()
         for engine_name in _ENGINE_REGISTRY["engines"].keys():
             _engine_status_tracker.engines[engine_name] = STATUS_CODES.INIT
         self._engine_status_tracker = _engine_status_tracker
-        # register our cleanup
-        _ensure_cleanup(request, self)
+        # the cleanup is registered by ``EngineWrapper.request_start``
+
+    def _request_cleanup(self, request: "Request") -> None:
+        """
+        The finished callback registered by ``_ensure_cleanup``.
+
+        :param request: The active Pyramid `Request` instance.
+        """
+        request_cleanup(request, dbSessionsContainer=self)
+
+    @property
+    def stats(self) -> Dict[str, "EngineStats"]:
+        """
+        The ``EngineStats`` of each started engine which was initialized with
+        ``track_query_stats=True``, keyed by engine name.
+        """
+        return self._stats
 
     def _get_initialized_session(self, engine_name: str) -> "TYPES_SESSION":
         """
         :param engine_name: string. Name of the wrapped engine.
         """
         _engine = get_wrapped_engine(engine_name)
-        _engine.request_start(self._request, self)
-        _session = _engine.session
+        _session = _engine.request_start(self._request, self)
         return _session
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -612,15 +1300,116 @@ class DbSessionsContainer(object):
         raise ValueError("No session available.")
 
 
+class _EngineSessionAccessor(object):
+    """
+    Memoized accessor for the session of a single engine.
+
+    Instances are bound directly to an ``EngineWrapper`` when a container class
+    is generated by ``generate_container_class``, so accessing the session does
+    not require a lookup in the ``_ENGINE_REGISTRY``.  Like Pyramid's ``@reify``
+    this is a non-data descriptor; the session is stored in the instance
+    ``__dict__`` on first access and subsequent access bypasses the descriptor.
+    """
+
+    __slots__ = ("engine_name", "wrapped_engine")
+
+    engine_name: str
+    wrapped_engine: Union["EngineWrapper", "AsyncEngineWrapper"]
+
+    def __init__(
+        self,
+        engine_name: str,
+        wrapped_engine: Union["EngineWrapper", "AsyncEngineWrapper"],
+    ):
+        """
+        :param engine_name: string. Name of the wrapped engine.
+        :param wrapped_engine: The ``EngineWrapper`` to bind to.
+        """
+        self.engine_name = engine_name
+        self.wrapped_engine = wrapped_engine
+
+    def __get__(self, inst: Optional[Any], objtype=None) -> Any:
+        if inst is None:
+            return self
+        _session = self.wrapped_engine.request_start(inst._request, inst)
+        inst.__dict__[self.engine_name] = _session
+        return _session
+
+
+def generate_container_class(
+    dbContainerClass: Type[DbSessionsContainer] = DbSessionsContainer,
+) -> Type[DbSessionsContainer]:
+    """
+    Generates a subclass of ``dbContainerClass`` with a memoized accessor for
+    every engine currently in the ``_ENGINE_REGISTRY``.
+
+    Each accessor is bound directly to the engine's ``EngineWrapper``; this
+    should be invoked after all the engines have been initialized.
+
+    Attributes which are already defined by ``dbContainerClass`` (or one of its
+    bases) are not replaced, with the exception of the stock ``reader``,
+    ``writer`` and ``logger`` accessors on ``DbSessionsContainer``.
+
+    :param dbContainerClass: class. default ``DbSessionsContainer``
+    """
+    return _generate_container_class(
+        dbContainerClass, _ENGINE_REGISTRY["engines"], DbSessionsContainer
+    )
+
+
+def _generate_container_class(
+    dbContainerClass: Type,
+    engines: Dict[str, Any],
+    stock_class: Type,
+) -> Type:
+    """
+    Implements ``generate_container_class``; also used for async containers.
+
+    :param dbContainerClass: class. The class to subclass.
+    :param engines: dict. engine name to wrapped engine.
+    :param stock_class: class. Accessors defined by this class may be replaced.
+    """
+    accessors = {}
+    for engine_name, wrapped_engine in engines.items():
+        _existing = None
+        for _klass in dbContainerClass.__mro__:
+            if engine_name in _klass.__dict__:
+                _existing = _klass.__dict__[engine_name]
+                break
+        if (_existing is not None) and (
+            _existing is not stock_class.__dict__.get(engine_name)
+        ):
+            if __debug__:
+                log.debug(
+                    "generate_container_class() | `%s` is already defined on `%s`",
+                    engine_name,
+                    dbContainerClass.__name__,
+                )
+            continue
+        accessors[engine_name] = _EngineSessionAccessor(engine_name, wrapped_engine)
+    generated = type(dbContainerClass.__name__, (dbContainerClass,), accessors)
+    generated.__module__ = dbContainerClass.__module__
+    generated.__qualname__ = dbContainerClass.__qualname__
+    return generated
+
+
 def register_request_method(
     config: "Configurator",
     request_method_name: str,
     dbContainerClass=DbSessionsContainer,
+    generate_accessors: bool = True,
 ) -> None:
     """
     ``register_request_method`` invokes Pyramid's ``add_request_method`` and
     stashes some information to enable ``debugtoolbar`` support.
 
+    By default, a subclass of ``dbContainerClass`` is generated via
+    ``generate_container_class`` with a memoized accessor for every registered
+    engine.  Engines must be initialized before this is invoked.
+
+    The engines initialized with ``warmup_connections`` are warmed by
+    ``warmup_engines`` when the configuration is committed.
+
     usage:
 
         def initialize_database(config, settings, is_scoped=None):
@@ -631,9 +1420,13 @@ def register_request_method(
     :param config: object. Pyramid config object
     :param request_method_name: string. name to be registered as Pyramid ``request`` attribute
     :param dbContainerClass: class. class to be registered for Pyramid ``request`` attribute. default ``DbSessionsContainer``
+    :param generate_accessors: boolean. default ``True``.  Generate accessors for all registered engines.
     """
+    if generate_accessors:
+        dbContainerClass = generate_container_class(dbContainerClass)
     config.registry.pyramid_sqlassist = {"request_method_name": request_method_name}
     config.add_request_method(dbContainerClass, request_method_name, reify=True)
+    config.action(None, warmup_engines)
 
 
 # ==============================================================================
@@ -644,15 +1437,25 @@ __all__ = (
     "_metadata",
     "DbSessionsContainer",
     "DeclaredTable",
+    "enable_read_your_writes",
+    "EngineGroupWrapper",
     "EngineStatusTracker",
     "EngineWrapper",
+    "generate_container_class",
+    "get_pool_metrics",
+    "get_pool_metrics_prometheus",
     "get_session",
     "get_wrapped_engine",
     "initialize_engine",
     "NAMING_CONVENTION",
+    "register_fork_hook",
     "register_request_method",
     "reinit_engine",
     "request_cleanup",
+    "request_scopefunc",
+    "SESSION_START_POLICIES",
     "SQLASSIST_DISABLE_TRANSACTION",
     "STATUS_CODES",
+    "warmup_engine",
+    "warmup_engines",
 )
@@ -0,0 +1,310 @@
+# stdlib
+import logging
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+# pypi
+import sqlalchemy
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine.base import Engine
+    from sqlalchemy.pool import Pool
+
+# ==============================================================================
+
+log = logging.getLogger(__name__)
+
+
+# seconds
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+)
+
+_CONNECT_START_KEY = "sqlassist.metrics.connect_start"
+
+
+class Histogram(object):
+    """
+    A cumulative histogram, in the style of a Prometheus histogram.
+
+    Not threadsafe; ``PoolMetrics`` guards its histograms with a lock.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    buckets: Tuple[float, ...]
+    counts: List[int]
+    count: int
+    sum: float
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        :param buckets: The upper bounds of the buckets, ascending.
+            An implicit ``+Inf`` bucket is always present.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        :param value: float.
+        """
+        self.count += 1
+        self.sum += value
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the histogram as a dict; the bucket counts are cumulative.
+        """
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+class PoolMetrics(object):
+    """
+    Tracks the connection pool of a SQLAlchemy ``Engine`` with pool events.
+
+    The checkout wait is measured around ``Pool.connect``, and includes the
+    time to open a new connection when the pool must do so.  The wrapper is
+    re-installed on the new pool after ``Engine.dispose()``.
+    """
+
+    sa_engine: "Engine"
+    checkouts: int
+    checkins: int
+    invalidations: int
+    checkout_timeouts: int
+    checkout_wait: Histogram
+    connect_time: Histogram
+
+    def __init__(
+        self,
+        sa_engine: "Engine",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        :param sa_engine: A SQLAlchemy ``Engine``.
+        :param buckets: The upper bounds of the histogram buckets, in seconds.
+        """
+        self.sa_engine = sa_engine
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait = Histogram(buckets)
+        self.connect_time = Histogram(buckets)
+        self._lock = threading.Lock()
+
+    def listen(self) -> None:
+        """
+        Attaches the pool listeners; pool events on an ``Engine`` persist across
+        ``Engine.dispose()``.
+        """
+        sa_engine = self.sa_engine
+        sqlalchemy.event.listen(sa_engine, "checkout", self._on_checkout)
+        sqlalchemy.event.listen(sa_engine, "checkin", self._on_checkin)
+        sqlalchemy.event.listen(sa_engine, "invalidate", self._on_invalidate)
+        sqlalchemy.event.listen(sa_engine, "soft_invalidate", self._on_invalidate)
+        sqlalchemy.event.listen(sa_engine, "do_connect", self._on_do_connect)
+        sqlalchemy.event.listen(sa_engine, "connect", self._on_connect)
+        sqlalchemy.event.listen(sa_engine, "engine_disposed", self._on_disposed)
+        self._install_timer(sa_engine.pool)
+
+    def _install_timer(self, pool: "Pool") -> None:
+        _connect = pool.connect
+
+        def connect():
+            _started = time.perf_counter()
+            try:
+                return _connect()
+            except sqlalchemy.exc.TimeoutError:
+                with self._lock:
+                    self.checkout_timeouts += 1
+                raise
+            finally:
+                _waited = time.perf_counter() - _started
+                with self._lock:
+                    self.checkout_wait.observe(_waited)
+
+        pool.connect = connect  # type: ignore[method-assign]
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_do_connect(self, dialect, connection_record, cargs, cparams):
+        connection_record.info[_CONNECT_START_KEY] = time.perf_counter()
+        # returning `None` lets the dialect connect
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        _started = connection_record.info.pop(_CONNECT_START_KEY, None)
+        if _started is not None:
+            _elapsed = time.perf_counter() - _started
+            with self._lock:
+                self.connect_time.observe(_elapsed)
+
+    def _on_disposed(self, sa_engine: "Engine"):
+        # `Engine.dispose()` replaced the pool
+        self._install_timer(sa_engine.pool)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the metrics as a dict.
+
+        ``pool_size`` and ``overflow`` are ``None`` for pools which do not
+        support them.
+        """
+        pool = self.sa_engine.pool
+        # only `QueuePool` (and its subclasses) implement these
+        _size = getattr(pool, "size", None)
+        _overflow = getattr(pool, "overflow", None)
+        _checkedout = getattr(pool, "checkedout", None)
+        pool_size: Optional[int] = _size() if callable(_size) else None
+        overflow: Optional[int] = _overflow() if callable(_overflow) else None
+        with self._lock:
+            if callable(_checkedout):
+                checked_out = _checkedout()
+            else:
+                checked_out = self.checkouts - self.checkins
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "checked_out": checked_out,
+                "pool_size": pool_size,
+                "overflow": overflow,
+                "invalidations": self.invalidations,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait": self.checkout_wait.snapshot(),
+                "connect_time": self.connect_time.snapshot(),
+            }
+
+
+# (key, name, type, help)
+_PROMETHEUS_METRICS = (
+    ("checkouts", "checkouts_total", "counter", "Connections checked out of the pool."),
+    ("checkins", "checkins_total", "counter", "Connections checked in to the pool."),
+    (
+        "checked_out",
+        "checked_out",
+        "gauge",
+        "Connections currently checked out of the pool.",
+    ),
+    ("pool_size", "size", "gauge", "The configured size of the pool."),
+    ("overflow", "overflow", "gauge", "The current overflow of the pool."),
+    ("invalidations", "invalidations_total", "counter", "Connections invalidated."),
+    (
+        "checkout_timeouts",
+        "checkout_timeouts_total",
+        "counter",
+        "Checkouts which timed out.",
+    ),
+    (
+        "checkout_wait",
+        "checkout_wait_seconds",
+        "histogram",
+        "Seconds waited for a pool checkout.",
+    ),
+    (
+        "connect_time",
+        "connect_seconds",
+        "histogram",
+        "Seconds spent opening new connections.",
+    ),
+)
+
+
+def _prometheus_labels(labels: Dict[str, str]) -> str:
+    return ",".join(
+        '%s="%s"'
+        % (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for (k, v) in labels.items()
+    )
+
+
+def format_prometheus(
+    snapshot: Dict[str, Dict[str, Dict[str, Any]]],
+    prefix: str = "sqlassist_pool_",
+) -> str:
+    """
+    Formats a snapshot from ``get_pool_metrics`` in the Prometheus text
+    exposition format.
+
+    :param snapshot: dict. engine name to member name to ``PoolMetrics.snapshot()``
+    :param prefix: string. default ``sqlassist_pool_``.
+    """
+    lines = []
+    for key, name, _type, _help in _PROMETHEUS_METRICS:
+        name = prefix + name
+        lines.append("# HELP %s %s" % (name, _help))
+        lines.append("# TYPE %s %s" % (name, _type))
+        for engine_name, members in snapshot.items():
+            for member_name, metrics in members.items():
+                value = metrics[key]
+                labels = {"engine": engine_name, "member": member_name}
+                if _type == "histogram":
+                    for bound, count in value["buckets"]:
+                        lines.append(
+                            '%s_bucket{%s,le="%r"} %s'
+                            % (name, _prometheus_labels(labels), bound, count)
+                        )
+                    lines.append(
+                        '%s_bucket{%s,le="+Inf"} %s'
+                        % (name, _prometheus_labels(labels), value["count"])
+                    )
+                    lines.append(
+                        "%s_sum{%s} %r"
+                        % (name, _prometheus_labels(labels), value["sum"])
+                    )
+                    lines.append(
+                        "%s_count{%s} %s"
+                        % (name, _prometheus_labels(labels), value["count"])
+                    )
+                elif value is not None:
+                    lines.append(
+                        "%s{%s} %s" % (name, _prometheus_labels(labels), value)
+                    )
+    return "\n".join(lines) + "\n"
+
+
+# ==============================================================================
+
+__all__ = (
+    "Histogram",
+    "PoolMetrics",
+    "format_prometheus",
+)
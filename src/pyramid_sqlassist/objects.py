@@ -1,25 +1,49 @@
 # stdlib
+import base64
+import datetime
+import decimal
+import itertools
+import json
 import logging
+import operator
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Generator
+from typing import Hashable
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import overload
+from typing import Sequence
 from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
+import uuid
 
 # pypi
 import sqlalchemy
+from sqlalchemy.dialects import postgresql as sa_postgresql
+from sqlalchemy.dialects import sqlite as sa_sqlite
 from sqlalchemy.orm import class_mapper as sa_class_mapper
 from sqlalchemy.orm import Mapped
+from sqlalchemy.orm.attributes import instance_state
 from sqlalchemy.orm.session import object_session
 import sqlalchemy.sql
+from typing_extensions import Literal
 from typing_extensions import Self
 
+# local
+from .cache import mark_written
+
 if TYPE_CHECKING:
     from pyramid.request import Request
+    from sqlalchemy.orm import Mapper
     from sqlalchemy.orm.session import Session
 
+    from .cache import IdentityCache
+
 # ==============================================================================
 
 
@@ -28,21 +52,381 @@ log = logging.getLogger(__name__)
 # this is used a bit
 func_lower = sqlalchemy.sql.func.lower
 
+# the default number of ids in each `IN (...)` of `get__by__ids`
+IDS_CHUNK_SIZE = 500
+
+# the dialect-specific `insert()` constructs which support `ON CONFLICT`
+_UPSERT_INSERTS: Dict[str, Callable] = {
+    "postgresql": sa_postgresql.insert,
+    "sqlite": sa_sqlite.insert,
+}
+
+# per-class cached statements and resolved columns are stored on each class,
+# in a dict under this attribute
+_PLANS_ATTR = "__sqlassist_plans__"
+
+# plans are keyed by caller-supplied arguments, such as `order_col`; past this
+# many plans per class, new plans are built for each call and not cached
+PLANS_MAX = 256
+
+
+def _class_plans(cls: type) -> Dict[Hashable, Any]:
+    """
+    Returns the dict of cached plans of ``cls``; subclasses do not share their
+    parent's dict.
+    """
+    plans = cls.__dict__.get(_PLANS_ATTR)
+    if plans is None:
+        plans = {}
+        # `type.__setattr__` bypasses the declarative attribute handling
+        type.__setattr__(cls, _PLANS_ATTR, plans)
+    return plans
+
+
+def _get_plan(cls: type, key: Hashable, build: Callable, *args) -> Any:
+    """
+    Returns the cached plan of ``cls`` under ``key``; on a miss it is created
+    with ``build(cls, *args)``.  A plan which fails to build is not cached, nor
+    is any plan once ``cls`` has ``PLANS_MAX`` plans.
+    """
+    plans = _class_plans(cls)
+    try:
+        return plans[key]
+    except KeyError:
+        plan = build(cls, *args)
+        if len(plans) < PLANS_MAX:
+            plans[key] = plan
+        return plan
+
+
+def _normalize_order_col(order_col: str) -> str:
+    """drops repeated column names from ``order_col``; they do not change the order"""
+    return ",".join(dict.fromkeys(order_col.split(",")))
+
+
+def _resolve_id_column(cls: type, id_column: str) -> str:
+    if (
+        not hasattr(cls, id_column)
+        and hasattr(cls, "__table_pkey__")
+        and cls.__table_pkey__ is not None  # type: ignore[attr-defined]
+    ):
+        return cls.__table_pkey__  # type: ignore[attr-defined]
+    return id_column
+
+
+def _python_type(col: Any) -> Optional[type]:
+    """the Python type of a column, or ``None`` if unknown"""
+    try:
+        return col.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _build__get__by__id(
+    cls: type,
+    id_column: str,
+) -> Tuple[Optional[Any], Optional[type]]:
+    """(statement, python type)"""
+    id_column = _resolve_id_column(cls, id_column)
+    col = getattr(cls, id_column)
+    if id_column == _pkey_attribute(cls):
+        # `None` selects `Session.get()`
+        return (None, _python_type(col))
+    return (
+        sqlalchemy.select(cls).where(col == sqlalchemy.bindparam("id")).limit(1),
+        _python_type(col),
+    )
+
+
+def _build__get__by__ids(
+    cls: type,
+    id_column: str,
+) -> Tuple[str, bool, Any, Optional[type]]:
+    """
+    (resolved id_column, use the identity map, statement, python type)
+    """
+    id_column = _resolve_id_column(cls, id_column)
+    col = getattr(cls, id_column)
+    stmt: Any = sqlalchemy.select(cls).where(
+        col.in_(sqlalchemy.bindparam("ids", expanding=True))
+    )
+    # only the primary key can be looked up in the identity map
+    return (id_column, id_column == _pkey_attribute(cls), stmt, _python_type(col))
+
+
+def _coerce_id(id: Hashable, python_type: Optional[type]) -> Hashable:
+    """
+    Coerces ``id`` to the column's Python type (e.g. ``"1"`` to ``1``), so it
+    matches the values loaded from the database.
+    """
+    if (python_type is None) or isinstance(id, python_type):
+        return id
+    try:
+        return python_type(id)
+    except (TypeError, ValueError):
+        return id
+
+
+def _build__get__by__column__lower(cls: type, column_name: str) -> Any:
+    return sqlalchemy.select(cls).where(
+        func_lower(getattr(cls, column_name)) == sqlalchemy.bindparam("search")
+    )
+
+
+# the escape character used by `autoescape`
+_LIKE_ESCAPE = "/"
+
+
+def _escape_like(value: str) -> str:
+    return (
+        value.replace(_LIKE_ESCAPE, _LIKE_ESCAPE * 2)
+        .replace("%", _LIKE_ESCAPE + "%")
+        .replace("_", _LIKE_ESCAPE + "_")
+    )
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Returns the lowest string greater than every string starting with
+    ``prefix`` (in codepoint order), or ``None`` if there is none.
+    """
+    while prefix:
+        codepoint = ord(prefix[-1]) + 1
+        if codepoint <= 0x10FFFF:
+            if 0xD800 <= codepoint <= 0xDFFF:
+                # skip the surrogates, which can not be encoded
+                codepoint = 0xE000
+            return prefix[:-1] + chr(codepoint)
+        prefix = prefix[:-1]
+    return None
+
+
+def _build__get__by__column__similar(
+    cls: type,
+    column_name: str,
+    mode: str,
+    autoescape: bool,
+) -> Any:
+    col = getattr(cls, column_name)
+    lowered = func_lower(col)
+    seed: Any = sqlalchemy.bindparam("seed")
+    escape = _LIKE_ESCAPE if autoescape else None
+    if mode == "range":
+        criteria = sqlalchemy.and_(
+            lowered >= seed, lowered < sqlalchemy.bindparam("seed_next")
+        )
+    elif mode == "range_open":
+        criteria = lowered >= seed
+    elif mode == "prefix":
+        criteria = lowered.startswith(seed, escape=escape)
+    else:
+        criteria = lowered.contains(seed, escape=escape)
+    return sqlalchemy.select(cls).where(criteria).order_by(col.asc())
+
+
+def _build__get__by__column__exact_then_ilike(
+    cls: type,
+    column_name: str,
+) -> Dict[Optional[str], Any]:
+    """
+    The statements for each ``single_query``; ``None`` has a tuple of the
+    exact statement and the ``ilike`` statement.
+    """
+    col = getattr(cls, column_name)
+    seed: Any = sqlalchemy.bindparam("seed")
+    # an exact match is also a case-insensitive match; it is ordered first
+    exact_first = sqlalchemy.case((col == seed, 0), else_=1)
+    return {
+        None: (
+            sqlalchemy.select(cls).where(col == seed).limit(1),
+            sqlalchemy.select(cls).where(col.ilike(seed)).limit(1),
+        ),
+        "ilike": sqlalchemy.select(cls)
+        .where(col.ilike(seed))
+        .order_by(exact_first)
+        .limit(1),
+        "lower": sqlalchemy.select(cls)
+        .where(func_lower(col) == func_lower(seed))
+        .order_by(exact_first)
+        .limit(1),
+    }
+
+
+def _build__get__range(
+    cls: type,
+    order_col: str,
+    sort_direction: str,
+    order_case_sensitive: bool,
+) -> Any:
+    if sort_direction not in ("asc", "desc"):
+        raise ValueError("invalid sort direction")
+    stmt: Any = sqlalchemy.select(cls)
+    for col_name in order_col.split(","):
+        # declared columns do not have cls.__class__.c
+        # reflected columns did in earlier sqlalchemy
+        col = getattr(cls, col_name)
+        if not order_case_sensitive:
+            col = func_lower(col)
+        stmt = stmt.order_by(col.asc() if sort_direction == "asc" else col.desc())
+    return stmt
+
+
+def _build__get__range__keyset(
+    cls: type,
+    order_col: str,
+    sort_direction: str,
+    order_case_sensitive: bool,
+) -> Tuple[Tuple[str, ...], Tuple[Any, ...], Any]:
+    """(key names, key expressions, ordered statement selecting the keys)"""
+    if sort_direction not in ("asc", "desc"):
+        raise ValueError("invalid sort direction")
+    names = order_col.split(",")
+    exprs = []
+    for col_name in names:
+        col = getattr(cls, col_name)
+        exprs.append(col if order_case_sensitive else func_lower(col))
+    # the primary key breaks ties, so every row has a distinct position
+    mapper: "Mapper[Any]" = sa_class_mapper(cls)
+    for col in mapper.primary_key:
+        pkey_name = mapper.get_property_by_column(col).key
+        if pkey_name not in names:
+            names.append(pkey_name)
+            exprs.append(getattr(cls, pkey_name))
+    stmt = sqlalchemy.select(cls, *exprs).order_by(
+        *[(expr.asc() if sort_direction == "asc" else expr.desc()) for expr in exprs]
+    )
+    return (tuple(names), tuple(exprs), stmt)
+
+
+def _cursor_default(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, uuid.UUID):
+        return {"__uuid__": str(value)}
+    raise TypeError("can not encode %r in a keyset cursor" % type(value))
+
+
+def _cursor_object_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        ((key, value),) = obj.items()
+        if key == "__datetime__":
+            return datetime.datetime.fromisoformat(value)
+        if key == "__date__":
+            return datetime.date.fromisoformat(value)
+        if key == "__decimal__":
+            return decimal.Decimal(value)
+        if key == "__uuid__":
+            return uuid.UUID(value)
+    return obj
+
+
+def _encode_keyset_cursor(names: Tuple[str, ...], values: Tuple[Any, ...]) -> str:
+    payload = json.dumps(
+        [list(names), list(values)], default=_cursor_default, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_keyset_cursor(names: Tuple[str, ...], cursor: str) -> Tuple[Any, ...]:
+    try:
+        _names, values = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii")),
+            object_hook=_cursor_object_hook,
+        )
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if _names != list(names) or (len(values) != len(names)):
+        raise ValueError("the cursor does not match `order_col`")
+    return tuple(values)
+
+
+def _build__yield_per_options(cls: type) -> Tuple[Any, ...]:
+    """
+    ``selectinload`` options replacing the eager loaders of ``cls`` which can
+    not be used with ``yield_per``: joined eager collections, which must be
+    uniqued, and subquery eager relationships, which buffer every row.
+    """
+    mapper: "Mapper[Any]" = sa_class_mapper(cls)
+    return tuple(
+        sqlalchemy.orm.selectinload(getattr(cls, rel.key))
+        for rel in mapper.relationships
+        if (rel.lazy == "subquery") or (rel.uselist and (rel.lazy == "joined"))
+    )
+
+
+def _build__columns(cls: type) -> Tuple[Tuple[str, ...], Callable[[Any], Tuple]]:
+    """(column names, a getter which returns a tuple of their values)"""
+    names = tuple(col.name for col in sa_class_mapper(cls).persist_selectable.c)
+    getter: Callable[[Any], Tuple]
+    if len(names) == 1:
+        # `attrgetter` only returns a tuple for several attributes
+        _name = names[0]
+
+        def _getter(obj: Any) -> Tuple:
+            return (getattr(obj, _name),)
+
+        getter = _getter
+    else:
+        getter = operator.attrgetter(*names)
+    return (names, getter)
+
+
+def _pkey_attribute(cls: type) -> Optional[str]:
+    """
+    Returns the attribute name of the primary key of ``cls``, or ``None`` for
+    a composite primary key.
+    """
+    plans = _class_plans(cls)
+    try:
+        return plans["pkey"]
+    except KeyError:
+        pass
+    mapper: "Mapper[Any]" = sa_class_mapper(cls)
+    pkey = None
+    if len(mapper.primary_key) == 1:
+        pkey = mapper.get_property_by_column(mapper.primary_key[0]).key
+    plans["pkey"] = pkey
+    return pkey
+
+
+def _pad_ids(ids: List[Hashable], chunk_size: int) -> List[Hashable]:
+    """
+    Pads ``ids`` to the next power of two (capped at ``chunk_size``) by
+    repeating the last id, so a few ``IN (...)`` statements of distinct lengths
+    are rendered instead of one per length.
+    """
+    count = len(ids)
+    padded = 1
+    while padded < count:
+        padded *= 2
+    padded = min(padded, chunk_size)
+    if padded > count:
+        ids = ids + [ids[-1]] * (padded - count)
+    return ids
+
 
 class CoreObject(object):
     """Core Database Object class/Mixin"""
 
     __table_pkey__: Optional[str] = None
 
+    # opt-in: an `IdentityCache` used by `UtilityObject.get__by__id`
+    __sqlassist_identity_cache__: Optional["IdentityCache"] = None
+
 
 class UtilityObject(CoreObject):
     """
     ``UtilityObject`` is a class that provides some common query methods.
     This is intended to simplify app development and debugging by bootstrapping
-    some common queries which can be used within `pdb` or simple scrips. The
-    functionality provided by this class is best re-written within your app/model
-    as there is a bit of overhead in inspecting the object to build the queries
-    off of the requisite columns.
+    some common queries which can be used within `pdb` or simple scrips.
+
+    The columns and ``select()`` statements of each query are resolved once per
+    class, and arguments (column, options), then cached on the class as
+    ``__sqlassist_plans__``; later calls only bind their values.
     """
 
     if TYPE_CHECKING and False:
@@ -54,59 +438,196 @@ class UtilityObject(CoreObject):
         dbSession: "Session",
         id: Union[str, int],
         id_column: str = "id",
+        use_cache: bool = True,
     ) -> Optional[Self]:
         """
         Classmethod.
 
         Gets an item by an id column named 'id'.  id column can be overriden.
 
+        If ``id_column`` is the primary key, ``Session.get()`` is used, which
+        does not emit SQL for an object already in the Session's identity map.
+        Other columns are queried with a cached ``select()``.
+
+        If the class declares an ``IdentityCache`` as
+        ``__sqlassist_identity_cache__``, and ``id_column`` is the primary key,
+        the cache is consulted and populated on a miss.  An object already in
+        the Session's identity map is always returned as-is.
+
         :param dbSession: The SQLAlchemy ``Session`` to query.
         :param id: The "id" of the object to query. Likely a String or Integer.
         :param id_column: The column hosting the identifier. Default: "id".
+        :param use_cache: Use the class's ``IdentityCache``, if any. Default: ``True``.
         """
-        if (
-            not hasattr(cls, id_column)
-            and hasattr(cls, "__table_pkey__")
-            and cls.__table_pkey__ is not None
-        ):
-            id_column = cls.__table_pkey__
         if isinstance(id, (list, tuple)):
             raise ValueError(
                 "Submitting a list/tuple to `get__by__id` is deprecated. "
                 "Please use `get__by__ids` instead."
             )
+        (stmt, python_type) = _get_plan(
+            cls, ("get__by__id", id_column), _build__get__by__id, id_column
+        )
+        if stmt is not None:
+            return dbSession.execute(stmt, {"id": id}).scalars().unique().first()
+
+        # the identity map and the cache are keyed by the column's type
+        _id = _coerce_id(id, python_type)
+        _cache = cls.__sqlassist_identity_cache__ if use_cache else None
+        # merging the snapshot would overwrite in-Session changes
+        if (_cache is not None) and (
+            sa_class_mapper(cls).identity_key_from_primary_key((_id,))
+            not in dbSession.identity_map
+        ):
+            item = _cache.get(dbSession, cls, _id)
+            if item is not None:
+                return item
+        item = dbSession.get(cls, _id)
+        if (_cache is not None) and (item is not None):
+            _cache.set(dbSession, cls, _id, item)
+        return item
+
+    @classmethod
+    def _iter__by__ids(
+        cls,
+        dbSession: "Session",
+        ids: Iterable[Hashable],
+        id_column: str,
+        chunk_size: int,
+    ) -> Iterator[Tuple[Hashable, Self]]:
+        """
+        Yields ``(id, object)`` for each distinct id found, in input order.
+        """
+        if chunk_size < 1:
+            raise ValueError("`chunk_size` must be at least 1")
+        (id_column, use_identity_map, stmt, python_type) = _get_plan(
+            cls, ("get__by__ids", id_column), _build__get__by__ids, id_column
+        )
+        mapper = sa_class_mapper(cls)
+        identity_map = dbSession.identity_map
+        seen = set()
+        _ids = iter(ids)
+        while True:
+            batch = list(itertools.islice(_ids, chunk_size))
+            if not batch:
+                return
+            # (id as submitted, id coerced to the column's type)
+            chunk = []
+            for _id in batch:
+                _key = _coerce_id(_id, python_type)
+                if _key not in seen:
+                    seen.add(_key)
+                    chunk.append((_id, _key))
+            if not chunk:
+                continue
+            found: Dict[Hashable, List[Self]] = {}
+            missing = [_key for (_id, _key) in chunk]
+            if use_identity_map:
+                missing = []
+                for _id, _key in chunk:
+                    obj = identity_map.get(
+                        mapper.identity_key_from_primary_key((_key,))
+                    )
+                    if (
+                        (obj is not None)
+                        and isinstance(obj, cls)
+                        and not instance_state(obj).expired
+                    ):
+                        found[_key] = [obj]
+                    else:
+                        missing.append(_key)
+            if missing:
+                for obj in (
+                    dbSession.execute(stmt, {"ids": _pad_ids(missing, chunk_size)})
+                    .scalars()
+                    .unique()
+                ):
+                    found.setdefault(getattr(obj, id_column), []).append(obj)
+            for _id, _key in chunk:
+                for obj in found.get(_key, ()):
+                    yield (_id, obj)
+
+    @overload
+    @classmethod
+    def get__by__ids(
+        cls,
+        dbSession: "Session",
+        ids: Iterable[Hashable],
+        id_column: str = ...,
+        chunk_size: int = ...,
+        as_dict: Literal[False] = ...,
+    ) -> List[Self]: ...
 
-        id_dict = {id_column: id}
-        return dbSession.query(cls).filter_by(**id_dict).first()
+    @overload
+    @classmethod
+    def get__by__ids(
+        cls,
+        dbSession: "Session",
+        ids: Iterable[Hashable],
+        id_column: str = ...,
+        chunk_size: int = ...,
+        as_dict: Literal[True] = ...,
+    ) -> Dict[Hashable, Self]: ...
 
     @classmethod
     def get__by__ids(
         cls,
         dbSession: "Session",
-        ids: Union[
-            List[Union[int, str]],
-            Tuple[int, ...],
-            Tuple[str, ...],
-        ],
+        ids: Iterable[Hashable],
         id_column: str = "id",
-    ) -> Optional[List[Self]]:
+        chunk_size: int = IDS_CHUNK_SIZE,
+        as_dict: bool = False,
+    ) -> Union[List[Self], Dict[Hashable, Self]]:
         """
         Classmethod.
 
         Gets items by an id column named 'id'.  id column can be overriden.
 
+        The ids are deduplicated.  If ``id_column`` is the primary key, objects
+        already loaded in the Session's identity map are used as-is; the others
+        are queried with ``IN (...)`` statements of up to ``chunk_size`` ids.
+        Each statement is padded to a power of two, so its SQL is reused.
+
+        Items are returned in the order of ``ids``; ids which are not found are
+        skipped.  Ids are coerced to the column's Python type (e.g. ``"1"`` to
+        ``1``) to be matched to their items; ``as_dict`` is keyed by the ids
+        as submitted.
+
         :param dbSession: The SQLAlchemy ``Session`` to query.
-        :param ids: The "id" of the object to query. Likely a String or Integer.
+        :param ids: An iterable of the "id" of the objects to query.
+            Likely Strings or Integers.
         :param id_column: The column hosting the identifier. Default: "id".
+        :param chunk_size: int. The most ids in one query. Default: ``500``.
+        :param as_dict: boolean. Return a dict of id to item. Default: ``False``.
+
+        See Also: ``iter__by__ids``
         """
-        if (
-            not hasattr(cls, id_column)
-            and hasattr(cls, "__table_pkey__")
-            and cls.__table_pkey__ is not None
-        ):
-            id_column = cls.__table_pkey__
-        id_col = getattr(cls, id_column)
-        return dbSession.query(cls).filter(id_col.in_(ids)).all()
+        pairs = cls._iter__by__ids(dbSession, ids, id_column, chunk_size)
+        if as_dict:
+            return {_id: obj for (_id, obj) in pairs}
+        return [obj for (_id, obj) in pairs]
+
+    @classmethod
+    def iter__by__ids(
+        cls,
+        dbSession: "Session",
+        ids: Iterable[Hashable],
+        id_column: str = "id",
+        chunk_size: int = IDS_CHUNK_SIZE,
+    ) -> Iterator[Self]:
+        """
+        Classmethod.
+
+        A generator version of ``get__by__ids``.  ``ids`` is consumed
+        ``chunk_size`` at a time, so it may be an iterator of any length; each
+        chunk is queried when the previous chunk's items have been yielded.
+
+        :param dbSession: The SQLAlchemy ``Session`` to query.
+        :param ids: An iterable of the "id" of the objects to query.
+        :param id_column: The column hosting the identifier. Default: "id".
+        :param chunk_size: int. The most ids in one query. Default: ``500``.
+        """
+        for _id, obj in cls._iter__by__ids(dbSession, ids, id_column, chunk_size):
+            yield obj
 
     @classmethod
     def get__by__column__lower(
@@ -132,11 +653,18 @@ class UtilityObject(CoreObject):
         :param offset: default ``0``
         :param limit: default ``None``
         """
-        items = (
-            dbSession.query(cls)
-            .filter(func_lower(getattr(cls, column_name)) == search.lower())
-            .offset(offset)
-            .limit(limit)
+        stmt = _get_plan(
+            cls,
+            ("get__by__column__lower", column_name),
+            _build__get__by__column__lower,
+            column_name,
+        )
+        items = list(
+            dbSession.execute(
+                stmt.offset(offset).limit(limit), {"search": search.lower()}
+            )
+            .scalars()
+            .unique()
             .all()
         )
         if items:
@@ -160,35 +688,62 @@ class UtilityObject(CoreObject):
         prefix_only: bool = True,
         offset: int = 0,
         limit: Optional[int] = None,
+        prefix_range: bool = False,
+        autoescape: bool = False,
     ) -> List[Self]:
         """
         Classmethod.
 
         Searches for a name column entry with the submitted seed prefix.
 
+        The seed is matched with ``LIKE``, so ``%`` and ``_`` in the seed are
+        wildcards unless ``autoescape`` is set.
+
+        With ``prefix_range=True``, a prefix search is rewritten as the range
+        ``lower(col) >= :seed AND lower(col) < :seed_next``, which can use an
+        index on ``lower(col)``; the seed has no wildcards.  This relies on
+        the column's collation ordering strings by codepoint, e.g. SQLite's
+        default ``BINARY`` or PostgreSQL's ``"C"``.
+
         :param dbSession: The SQLAlchemy ``Session`` to query.
         :param column_name:
         :param seed:
         :param prefix_only: default ``True```
         :param offset: default ``0``
         :param limit: default ``None``
+        :param prefix_range: boolean. default ``False``
+        :param autoescape: boolean. default ``False``.  Escape ``%`` and ``_``
+            in a ``LIKE`` seed.
         """
-        query = dbSession.query(cls)
-        if prefix_only:
-            query = query.filter(
-                func_lower(getattr(cls, column_name)).startswith(seed.lower())
-            )
+        seed = seed.lower()
+        params = {"seed": seed}
+        if prefix_only and prefix_range:
+            seed_next = _prefix_upper_bound(seed)
+            if seed_next is None:
+                mode = "range_open"
+            else:
+                mode = "range"
+                params["seed_next"] = seed_next
+            autoescape = False
         else:
-            query = query.filter(
-                func_lower(getattr(cls, column_name)).contains(seed.lower())
-            )
+            mode = "prefix" if prefix_only else "contains"
+            if autoescape:
+                params["seed"] = _escape_like(seed)
+        stmt = _get_plan(
+            cls,
+            ("get__by__column__similar", column_name, mode, autoescape),
+            _build__get__by__column__similar,
+            column_name,
+            mode,
+            autoescape,
+        )
         results = (
-            query.order_by(getattr(cls, column_name).asc())
-            .offset(offset)
-            .limit(limit)
+            dbSession.execute(stmt.offset(offset).limit(limit), params)
+            .scalars()
+            .unique()
             .all()
         )
-        return results
+        return list(results)
 
     @classmethod
     def get__by__column__exact_then_ilike(
@@ -196,6 +751,7 @@ class UtilityObject(CoreObject):
         dbSession: "Session",
         column_name: str,
         seed: str,
+        single_query: Optional[str] = None,
     ) -> Optional[Self]:
         """
         Classmethod.
@@ -203,19 +759,71 @@ class UtilityObject(CoreObject):
         Searches for an exact match, then case-insensitive version of the
         identified column if no match is found.
 
+        By default this is two statements, and a miss costs two round trips.
+        ``single_query`` selects the case-insensitive matches in one statement,
+        with an exact match ordered first:
+
+        * ``ilike``: ``col ILIKE :seed``; the same matches as the default, but
+          every match is read and sorted, and a plain index on ``col`` is not
+          used.
+        * ``lower``: ``lower(col) = lower(:seed)``, which can use an index on
+          ``lower(col)``.  Unlike ``ilike``, ``%`` and ``_`` in the seed are
+          not wildcards.
+
         :param dbSession: The SQLAlchemy ``Session`` to query.
         :param column_name:
         :param seed:
+        :param single_query: default ``None``.  ``ilike`` or ``lower``.
         """
-        item = dbSession.query(cls).filter(getattr(cls, column_name) == seed).first()
+        statements = _get_plan(
+            cls,
+            ("get__by__column__exact_then_ilike", column_name),
+            _build__get__by__column__exact_then_ilike,
+            column_name,
+        )
+        if single_query is not None:
+            if single_query not in ("ilike", "lower"):
+                raise ValueError("invalid `single_query`")
+            return (
+                dbSession.execute(statements[single_query], {"seed": seed})
+                .scalars()
+                .unique()
+                .first()
+            )
+        (stmt_exact, stmt_ilike) = statements[None]
+        item = dbSession.execute(stmt_exact, {"seed": seed}).scalars().unique().first()
         if not item:
             item = (
-                dbSession.query(cls)
-                .filter(getattr(cls, column_name).ilike(seed))
-                .first()
+                dbSession.execute(stmt_ilike, {"seed": seed}).scalars().unique().first()
             )
         return item
 
+    @classmethod
+    def _range_query(
+        cls,
+        order_col: Optional[str],
+        sort_direction: str,
+        order_case_sensitive: bool,
+        filters: Optional[Any],
+    ) -> Any:
+        """
+        Returns the ordered and filtered ``select()`` of ``get__range``.
+        """
+        if not order_col:
+            order_col = "id"
+        order_col = _normalize_order_col(order_col)
+        query = _get_plan(
+            cls,
+            ("get__range", order_col, sort_direction, order_case_sensitive),
+            _build__get__range,
+            order_col,
+            sort_direction,
+            order_case_sensitive,
+        )
+        if filters:
+            query = query.where(*filters)
+        return query
+
     @classmethod
     def get__range(
         cls,
@@ -241,30 +849,11 @@ class UtilityObject(CoreObject):
         :param debug_query: default ``False``
         """
 
-        if not order_col:
-            order_col = "id"
-        query = dbSession.query(cls)
-        if filters:
-            for _filter in filters:
-                query = query.filter(_filter)
-        for col_name in order_col.split(","):
-            # declared columns do not have cls.__class__.c
-            # reflected columns did in earlier sqlalchemy
-            col = getattr(cls, col_name)
-            if sort_direction == "asc":
-                if order_case_sensitive:
-                    query = query.order_by(col.asc())
-                else:
-                    query = query.order_by(func_lower(col).asc())
-            elif sort_direction == "desc":
-                if order_case_sensitive:
-                    query = query.order_by(col.desc())
-                else:
-                    query = query.order_by(func_lower(col).desc())
-            else:
-                raise ValueError("invalid sort direction")
+        query = cls._range_query(
+            order_col, sort_direction, order_case_sensitive, filters
+        )
         query = query.offset(offset).limit(limit)
-        results = query.all()
+        results = list(dbSession.execute(query).scalars().unique().all())
         if __debug__:
             if debug_query:
                 log.debug("get__range")
@@ -272,6 +861,236 @@ class UtilityObject(CoreObject):
                 log.debug(results)
         return results
 
+    @classmethod
+    def get__range__keyset(
+        cls,
+        dbSession: "Session",
+        limit: int,
+        cursor: Optional[str] = None,
+        sort_direction: str = "asc",
+        order_col: Optional[str] = None,
+        order_case_sensitive: bool = True,
+        filters: Optional[Any] = None,  # `Any` is really a SqlAlchemy Clause
+    ) -> Tuple[List[Self], Optional[str]]:
+        """
+        Classmethod.
+
+        A keyset ("seek") version of ``get__range``: instead of an offset, a
+        page starts after the ``cursor`` returned with the previous page, so
+        every page costs the same with an index on the ordering columns.
+
+        The primary key is appended to ``order_col`` to break ties.  The
+        ordering columns must not be NULL, and are compared as a row value
+        (``(a, b) > (:a, :b)``), which requires a database supporting row
+        value comparisons (PostgreSQL, MySQL, SQLite 3.15+).
+
+        Returns ``(items, next_cursor)``; ``next_cursor`` is ``None`` on the
+        last page.  The cursor is an opaque, url-safe string; it is not signed.
+
+        :param dbSession: The SQLAlchemy ``Session`` to query.
+        :param limit: int. The page size.
+        :param cursor: default ``None``. ``None`` for the first page.
+        :param sort_direction: default asc"
+        :param order_col: default ``None``
+        :param order_case_sensitive: default ``True``
+        :param filters: default ``None``
+        """
+        if limit < 1:
+            raise ValueError("`limit` must be at least 1")
+        if not order_col:
+            order_col = "id"
+        order_col = _normalize_order_col(order_col)
+        (names, exprs, query) = _get_plan(
+            cls,
+            ("get__range__keyset", order_col, sort_direction, order_case_sensitive),
+            _build__get__range__keyset,
+            order_col,
+            sort_direction,
+            order_case_sensitive,
+        )
+        if filters:
+            query = query.where(*filters)
+        if cursor is not None:
+            values = _decode_keyset_cursor(names, cursor)
+            _keys = sqlalchemy.tuple_(*exprs)
+            _values = sqlalchemy.tuple_(*values)
+            query = query.where(
+                (_keys > _values) if sort_direction == "asc" else (_keys < _values)
+            )
+        # one extra row shows if there is a next page
+        rows = dbSession.execute(query.limit(limit + 1)).unique().all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_keyset_cursor(names, tuple(rows[-1][1:]))
+        return ([row[0] for row in rows], next_cursor)
+
+    @classmethod
+    def iter__range(
+        cls,
+        dbSession: "Session",
+        batch_size: int = 1000,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort_direction: str = "asc",
+        order_col: Optional[str] = None,
+        order_case_sensitive: bool = True,
+        filters: Optional[Any] = None,  # `Any` is really a SqlAlchemy Clause
+        expunge: bool = False,
+    ) -> Generator[Self, None, None]:
+        """
+        Classmethod.
+
+        A generator version of ``get__range``, which streams the rows of a
+        single query in batches of ``batch_size`` with ``yield_per``.  Drivers
+        which support server-side cursors (e.g. ``psycopg2``) use one; others
+        buffer the result in the driver.
+
+        With ``expunge=True``, each batch is expunged from the Session once the
+        next batch is requested, so the identity map does not grow with the
+        table.  Expunged objects are detached: pending changes to them are
+        discarded, and unloaded attributes can not be loaded.
+
+        ``yield_per`` is not compatible with joined eager loading of
+        collections, or with subquery eager loading, so collections configured
+        with ``lazy="joined"`` and relationships configured with
+        ``lazy="subquery"`` are loaded with ``selectinload`` for each batch
+        instead.
+
+        Beware!
+        The Session's connection is held until the generator is exhausted or
+        closed.
+
+        :param dbSession: The SQLAlchemy ``Session`` to query.
+        :param batch_size: int. default ``1000``
+        :param offset: default ``0``
+        :param limit: default ``None``
+        :param sort_direction: default asc"
+        :param order_col: default ``None``
+        :param order_case_sensitive: default ``True``
+        :param filters: default ``None``
+        :param expunge: boolean. default ``False``
+        """
+        if batch_size < 1:
+            raise ValueError("`batch_size` must be at least 1")
+        query = cls._range_query(
+            order_col, sort_direction, order_case_sensitive, filters
+        )
+        query = query.offset(offset).limit(limit)
+        _options = _get_plan(cls, "yield_per_options", _build__yield_per_options)
+        if _options:
+            query = query.options(*_options)
+        # `yield_per` implies `stream_results`
+        result = dbSession.execute(query.execution_options(yield_per=batch_size))
+        try:
+            for batch in result.scalars().partitions():
+                yield from batch
+                if expunge:
+                    for obj in batch:
+                        if obj in dbSession:
+                            dbSession.expunge(obj)
+        finally:
+            result.close()
+
+    @classmethod
+    def bulk_upsert(
+        cls,
+        dbSession: "Session",
+        rows: Iterable[Dict[str, Any]],
+        batch_size: int = 500,
+        index_elements: Optional[Sequence[str]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        returning: bool = False,
+    ) -> Optional[List[Tuple]]:
+        """
+        Classmethod.
+
+        Inserts ``rows`` into the table of this class, ``batch_size`` rows per
+        multi-row ``INSERT ... ON CONFLICT DO UPDATE`` statement.  ``rows`` is
+        consumed one batch at a time, so it may be a generator of any length.
+        Only the PostgreSQL and SQLite dialects are supported.
+
+        The statements are executed in the Session's transaction, but bypass
+        the unit of work: objects already loaded in the Session are not
+        refreshed.  ``IdentityCache`` entries of this class are invalidated on
+        commit.
+
+        :param dbSession: The SQLAlchemy ``Session`` to execute in.
+        :param rows: An iterable of dicts of column name to value; every dict
+            must have the same keys.
+        :param batch_size: int. default ``500``.  Rows per statement; each row
+            binds one parameter per column, and SQLite limits a statement to
+            32766 parameters (999 before 3.32).
+        :param index_elements: default ``None``.  The columns of the conflict
+            target; defaults to the primary key.
+        :param update_columns: default ``None``.  The columns updated on a
+            conflict; defaults to every column in the rows, except the
+            ``index_elements``.  If empty, conflicting rows are skipped with
+            ``ON CONFLICT DO NOTHING``.  Otherwise, rows of a batch with the
+            same ``index_elements`` values are reduced to the last one.
+        :param returning: boolean. default ``False``.  Return the primary key
+            of each inserted or updated row as a tuple, in no guaranteed order;
+            skipped rows are not returned.
+
+        Returns a list of primary keys if ``returning``, otherwise ``None``.
+        """
+        if batch_size < 1:
+            raise ValueError("`batch_size` must be at least 1")
+        mapper: "Mapper[Any]" = sa_class_mapper(cls)
+        table: Any = mapper.local_table
+        dialect_name = dbSession.get_bind(mapper=mapper).dialect.name
+        try:
+            _insert = _UPSERT_INSERTS[dialect_name]
+        except KeyError:
+            raise ValueError(
+                "`bulk_upsert` does not support the `%s` dialect" % dialect_name
+            )
+        if index_elements is None:
+            index_elements = [col.name for col in table.primary_key.columns]
+        results: Optional[List[Tuple]] = [] if returning else None
+        keys: Optional[set] = None
+        _update: List[str] = []
+        _dedupe = False
+        _rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(_rows, batch_size))
+            if not batch:
+                break
+            if keys is None:
+                keys = set(batch[0].keys())
+                if update_columns is None:
+                    _update = [k for k in batch[0].keys() if k not in index_elements]
+                else:
+                    _update = list(update_columns)
+                _dedupe = bool(_update) and all(k in keys for k in index_elements)
+                mark_written(dbSession, cls)
+            for row in batch:
+                if row.keys() != keys:
+                    raise ValueError("every row must have the same keys")
+            if _dedupe:
+                # PostgreSQL can not update a row twice in one statement, so
+                # the last row of the batch for each conflict key is kept
+                deduped: Dict[Hashable, Dict[str, Any]] = {}
+                for i, row in enumerate(batch):
+                    _key = tuple(row[k] for k in index_elements)
+                    # NULLs never conflict
+                    deduped[_key if (None not in _key) else i] = row
+                batch = list(deduped.values())
+            stmt = _insert(table).values(batch)
+            if _update:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=index_elements,
+                    set_={k: stmt.excluded[k] for k in _update},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+            if results is not None:
+                stmt = stmt.returning(*table.primary_key.columns)
+                results.extend(tuple(row) for row in dbSession.execute(stmt))
+            else:
+                dbSession.execute(stmt)
+        return results
+
     def columns_as_dict(self) -> Dict:
         """
         Beware!
@@ -279,11 +1098,11 @@ class UtilityObject(CoreObject):
         loaded yet.
 
         To return only the loaded columns, use ``loaded_columns_as_dict``.
+
+        See Also: ``columns_as_bulk``
         """
-        return dict(
-            (col.name, getattr(self, col.name))
-            for col in sa_class_mapper(self.__class__).persist_selectable.c
-        )
+        (names, getter) = _get_plan(self.__class__, "columns", _build__columns)
+        return dict(zip(names, getter(self)))
 
     def loaded_columns_as_dict(self) -> Dict:
         """
@@ -295,11 +1114,8 @@ class UtilityObject(CoreObject):
         See Also: ``loaded_columns_as_list``
         """
         _dict = self.__dict__
-        return {
-            col.name: _dict[col.name]
-            for col in sa_class_mapper(self.__class__).persist_selectable.c
-            if col.name in _dict
-        }
+        (names, getter) = _get_plan(self.__class__, "columns", _build__columns)
+        return {name: _dict[name] for name in names if name in _dict}
 
     def loaded_columns_as_list(
         self,
@@ -317,17 +1133,80 @@ class UtilityObject(CoreObject):
         See Also: ``loaded_columns_as_dict``
         """
         _dict = self.__dict__
+        (names, getter) = _get_plan(self.__class__, "columns", _build__columns)
         if with_values:
-            return [
-                (col.name, _dict[col.name])
-                for col in sa_class_mapper(self.__class__).persist_selectable.c
-                if col.name in _dict
-            ]
-        return [
-            col.name
-            for col in sa_class_mapper(self.__class__).persist_selectable.c
-            if col.name in _dict
-        ]
+            return [(name, _dict[name]) for name in names if name in _dict]
+        return [name for name in names if name in _dict]
+
+    @overload
+    @classmethod
+    def columns_as_bulk(
+        cls,
+        instances: Iterable[Any],
+        shape: Literal["dicts"] = ...,
+    ) -> List[Dict[str, Any]]: ...
+
+    @overload
+    @classmethod
+    def columns_as_bulk(
+        cls,
+        instances: Iterable[Any],
+        shape: Literal["tuples"] = ...,
+    ) -> List[Tuple]: ...
+
+    @overload
+    @classmethod
+    def columns_as_bulk(
+        cls,
+        instances: Iterable[Any],
+        shape: Literal["columns"] = ...,
+    ) -> Dict[str, List[Any]]: ...
+
+    @classmethod
+    def columns_as_bulk(
+        cls,
+        instances: Iterable[Any],
+        shape: str = "dicts",
+    ) -> Union[List[Dict[str, Any]], List[Tuple], Dict[str, List[Any]]]:
+        """
+        Classmethod.
+
+        Serializes the columns of many instances of this class in one pass.
+
+        Beware!
+        Like ``columns_as_dict``, this will trigger a load of attributes if they
+        have not been loaded yet.  Only the columns of this class are included,
+        even for instances of a subclass.
+
+        :param instances: An iterable of instances of this class.
+        :param shape: string. default ``dicts``.
+
+            * ``dicts``: a list with a dict of column name to value per instance
+            * ``tuples``: a list with a tuple of values per instance, in the
+              order of ``columns_as_bulk_names()``
+            * ``columns``: a dict of column name to the list of its values
+        """
+        (names, getter) = _get_plan(cls, "columns", _build__columns)
+        if shape == "dicts":
+            return [dict(zip(names, getter(obj))) for obj in instances]
+        elif shape == "tuples":
+            return [getter(obj) for obj in instances]
+        elif shape == "columns":
+            rows = [getter(obj) for obj in instances]
+            if not rows:
+                return {name: [] for name in names}
+            return {name: list(values) for (name, values) in zip(names, zip(*rows))}
+        raise ValueError("invalid shape")
+
+    @classmethod
+    def columns_as_bulk_names(cls) -> Tuple[str, ...]:
+        """
+        Classmethod.
+
+        Returns the column names used by ``columns_as_dict`` and
+        ``columns_as_bulk``, in order.
+        """
+        return _get_plan(cls, "columns", _build__columns)[0]
 
     @property
     def _sqlalchemy_session(self) -> Optional["Session"]:
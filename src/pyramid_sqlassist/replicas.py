@@ -0,0 +1,761 @@
+# stdlib
+import itertools
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Union
+
+# pypi
+import sqlalchemy
+
+if TYPE_CHECKING:
+    from pyramid.request import Request
+    from pyramid.response import Response
+    from sqlalchemy.engine.base import Connection
+    from sqlalchemy.engine.base import Engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.orm.session import Session
+
+# ==============================================================================
+
+log = logging.getLogger(__name__)
+
+# serializes `ReplicaHealthMonitor.ensure_started` (GLOBAL)
+_START_LOCK = threading.Lock()
+
+
+def _reset_start_lock() -> None:
+    # a fork may copy the lock in a locked state
+    global _START_LOCK
+    _START_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_start_lock)
+
+
+class ReplicaSelector(object):
+    """
+    Base class for the strategies used by an ``EngineGroup`` to select a member
+    engine for a request.
+
+    Subclasses must implement ``select``.
+    """
+
+    def select(
+        self,
+        engine_group: "EngineGroup",
+        candidates: List[str],
+    ) -> str:
+        """
+        :param engine_group: The ``EngineGroup`` a member is selected from.
+        :param candidates: list. The names of the members eligible for selection.
+            This will never be empty.
+        """
+        raise NotImplementedError()
+
+
+class RoundRobinSelector(ReplicaSelector):
+    """
+    Selects each candidate in turn.
+    """
+
+    def __init__(self):
+        # `next()` on an `itertools.count` is atomic under the GIL
+        self._counter = itertools.count()
+
+    def select(
+        self,
+        engine_group: "EngineGroup",
+        candidates: List[str],
+    ) -> str:
+        return candidates[next(self._counter) % len(candidates)]
+
+
+class WeightedSelector(ReplicaSelector):
+    """
+    Selects a random candidate, in proportion to the ``weights`` of the
+    ``EngineGroup``. Members without a weight default to ``1``.
+    """
+
+    def select(
+        self,
+        engine_group: "EngineGroup",
+        candidates: List[str],
+    ) -> str:
+        weights = [engine_group.weights.get(i, 1) for i in candidates]
+        if not any(weights):
+            return random.choice(candidates)
+        return random.choices(candidates, weights=weights)[0]
+
+
+class LeastConnectionsSelector(ReplicaSelector):
+    """
+    Selects the candidate with the fewest connections checked out of its pool.
+
+    Pools which do not report ``checkedout()`` (such as the ``StaticPool`` and
+    ``SingletonThreadPool`` used by SQLite) are treated as having no
+    connections checked out.  Ties are broken randomly.
+    """
+
+    def select(
+        self,
+        engine_group: "EngineGroup",
+        candidates: List[str],
+    ) -> str:
+        def _sortkey(member_name: str):
+            pool = engine_group.engines[member_name].pool
+            checkedout = getattr(pool, "checkedout", None)
+            return (checkedout() if checkedout else 0, random.random())
+
+        return min(candidates, key=_sortkey)
+
+
+SELECTORS = {
+    "round_robin": RoundRobinSelector,
+    "weighted": WeightedSelector,
+    "least_connections": LeastConnectionsSelector,
+}
+
+
+def probe_select_one(connection: "Connection") -> Optional[float]:
+    """
+    The default probe for a ``ReplicaHealthMonitor``.
+
+    Issues ``SELECT 1``; only the latency of the replica is measured.
+
+    :param connection: A SQLAlchemy ``Connection`` to the replica.
+    """
+    connection.execute(sqlalchemy.text("SELECT 1"))
+    return None
+
+
+def probe_postgresql_lag(connection: "Connection") -> Optional[float]:
+    """
+    A probe for PostgreSQL streaming replicas.
+
+    Returns the seconds since the last transaction was replayed; a primary
+    (not in recovery) reports ``0``.  Note that an idle primary will cause the
+    reported lag to grow, as no transactions are replayed.
+
+    :param connection: A SQLAlchemy ``Connection`` to the replica.
+    """
+    lag = connection.execute(
+        sqlalchemy.text(
+            "SELECT CASE WHEN pg_is_in_recovery() "
+            "THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+            "ELSE 0 END"
+        )
+    ).scalar()
+    return float(lag) if lag is not None else None
+
+
+class ReplicaHealth(object):
+    """
+    The result of the most recent probe of an ``EngineGroup`` member.
+    """
+
+    is_healthy: bool
+    lag: Optional[float]
+    latency: Optional[float]
+    checked_at: Optional[float]
+    error: Optional[str]
+
+    def __init__(
+        self,
+        is_healthy: bool = True,
+        lag: Optional[float] = None,
+        latency: Optional[float] = None,
+        checked_at: Optional[float] = None,
+        error: Optional[str] = None,
+    ):
+        self.is_healthy = is_healthy
+        self.lag = lag
+        self.latency = latency
+        self.checked_at = checked_at
+        self.error = error
+
+    def __repr__(self) -> str:
+        return "<ReplicaHealth is_healthy=%s lag=%s latency=%s error=%s>" % (
+            self.is_healthy,
+            self.lag,
+            self.latency,
+            self.error,
+        )
+
+
+class ReplicaHealthMonitor(object):
+    """
+    Probes the members of an ``EngineGroup`` for health and replication lag.
+
+    Probes are run on a background daemon thread, at most once every
+    ``interval`` seconds.  The results are cached on the monitor, so selecting
+    a member for a request never issues the probe query itself.
+
+    Members are considered healthy until they have been probed.  A member is
+    unhealthy if the probe raises an exception, if the probe reports a lag over
+    ``max_lag``, or if the probe took longer than ``max_latency``.
+
+    The members are probed in parallel, each on its own daemon thread.  A
+    member whose probe does not finish within ``probe_timeout`` seconds is
+    unhealthy; it is not probed again until that probe returns.
+
+    The background thread is started on the first selection by the group (and
+    restarted on the first selection in a forked process) unless ``autostart``
+    is ``False``; in which case ``start`` or ``run_probes`` must be invoked by
+    the application.
+    """
+
+    engine_group: Optional["EngineGroup"] = None
+    health: Dict[str, ReplicaHealth]
+    healthy_members: List[str]
+
+    def __init__(
+        self,
+        probe: Callable[["Connection"], Optional[float]] = probe_select_one,
+        interval: float = 5.0,
+        max_lag: Optional[float] = None,
+        max_latency: Optional[float] = None,
+        autostart: bool = True,
+        probe_timeout: Optional[float] = None,
+    ):
+        """
+        :param probe: callable. Invoked with a SQLAlchemy ``Connection`` to a
+            member; returns the replication lag in seconds, or ``None`` if unknown.
+            default ``probe_select_one``
+        :param interval: float. default ``5.0``. Minimum seconds between probes.
+        :param max_lag: float. optional. Members lagging over this many seconds are unhealthy.
+        :param max_latency: float. optional. Members slower than this many seconds to probe are unhealthy.
+        :param autostart: boolean. default ``True``. Start the background thread on first use.
+        :param probe_timeout: float. optional. Seconds to wait for the probes;
+            members which have not responded are unhealthy.  default ``interval``
+        """
+        self.probe = probe
+        self.interval = interval
+        self.max_lag = max_lag
+        self.max_latency = max_latency
+        self.autostart = autostart
+        self.probe_timeout = interval if probe_timeout is None else probe_timeout
+        self.health = {}
+        self.healthy_members = []
+        self._last_run: Optional[float] = None
+        self._last_published: Optional[float] = None
+        # the probe threads which have not returned, by member
+        self._probing: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._stop_event: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _bind(self, engine_group: "EngineGroup") -> None:
+        """
+        Binds the monitor to an ``EngineGroup``; invoked by the group.
+
+        :param engine_group: The ``EngineGroup`` to monitor.
+        """
+        if self.engine_group is not None:
+            raise ValueError("`ReplicaHealthMonitor` is already bound to a group")
+        self.engine_group = engine_group
+        self.health = {i: ReplicaHealth() for i in engine_group.member_names}
+        self.healthy_members = list(engine_group.member_names)
+
+    def probe_member(self, member_name: str) -> ReplicaHealth:
+        """
+        Probes a single member and returns a new ``ReplicaHealth``.
+        This does not update the cached results.
+
+        :param member_name: string. The member to probe.
+        """
+        if self.engine_group is None:
+            raise ValueError("`ReplicaHealthMonitor` is not bound to a group")
+        sa_engine = self.engine_group.engines[member_name]
+        checked_at = time.time()
+        _started = time.perf_counter()
+        try:
+            with sa_engine.connect() as connection:
+                lag = self.probe(connection)
+        except Exception as exc:
+            log.warning(
+                "ReplicaHealthMonitor | `%s` probe failed: %s", member_name, exc
+            )
+            return ReplicaHealth(
+                is_healthy=False,
+                checked_at=checked_at,
+                error=repr(exc),
+            )
+        latency = time.perf_counter() - _started
+        is_healthy = True
+        if (self.max_lag is not None) and (lag is not None) and (lag > self.max_lag):
+            is_healthy = False
+        if (self.max_latency is not None) and (latency > self.max_latency):
+            is_healthy = False
+        return ReplicaHealth(
+            is_healthy=is_healthy,
+            lag=lag,
+            latency=latency,
+            checked_at=checked_at,
+        )
+
+    def run_probes(self, force: bool = False) -> bool:
+        """
+        Probes every member and updates the cached results.
+
+        Returns ``True`` if the probes ran.  Unless ``force`` is ``True``, this
+        will not run again within ``interval`` seconds of the previous run.
+
+        :param force: boolean. default ``False``.
+        """
+        if self.engine_group is None:
+            raise ValueError("`ReplicaHealthMonitor` is not bound to a group")
+        member_names = self.engine_group.member_names
+        with self._lock:
+            _now = time.monotonic()
+            if (
+                not force
+                and (self._last_run is not None)
+                and (_now - self._last_run < self.interval)
+            ):
+                return False
+            self._last_run = _now
+        # the lock is not held while probing
+        health = self._probe_members(member_names)
+        with self._lock:
+            # a slower, earlier run must not overwrite a later one
+            if (self._last_published is not None) and (_now < self._last_published):
+                return True
+            self._last_published = _now
+            # replace, never mutate; readers are not locked
+            self.health = health
+            self.healthy_members = [i for i in member_names if health[i].is_healthy]
+            if __debug__:
+                log.debug(
+                    "ReplicaHealthMonitor.run_probes() | healthy: %s",
+                    self.healthy_members,
+                )
+        return True
+
+    def _probe_members(self, member_names: List[str]) -> Dict[str, ReplicaHealth]:
+        """
+        Probes the members in parallel, waiting up to ``probe_timeout`` seconds.
+
+        :param member_names: list. The members to probe.
+        """
+        results: Dict[str, ReplicaHealth] = {}
+
+        def _probe(member_name: str) -> None:
+            try:
+                results[member_name] = self.probe_member(member_name)
+            finally:
+                self._probing.pop(member_name, None)
+
+        threads = []
+        with self._lock:
+            for member_name in member_names:
+                if member_name in self._probing:
+                    # the previous probe has not returned
+                    continue
+                # daemon threads, so a hung probe can not block the interpreter's exit
+                thread = threading.Thread(
+                    target=_probe,
+                    args=(member_name,),
+                    name="pyramid_sqlassist.ReplicaHealthMonitor.probe",
+                    daemon=True,
+                )
+                self._probing[member_name] = thread
+                threads.append(thread)
+        for thread in threads:
+            thread.start()
+        _deadline = time.monotonic() + self.probe_timeout
+        for thread in threads:
+            thread.join(max(_deadline - time.monotonic(), 0))
+        checked_at = time.time()
+        health = {}
+        for member_name in member_names:
+            result = results.get(member_name)
+            if result is None:
+                log.warning(
+                    "ReplicaHealthMonitor | `%s` probe timed out after %ss",
+                    member_name,
+                    self.probe_timeout,
+                )
+                result = ReplicaHealth(
+                    is_healthy=False,
+                    checked_at=checked_at,
+                    error="probe timed out after %ss" % self.probe_timeout,
+                )
+            health[member_name] = result
+        return health
+
+    def _run(self, stop_event: threading.Event) -> None:
+        while True:
+            try:
+                self.run_probes(force=True)
+            except Exception as exc:  # pragma: no cover
+                log.error("ReplicaHealthMonitor | probes failed: %s", exc)
+            if stop_event.wait(self.interval):
+                break
+
+    def start(self) -> None:
+        """
+        Starts the background thread for the current process.
+        """
+        if self.engine_group is None:
+            raise ValueError("`ReplicaHealthMonitor` is not bound to a group")
+        self._pid = os.getpid()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(self._stop_event,),
+            name="pyramid_sqlassist.ReplicaHealthMonitor",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background thread.
+        """
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if (self._thread is not None) and (
+            self._thread is not threading.current_thread()
+        ):
+            self._thread.join()
+        self._pid = None
+        self._stop_event = None
+        self._thread = None
+
+    def ensure_started(self) -> None:
+        """
+        Starts the background thread if ``autostart`` is enabled and the thread
+        has not been started in this process.
+        """
+        if (not self.autostart) or (self._pid == os.getpid()):
+            return
+        with _START_LOCK:
+            # `start` sets `_pid`, so only one caller starts the thread
+            if self._pid != os.getpid():
+                # a new process: a fork does not copy the thread, and may copy
+                # the lock in a locked state
+                self._lock = threading.Lock()
+                self._probing = {}
+                self.start()
+
+
+class EngineGroup(object):
+    """
+    A named group of SQLAlchemy engines, such as a pool of read replicas, that
+    can be registered under a single engine name.
+
+    Pass an ``EngineGroup`` to ``initialize_engine`` in place of an ``Engine``:
+
+        reader = pyramid_sqlassist.EngineGroup(
+            {"replica1": engine_replica1, "replica2": engine_replica2},
+            selector="least_connections",
+        )
+        pyramid_sqlassist.initialize_engine("reader", reader)
+
+    A member is selected when the Session is first started on a request, and
+    is used for the remainder of that request.
+
+    If a ``ReplicaHealthMonitor`` is provided, only healthy members are
+    selected.  If no members are healthy, the request will use the Session of
+    the ``fallback_engine`` (such as ``writer``) if one is provided; otherwise
+    any member may be selected.
+    """
+
+    engines: Dict[str, "Engine"]
+    fallback_engine: Optional[str]
+    health_monitor: Optional[ReplicaHealthMonitor]
+    member_names: List[str]
+    weights: Dict[str, int]
+    selector: ReplicaSelector
+
+    def __init__(
+        self,
+        engines: Dict[str, "Engine"],
+        selector: Union[str, ReplicaSelector] = "round_robin",
+        weights: Optional[Dict[str, int]] = None,
+        health_monitor: Optional[ReplicaHealthMonitor] = None,
+        fallback_engine: Optional[str] = None,
+    ):
+        """
+        :param engines: dict. member name to SQLAlchemy ``Engine``. Order is preserved.
+        :param selector: string or ``ReplicaSelector``. default ``round_robin``.
+            One of ``round_robin``, ``weighted``, ``least_connections``; or an
+            instance of a ``ReplicaSelector`` subclass.
+        :param weights: dict. optional. member name to integer weight; used by
+            the ``weighted`` selector.
+        :param health_monitor: ``ReplicaHealthMonitor``. optional.
+        :param fallback_engine: string. optional. The name of a registered
+            engine to use when no members are healthy.
+        """
+        if not engines:
+            raise ValueError("`engines` must not be empty")
+        if isinstance(selector, str):
+            if selector not in SELECTORS:
+                raise ValueError("Invalid `selector`: `%s`" % selector)
+            selector = SELECTORS[selector]()
+        if weights:
+            for member_name in weights.keys():
+                if member_name not in engines:
+                    raise ValueError("No member named `%s`" % member_name)
+        self.engines = dict(engines)
+        self.member_names = list(self.engines.keys())
+        self.weights = dict(weights) if weights else {}
+        self.selector = selector
+        self.fallback_engine = fallback_engine
+        self.health_monitor = health_monitor
+        if health_monitor is not None:
+            health_monitor._bind(self)
+
+    @property
+    def primary_engine(self) -> "Engine":
+        """the first member; used as the default bind of the sessionmaker"""
+        return next(iter(self.engines.values()))
+
+    def select(self) -> Optional[str]:
+        """
+        Selects a member and returns its name.
+
+        Returns ``None`` if no members are healthy and a ``fallback_engine``
+        should be used.
+        """
+        health_monitor = self.health_monitor
+        if health_monitor is None:
+            return self.selector.select(self, self.member_names)
+        health_monitor.ensure_started()
+        candidates = health_monitor.healthy_members
+        if not candidates:
+            if self.fallback_engine is not None:
+                return None
+            candidates = self.member_names
+        return self.selector.select(self, candidates)
+
+
+# ------------------------------------------------------------------------------
+
+
+class ReadYourWritesStore(object):
+    """
+    Base class for the stores used by ``ReadYourWrites`` to track the sticky
+    window that follows a commit on the writer.
+
+    Subclasses must implement ``is_sticky`` and ``mark``.  A subclass may
+    persist the window anywhere, e.g. a shared cache keyed by the user.
+    """
+
+    def is_sticky(self, request: "Request") -> bool:
+        """
+        Returns ``True`` if the sticky window is open for this request.
+
+        :param request: The active Pyramid `Request` instance.
+        """
+        raise NotImplementedError()
+
+    def mark(self, request: "Request", expires: float) -> None:
+        """
+        Opens the sticky window.
+
+        :param request: The active Pyramid `Request` instance.
+        :param expires: float. The unix timestamp at which the window closes.
+        """
+        raise NotImplementedError()
+
+
+class RequestReadYourWritesStore(ReadYourWritesStore):
+    """
+    Stores the sticky window on the active request; the window only applies to
+    the remainder of the request which committed.
+    """
+
+    attribute_name = "_sqlassist_sticky_expires"
+
+    def is_sticky(self, request: "Request") -> bool:
+        expires = getattr(request, self.attribute_name, None)
+        return (expires is not None) and (expires > time.time())
+
+    def mark(self, request: "Request", expires: float) -> None:
+        setattr(request, self.attribute_name, expires)
+
+
+class CookieReadYourWritesStore(RequestReadYourWritesStore):
+    """
+    Stores the sticky window on the active request, and in a cookie so the
+    window applies to the client's subsequent requests.
+
+    The cookie value is the unix timestamp at which the window closes.  The
+    value is supplied by the client, so a timestamp more than ``max_window``
+    seconds in the future is ignored.
+    """
+
+    cookie_name: str
+    cookie_kwargs: Dict
+    max_window: float
+
+    def __init__(
+        self,
+        cookie_name: str = "sqlassist_sticky",
+        max_window: float = 60.0,
+        **cookie_kwargs,
+    ):
+        """
+        :param cookie_name: string. default ``sqlassist_sticky``
+        :param max_window: float. default ``60.0``. The longest window, in
+            seconds, a cookie may claim.
+        :param cookie_kwargs: Passed to ``Response.set_cookie``.
+            default ``path="/"``, ``httponly=True``, ``samesite="Lax"``
+        """
+        self.cookie_name = cookie_name
+        self.max_window = max_window
+        cookie_kwargs.setdefault("path", "/")
+        cookie_kwargs.setdefault("httponly", True)
+        cookie_kwargs.setdefault("samesite", "Lax")
+        self.cookie_kwargs = cookie_kwargs
+
+    def is_sticky(self, request: "Request") -> bool:
+        if RequestReadYourWritesStore.is_sticky(self, request):
+            return True
+        value = request.cookies.get(self.cookie_name)
+        if not value:
+            return False
+        try:
+            expires = float(value)
+        except ValueError:
+            return False
+        now = time.time()
+        # a tampered cookie could otherwise pin the client to the writer;
+        # a second is allowed for rounding and clock skew between servers
+        return now < expires <= (now + self.max_window + 1)
+
+    def mark(self, request: "Request", expires: float) -> None:
+        RequestReadYourWritesStore.mark(self, request, expires)
+        max_age = max(int(math.ceil(expires - time.time())), 0)
+
+        def _set_cookie(req: "Request", response: "Response") -> None:
+            response.set_cookie(
+                self.cookie_name,
+                value="%.3f" % expires,
+                max_age=max_age,
+                **self.cookie_kwargs,
+            )
+
+        request.add_response_callback(_set_cookie)
+
+
+class ReadYourWrites(object):
+    """
+    Read-your-writes stickiness between a reader and a writer engine.
+
+    This is configured via ``enable_read_your_writes``.  When a writer Session
+    commits a transaction which flushed changes, the ``store`` is marked for
+    ``window`` seconds.  While the window is open, the reader engine resolves
+    to the writer's Session.
+
+    If the reader's Session was already memoized on the request's
+    ``DbSessionsContainer``, it is evicted on commit so subsequent access will
+    resolve to the writer.
+    """
+
+    reader_engine: str
+    writer_engine: str
+    store: ReadYourWritesStore
+    window: float
+
+    def __init__(
+        self,
+        reader_engine: str,
+        writer_engine: str,
+        store: ReadYourWritesStore,
+        window: float,
+    ):
+        """
+        :param reader_engine: string. The name of the reader engine.
+        :param writer_engine: string. The name of the writer engine.
+        :param store: ``ReadYourWritesStore``.
+        :param window: float. Seconds the reader is sticky to the writer.
+        """
+        self.reader_engine = reader_engine
+        self.writer_engine = writer_engine
+        self.store = store
+        self.window = window
+
+    def is_sticky(self, request: "Request") -> bool:
+        """
+        :param request: The active Pyramid `Request` instance.
+        """
+        return self.store.is_sticky(request)
+
+    def listen(self, sa_sessionmaker: "sessionmaker") -> None:
+        """
+        Registers the SQLAlchemy event listeners on the writer's sessionmaker.
+
+        :param sa_sessionmaker: The writer's ``sessionmaker``.
+        """
+        sqlalchemy.event.listen(sa_sessionmaker, "after_flush", self._after_flush)
+        sqlalchemy.event.listen(sa_sessionmaker, "after_commit", self._after_commit)
+        sqlalchemy.event.listen(
+            sa_sessionmaker, "after_soft_rollback", self._after_soft_rollback
+        )
+
+    def _after_flush(self, session: "Session", flush_context: Any) -> None:
+        session.info["sqlassist.flushed"] = True
+
+    def _after_soft_rollback(self, session: "Session", previous_transaction) -> None:
+        # a savepoint rollback leaves the enclosing transaction's flushes in place
+        if previous_transaction.nested:
+            return
+        session.info.pop("sqlassist.flushed", None)
+
+    def _after_commit(self, session: "Session") -> None:
+        if not session.info.pop("sqlassist.flushed", None):
+            return
+        request = session.info.get("request")
+        if request is None:
+            return
+        self.store.mark(request, time.time() + self.window)
+        # evict a memoized reader from the request's `DbSessionsContainer`
+        registry_data = getattr(
+            getattr(request, "registry", None), "pyramid_sqlassist", None
+        )
+        if registry_data is None:
+            return
+        dbSessionsContainer = request.__dict__.get(registry_data["request_method_name"])
+        if dbSessionsContainer is None:
+            return
+        _memoized = dbSessionsContainer.__dict__
+        if (self.reader_engine in _memoized) and (
+            _memoized[self.reader_engine] is not _memoized.get(self.writer_engine)
+        ):
+            if __debug__:
+                log.debug("ReadYourWrites | evicting memoized `%s`", self.reader_engine)
+            del _memoized[self.reader_engine]
+
+
+# ==============================================================================
+
+__all__ = (
+    "CookieReadYourWritesStore",
+    "EngineGroup",
+    "LeastConnectionsSelector",
+    "probe_postgresql_lag",
+    "probe_select_one",
+    "ReadYourWrites",
+    "ReadYourWritesStore",
+    "ReplicaHealth",
+    "ReplicaHealthMonitor",
+    "ReplicaSelector",
+    "RequestReadYourWritesStore",
+    "RoundRobinSelector",
+    "SELECTORS",
+    "WeightedSelector",
+)
@@ -1,11 +1,13 @@
 # stdlib
 import datetime
+from typing import List
 from typing import Optional
 
 # pypi
 import sqlalchemy
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
+from sqlalchemy.orm import relationship
 
 # local
 from pyramid_sqlassist import DeclaredTable
@@ -32,3 +34,59 @@ class FooObject(DeclaredTable, UtilityObject):
     status_alt: Mapped[Optional[str]] = mapped_column(
         sqlalchemy.Unicode, nullable=True, default=None
     )
+
+
+class EagerObject(DeclaredTable, UtilityObject):
+    """
+    has a joined-eager collection, so the results of `select(EagerObject)`
+    must be uniqued
+    """
+
+    __tablename__ = "eager_object"
+
+    id: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    id_alt: Mapped[int] = mapped_column(sqlalchemy.Integer, nullable=False)
+    status: Mapped[Optional[str]] = mapped_column(
+        sqlalchemy.Unicode, nullable=True, default=None
+    )
+
+    children: Mapped[List["EagerChild"]] = relationship(
+        "EagerChild", lazy="joined", order_by="EagerChild.id"
+    )
+
+
+class EagerChild(DeclaredTable):
+    __tablename__ = "eager_child"
+
+    id: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    eager_object_id: Mapped[int] = mapped_column(
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("eager_object.id"), nullable=False
+    )
+
+
+class SubqueryObject(DeclaredTable, UtilityObject):
+    """
+    has subquery-eager relationships, which can not be loaded with `yield_per`
+    """
+
+    __tablename__ = "subquery_object"
+
+    id: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    parent_id: Mapped[Optional[int]] = mapped_column(
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("subquery_object.id"), nullable=True
+    )
+
+    parent: Mapped[Optional["SubqueryObject"]] = relationship(
+        "SubqueryObject",
+        lazy="subquery",
+        join_depth=1,
+        remote_side="SubqueryObject.id",
+        back_populates="children",
+    )
+    children: Mapped[List["SubqueryObject"]] = relationship(
+        "SubqueryObject",
+        lazy="subquery",
+        join_depth=1,
+        back_populates="parent",
+        order_by="SubqueryObject.id",
+    )
@@ -46,6 +46,11 @@ class TestsDbsession(Handler):
                 "`request` has 'finished_callbacks' before one has been registered."
             )
         touched = self.request.dbSession  # noqa
+        if "finished_callbacks" in self.request.__dict__:
+            raise ValueError(
+                "`request` has 'finished_callbacks' before a session was started."
+            )
+        touched = self.request.dbSession.reader  # noqa
         if "finished_callbacks" not in self.request.__dict__:
             raise ValueError("`request` does not have 'finished_callbacks', it should")
         return {}
@@ -5,6 +5,7 @@ import unittest
 from webtest import TestApp
 
 # local
+import pyramid_sqlassist
 from . import pyramid_testapp
 
 
@@ -17,6 +18,12 @@ class _AppBackedTests(object):
         app = pyramid_testapp.main({}, **app_test_settings)
         self.testapp = TestApp(app)
 
+    def tearDown(self):
+        for engine_name in ("reader", "writer"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
+
     def _new_env(self):
         test_env = {
             "testapp": self.testapp,
@@ -137,6 +144,12 @@ class _AppBackedTests_Transaction(object):
         app = pyramid_testapp.main({}, **app_test_settings)
         self.testapp = TestApp(app)
 
+    def tearDown(self):
+        for engine_name in ("reader", "writer"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
+
     def _new_env(self):
         test_env = {
             "testapp": self.testapp,
@@ -1,13 +1,35 @@
 # stdlib
+import asyncio
+import datetime
+import os
 import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
 import unittest
+from unittest import mock
+import warnings
 
 # pypi
 from pyramid import testing
+from pyramid.config import Configurator
 from pyramid.interfaces import IRequestExtensions
+from pyramid.request import apply_request_extensions
 from pyramid.request import Request
 from pyramid.response import Response
 import sqlalchemy
+import transaction
+
+try:
+    import aiosqlite  # noqa: F401
+
+    HAS_AIOSQLITE = True
+except ImportError:
+    HAS_AIOSQLITE = False
 
 # local
 import pyramid_sqlassist
@@ -72,6 +94,10 @@ class _TestPyramidAppHarness(object):
             print(exc)
 
     def tearDown(self):
+        for engine_name in ("reader", "writer"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
         testing.tearDown()
 
 
@@ -96,7 +122,24 @@ class TestPyramidRequest(_TestPyramidAppHarness, unittest.TestCase):
         self.assertEqual(
             0, self.request.dbSession._engine_status_tracker.engines["writer"]
         )
-        self.assertIn("finished_callbacks", self.request.__dict__)
+        # the cleanup is only registered when a session is started
+        self.assertNotIn("finished_callbacks", self.request.__dict__)
+        self.assertFalse(self.request.dbSession._cleanup_registered)
+
+    def test_cleanup_registered_once(self):
+        self.request.dbSession = pyramid_sqlassist.DbSessionsContainer(self.request)
+        touched = self.request.dbSession.reader.query(  # noqa
+            model_objects.FooObject
+        ).first()
+        self.assertTrue(self.request.dbSession._cleanup_registered)
+        touched = self.request.dbSession.writer.query(  # noqa
+            model_objects.FooObject
+        ).first()
+        pyramid_sqlassist._ensure_cleanup(self.request, self.request.dbSession)
+        self.assertEqual(
+            list(self.request.finished_callbacks),
+            [self.request.dbSession._request_cleanup],
+        )
 
     def test_query_reader(self):
         self.assertNotIn("finished_callbacks", self.request.__dict__)
@@ -143,6 +186,144 @@ class TestPyramidRequest(_TestPyramidAppHarness, unittest.TestCase):
         )
         self.assertIn("finished_callbacks", self.request.__dict__)
 
+    def test_cleanup_started_only(self):
+        self.request.dbSession = pyramid_sqlassist.DbSessionsContainer(self.request)
+        self.assertEqual(self.request.dbSession._engines_started, [])
+        touched = self.request.dbSession.writer.query(  # noqa
+            model_objects.FooObject
+        ).first()
+        touched = self.request.dbSession.reader.query(  # noqa
+            model_objects.FooObject
+        ).first()
+        touched = self.request.dbSession.writer.query(  # noqa
+            model_objects.FooObject
+        ).first()
+        self.assertEqual(
+            [i.engine_name for i in self.request.dbSession._engines_started],
+            ["writer", "reader"],
+        )
+        pyramid_sqlassist.request_cleanup(self.request, self.request.dbSession)
+        self.assertEqual(
+            2, self.request.dbSession._engine_status_tracker.engines["reader"]
+        )
+        self.assertEqual(
+            2, self.request.dbSession._engine_status_tracker.engines["writer"]
+        )
+
+    def test_cleanup_unstarted(self):
+        self.request.dbSession = pyramid_sqlassist.DbSessionsContainer(self.request)
+        touched = self.request.dbSession.writer.query(  # noqa
+            model_objects.FooObject
+        ).first()
+        pyramid_sqlassist.request_cleanup(self.request, self.request.dbSession)
+        self.assertEqual(
+            0, self.request.dbSession._engine_status_tracker.engines["reader"]
+        )
+        self.assertEqual(
+            2, self.request.dbSession._engine_status_tracker.engines["writer"]
+        )
+
+
+class TestGeneratedContainer(_TestPyramidAppHarness, unittest.TestCase):
+    def setUp(self):
+        _TestPyramidAppHarness.setUp(self)
+        engine_analytics = sqlalchemy.create_engine("sqlite://")
+        pyramid_sqlassist.initialize_engine(
+            "analytics",
+            engine_analytics,
+            is_scoped=bool(self.settings.get("sqlassist.is_scoped")),
+        )
+
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("analytics", None)
+        _TestPyramidAppHarness.tearDown(self)
+
+    def test_accessors(self):
+        klass = pyramid_sqlassist.generate_container_class()
+        self.assertTrue(issubclass(klass, pyramid_sqlassist.DbSessionsContainer))
+        self.assertEqual(klass.__name__, "DbSessionsContainer")
+        for engine_name in ("reader", "writer", "analytics"):
+            accessor = klass.__dict__[engine_name]
+            self.assertIsInstance(
+                accessor, pyramid_sqlassist.interface._EngineSessionAccessor
+            )
+            self.assertIs(
+                accessor.wrapped_engine,
+                pyramid_sqlassist.get_wrapped_engine(engine_name),
+            )
+        # `logger` is not registered, so the stock accessor remains
+        self.assertNotIn("logger", klass.__dict__)
+
+    def test_accessor_memoizes(self):
+        klass = pyramid_sqlassist.generate_container_class()
+        dbSession = klass(self.request)
+        self.assertNotIn("analytics", dbSession.__dict__)
+        session = getattr(dbSession, "analytics")
+        self.assertIn("analytics", dbSession.__dict__)
+        self.assertIs(session, getattr(dbSession, "analytics"))
+        # non-scoped sessions are stored on the container
+        self.assertIs(session, dbSession._sessions["analytics"])
+        self.assertIsNot(
+            session, pyramid_sqlassist.get_wrapped_engine("analytics").sa_session
+        )
+        self.assertEqual(
+            pyramid_sqlassist.STATUS_CODES.START,
+            dbSession._engine_status_tracker.engines["analytics"],
+        )
+        self.assertEqual(
+            pyramid_sqlassist.STATUS_CODES.INIT,
+            dbSession._engine_status_tracker.engines["reader"],
+        )
+
+    def test_session_deprecated_for_non_scoped(self):
+        wrapped = pyramid_sqlassist.get_wrapped_engine("analytics")
+        with self.assertWarns(DeprecationWarning):
+            self.assertIs(wrapped.session, wrapped.sa_session)
+        with self.assertWarns(DeprecationWarning):
+            self.assertIs(
+                pyramid_sqlassist.get_session("analytics"), wrapped.sa_session
+            )
+        pyramid_sqlassist.initialize_engine(
+            "scoped", sqlalchemy.create_engine("sqlite://"), is_scoped=True
+        )
+        try:
+            wrapped = pyramid_sqlassist.get_wrapped_engine("scoped")
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                self.assertIs(wrapped.session, wrapped.sa_session_scoped)
+                self.assertIs(
+                    pyramid_sqlassist.get_session("scoped"), wrapped.sa_session_scoped
+                )
+        finally:
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("scoped")
+
+    def test_existing_attributes_preserved(self):
+        class CustomContainer(pyramid_sqlassist.DbSessionsContainer):
+            @property
+            def analytics(self):
+                return "custom"
+
+        klass = pyramid_sqlassist.generate_container_class(CustomContainer)
+        self.assertTrue(issubclass(klass, CustomContainer))
+        self.assertNotIn("analytics", klass.__dict__)
+        self.assertEqual(getattr(klass(self.request), "analytics"), "custom")
+
+    def test_register_request_method(self):
+        pyramid_sqlassist.register_request_method(self.config, "dbSessionGenerated")
+        pyramid_sqlassist.register_request_method(
+            self.config, "dbSessionStock", generate_accessors=False
+        )
+        request = Request.blank("/")
+        request.registry = self.config.registry
+        apply_request_extensions(request)
+        self.assertIsNot(
+            type(request.dbSessionGenerated), pyramid_sqlassist.DbSessionsContainer
+        )
+        self.assertIn("analytics", type(request.dbSessionGenerated).__dict__)
+        self.assertIs(
+            type(request.dbSessionStock), pyramid_sqlassist.DbSessionsContainer
+        )
+
 
 # = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = =
 
@@ -222,6 +403,10 @@ class TestPyramidTm(unittest.TestCase):
             print(exc)
 
     def tearDown(self):
+        for engine_name in ("reader", "writer"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
         testing.tearDown()
 
     def test_tm__not_enabled(self):
@@ -309,6 +494,9 @@ class TestPyramidTm(unittest.TestCase):
 
 
 class TestInitializeEngine(unittest.TestCase):
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("reader", None)
+
     def test_zope_requires_scope__fail(self):
         settings = {
             "sqlalchemy_reader.url": "sqlite://",
@@ -429,6 +617,2274 @@ class TestInitializeEngine(unittest.TestCase):
         )
 
 
+class _TestEngineGroupHarness(object):
+    is_scoped = False
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.request = testing.DummyRequest()
+        self.engine_replica1 = sqlalchemy.create_engine("sqlite://")
+        self.engine_replica2 = sqlalchemy.create_engine("sqlite://")
+        for _engine in (self.engine_replica1, self.engine_replica2):
+            model_objects.DeclaredTable.metadata.create_all(_engine)
+
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("reader", None)
+        testing.tearDown()
+
+    def _initialize_group(self, **kwargs) -> pyramid_sqlassist.EngineGroup:
+        engine_group = pyramid_sqlassist.EngineGroup(
+            {"replica1": self.engine_replica1, "replica2": self.engine_replica2},
+            **kwargs,
+        )
+        pyramid_sqlassist.initialize_engine(
+            "reader", engine_group, is_scoped=self.is_scoped
+        )
+        return engine_group
+
+    def _request_selection(self) -> str:
+        """runs a request against the `reader`, returns the selected member"""
+        dbSession = pyramid_sqlassist.DbSessionsContainer(self.request)
+        touched = dbSession.reader  # noqa
+        selected = dbSession._engine_selections["reader"]
+        pyramid_sqlassist.request_cleanup(self.request, dbSession)
+        return selected
+
+
+class TestEngineGroup(_TestEngineGroupHarness, unittest.TestCase):
+    def test_wrapper(self):
+        engine_group = self._initialize_group()
+        wrapped = pyramid_sqlassist.get_wrapped_engine("reader")
+        self.assertIsInstance(wrapped, pyramid_sqlassist.EngineGroupWrapper)
+        assert isinstance(wrapped, pyramid_sqlassist.EngineGroupWrapper)  # mypy
+        self.assertIs(wrapped.engine_group, engine_group)
+        self.assertIs(wrapped.sa_engine, self.engine_replica1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.EngineGroup({})
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.EngineGroup(
+                {"replica1": self.engine_replica1}, selector="invalid"
+            )
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.EngineGroup(
+                {"replica1": self.engine_replica1}, weights={"replica2": 1}
+            )
+
+    def test_round_robin(self):
+        self._initialize_group()
+        selections = [self._request_selection() for i in range(4)]
+        self.assertEqual(selections, ["replica1", "replica2", "replica1", "replica2"])
+
+    def test_weighted(self):
+        self._initialize_group(
+            selector="weighted", weights={"replica1": 0, "replica2": 1}
+        )
+        selections = set(self._request_selection() for i in range(10))
+        self.assertEqual(selections, {"replica2"})
+
+    def test_least_connections(self):
+        self.engine_replica1 = sqlalchemy.create_engine(
+            "sqlite://", poolclass=sqlalchemy.pool.QueuePool
+        )
+        self._initialize_group(selector="least_connections")
+        with self.engine_replica1.connect():
+            selections = set(self._request_selection() for i in range(10))
+        self.assertEqual(selections, {"replica2"})
+
+    def test_pinned(self):
+        self._initialize_group()
+        # only the second replica has data
+        with self.engine_replica2.begin() as conn:
+            conn.execute(
+                model_objects.FooObject.__table__.insert(),
+                {"id": 1, "id_alt": 1, "timestamp": datetime.datetime.now()},
+            )
+        for expected in ("replica1", "replica2"):
+            dbSession = pyramid_sqlassist.DbSessionsContainer(self.request)
+            for i in range(3):
+                foo = dbSession.reader.query(model_objects.FooObject).first()
+                self.assertEqual(dbSession._engine_selections["reader"], expected)
+                if expected == "replica1":
+                    self.assertIsNone(foo)
+                else:
+                    self.assertIsNotNone(foo)
+            self.assertIs(
+                dbSession.reader.get_bind(),
+                getattr(self, "engine_%s" % expected),
+            )
+            pyramid_sqlassist.request_cleanup(self.request, dbSession)
+
+    def test_reinit_engine(self):
+        self._initialize_group()
+        with mock.patch.object(
+            self.engine_replica1, "dispose"
+        ) as dispose1, mock.patch.object(self.engine_replica2, "dispose") as dispose2:
+            pyramid_sqlassist.reinit_engine("reader")
+        self.assertEqual(dispose1.call_count, 1)
+        self.assertEqual(dispose2.call_count, 1)
+
+
+class TestEngineGroup_Scoped(TestEngineGroup):
+    is_scoped = True
+
+
+class TestEngineGroupHealth(_TestEngineGroupHarness, unittest.TestCase):
+    def setUp(self):
+        _TestEngineGroupHarness.setUp(self)
+        # the probes run in other threads, so the SQLite connection is shared
+        self.engine_replica1, self.engine_replica2 = [
+            sqlalchemy.create_engine(
+                "sqlite://",
+                poolclass=sqlalchemy.pool.StaticPool,
+                connect_args={"check_same_thread": False},
+            )
+            for i in range(2)
+        ]
+        self.probe_count = 0
+        for _engine in (self.engine_replica1, self.engine_replica2):
+            self._set_lag(_engine, 0)
+
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("writer", None)
+        _TestEngineGroupHarness.tearDown(self)
+
+    def _set_lag(self, sa_engine, lag):
+        with sa_engine.begin() as conn:
+            conn.execute(
+                sqlalchemy.text("CREATE TABLE IF NOT EXISTS replica_status (lag FLOAT)")
+            )
+            conn.execute(sqlalchemy.text("DELETE FROM replica_status"))
+            conn.execute(
+                sqlalchemy.text("INSERT INTO replica_status (lag) VALUES (:lag)"),
+                {"lag": lag},
+            )
+
+    def _probe(self, connection):
+        """a SQLite stand-in for a replication lag query"""
+        self.probe_count += 1
+        return connection.execute(
+            sqlalchemy.text("SELECT lag FROM replica_status")
+        ).scalar()
+
+    def _initialize_monitored_group(self, **kwargs):
+        monitor_kwargs: Dict[str, Any] = {"probe": self._probe, "autostart": False}
+        for k in ("max_lag", "max_latency", "interval", "autostart", "probe_timeout"):
+            if k in kwargs:
+                monitor_kwargs[k] = kwargs.pop(k)
+        health_monitor = pyramid_sqlassist.ReplicaHealthMonitor(**monitor_kwargs)
+        return self._initialize_group(health_monitor=health_monitor, **kwargs)
+
+    def test_healthy_before_probe(self):
+        engine_group = self._initialize_monitored_group(max_lag=10)
+        assert engine_group.health_monitor is not None  # mypy
+        self.assertEqual(
+            engine_group.health_monitor.healthy_members, ["replica1", "replica2"]
+        )
+        self.assertEqual(self.probe_count, 0)
+
+    def test_lag(self):
+        engine_group = self._initialize_monitored_group(max_lag=10)
+        assert engine_group.health_monitor is not None  # mypy
+        self._set_lag(self.engine_replica1, 30)
+        self.assertTrue(engine_group.health_monitor.run_probes())
+        health = engine_group.health_monitor.health
+        self.assertFalse(health["replica1"].is_healthy)
+        self.assertEqual(health["replica1"].lag, 30)
+        self.assertTrue(health["replica2"].is_healthy)
+        self.assertEqual(engine_group.health_monitor.healthy_members, ["replica2"])
+
+        probe_count = self.probe_count
+        selections = set(self._request_selection() for i in range(4))
+        self.assertEqual(selections, {"replica2"})
+        # requests never probe
+        self.assertEqual(self.probe_count, probe_count)
+
+    def test_probe_error(self):
+        engine_group = self._initialize_monitored_group()
+        assert engine_group.health_monitor is not None  # mypy
+        with self.engine_replica2.begin() as conn:
+            conn.execute(sqlalchemy.text("DROP TABLE replica_status"))
+        engine_group.health_monitor.run_probes()
+        health = engine_group.health_monitor.health
+        self.assertTrue(health["replica1"].is_healthy)
+        self.assertFalse(health["replica2"].is_healthy)
+        self.assertIsNotNone(health["replica2"].error)
+
+    def test_rate_limited(self):
+        engine_group = self._initialize_monitored_group(interval=60)
+        assert engine_group.health_monitor is not None  # mypy
+        self.assertTrue(engine_group.health_monitor.run_probes())
+        self.assertEqual(self.probe_count, 2)
+        self.assertFalse(engine_group.health_monitor.run_probes())
+        self.assertEqual(self.probe_count, 2)
+        self.assertTrue(engine_group.health_monitor.run_probes(force=True))
+        self.assertEqual(self.probe_count, 4)
+
+    def test_fallback(self):
+        engine_writer = sqlalchemy.create_engine("sqlite://")
+        pyramid_sqlassist.initialize_engine(
+            "writer", engine_writer, is_scoped=self.is_scoped
+        )
+        engine_group = self._initialize_monitored_group(
+            max_latency=0, fallback_engine="writer"
+        )
+        assert engine_group.health_monitor is not None  # mypy
+        engine_group.health_monitor.run_probes()
+        self.assertEqual(engine_group.health_monitor.healthy_members, [])
+
+        dbSession = pyramid_sqlassist.DbSessionsContainer(self.request)
+        self.assertIs(dbSession.reader, dbSession.writer)
+        self.assertEqual(dbSession._engine_selections["reader"], "writer")
+        self.assertEqual(
+            pyramid_sqlassist.STATUS_CODES.INIT,
+            dbSession._engine_status_tracker.engines["reader"],
+        )
+        self.assertEqual(
+            pyramid_sqlassist.STATUS_CODES.START,
+            dbSession._engine_status_tracker.engines["writer"],
+        )
+        self.assertEqual(
+            [i.engine_name for i in dbSession._engines_started], ["writer"]
+        )
+
+    def test_fallback_pinned(self):
+        engine_writer = sqlalchemy.create_engine("sqlite://")
+        pyramid_sqlassist.initialize_engine(
+            "writer", engine_writer, is_scoped=self.is_scoped
+        )
+        engine_group = self._initialize_monitored_group(
+            max_latency=0, fallback_engine="writer"
+        )
+        health_monitor = engine_group.health_monitor
+        assert health_monitor is not None  # mypy
+        health_monitor.run_probes()
+        self.assertEqual(health_monitor.healthy_members, [])
+
+        dbSession = pyramid_sqlassist.DbSessionsContainer(self.request)
+        session_writer = dbSession._get_initialized_session("reader")
+        self.assertIs(session_writer, dbSession.writer)
+
+        # the members recover during the request
+        health_monitor.max_latency = None
+        health_monitor.run_probes(force=True)
+        self.assertEqual(health_monitor.healthy_members, ["replica1", "replica2"])
+        for i in range(4):
+            self.assertIs(dbSession._get_initialized_session("reader"), session_writer)
+        self.assertEqual(dbSession._engine_selections["reader"], "writer")
+        self.assertEqual(
+            [i.engine_name for i in dbSession._engines_started], ["writer"]
+        )
+
+    def test_no_fallback(self):
+        engine_group = self._initialize_monitored_group(max_latency=0)
+        assert engine_group.health_monitor is not None  # mypy
+        engine_group.health_monitor.run_probes()
+        self.assertEqual(engine_group.health_monitor.healthy_members, [])
+        selections = set(self._request_selection() for i in range(4))
+        self.assertEqual(selections, {"replica1", "replica2"})
+
+    def test_ensure_started_once(self):
+        engine_group = self._initialize_monitored_group(autostart=True)
+        health_monitor = engine_group.health_monitor
+        assert health_monitor is not None  # mypy
+        barrier = threading.Barrier(8)
+        started = []
+
+        def _start():
+            started.append(1)
+            # widen the window between the check and `_pid` being set
+            time.sleep(0.05)
+            health_monitor._pid = os.getpid()
+
+        def _ensure_started():
+            barrier.wait()
+            health_monitor.ensure_started()
+
+        with mock.patch.object(health_monitor, "start", side_effect=_start):
+            threads = [threading.Thread(target=_ensure_started) for i in range(8)]
+            for _thread in threads:
+                _thread.start()
+            for _thread in threads:
+                _thread.join()
+        self.assertEqual(len(started), 1)
+
+    def test_probe_timeout(self):
+        engine_group = self._initialize_monitored_group(probe_timeout=0.05)
+        health_monitor = engine_group.health_monitor
+        assert health_monitor is not None  # mypy
+        release = threading.Event()
+        probing = threading.Event()
+        unlocked = []
+
+        def _probe(connection):
+            if connection.engine is self.engine_replica1:
+                probing.set()
+                release.wait(5)
+            elif health_monitor._lock.acquire(timeout=1):
+                # the lock is not held while probing
+                health_monitor._lock.release()
+                unlocked.append(True)
+            return self._probe(connection)
+
+        health_monitor.probe = _probe
+        try:
+            _started = time.monotonic()
+            self.assertTrue(health_monitor.run_probes())
+            self.assertLess(time.monotonic() - _started, 2)
+            health = health_monitor.health
+            self.assertFalse(health["replica1"].is_healthy)
+            self.assertIn("timed out", health["replica1"].error)
+            self.assertTrue(health["replica2"].is_healthy)
+            self.assertEqual(health_monitor.healthy_members, ["replica2"])
+            self.assertEqual(unlocked, [True])
+
+            # a hung member is not probed again until its probe returns
+            probing.clear()
+            self.assertTrue(health_monitor.run_probes(force=True))
+            self.assertFalse(probing.is_set())
+            self.assertFalse(health_monitor.health["replica1"].is_healthy)
+        finally:
+            release.set()
+        for i in range(200):
+            if not health_monitor._probing:
+                break
+            time.sleep(0.01)
+        self.assertTrue(health_monitor.run_probes(force=True))
+        self.assertTrue(health_monitor.health["replica1"].is_healthy)
+
+    def test_background_thread(self):
+        self._set_lag(self.engine_replica1, 30)
+        engine_group = self._initialize_monitored_group(
+            max_lag=10, interval=0.01, autostart=True
+        )
+        health_monitor = engine_group.health_monitor
+        assert health_monitor is not None  # mypy
+        try:
+            self._request_selection()
+            for i in range(200):
+                if health_monitor.health["replica1"].checked_at is not None:
+                    break
+                time.sleep(0.01)
+            self.assertFalse(health_monitor.health["replica1"].is_healthy)
+            self.assertEqual(health_monitor.healthy_members, ["replica2"])
+        finally:
+            health_monitor.stop()
+
+
+class TestReadYourWrites(_TestPyramidAppHarness, unittest.TestCase):
+    def _new_request(self, **kwargs):
+        request = testing.DummyRequest(**kwargs)
+        request.registry = self.config.registry
+        request.dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        return request
+
+    def _commit_writer(self, request, with_changes=True):
+        if with_changes:
+            foo = model_objects.FooObject()
+            foo.id_alt = 1
+            foo.timestamp = datetime.datetime.now()
+            request.dbSession.writer.add(foo)
+        request.dbSession.writer.commit()
+
+    def test_request_store(self):
+        pyramid_sqlassist.enable_read_your_writes(
+            store=pyramid_sqlassist.RequestReadYourWritesStore()
+        )
+        request = self._new_request()
+        reader = request.dbSession.reader
+        self.assertIsNot(reader, request.dbSession.writer)
+
+        # a commit without changes is not sticky
+        self._commit_writer(request, with_changes=False)
+        self.assertIs(request.dbSession.reader, reader)
+
+        # the memoized reader is evicted on commit
+        self._commit_writer(request)
+        self.assertIs(request.dbSession.reader, request.dbSession.writer)
+        self.assertEqual(request.dbSession._engine_selections["reader"], "writer")
+
+        # the window does not extend to a new request
+        request2 = self._new_request()
+        self.assertIsNot(request2.dbSession.reader, request2.dbSession.writer)
+
+    def test_request_store_savepoint_rollback(self):
+        pyramid_sqlassist.enable_read_your_writes(
+            store=pyramid_sqlassist.RequestReadYourWritesStore()
+        )
+        request = self._new_request()
+        foo = model_objects.FooObject()
+        foo.id_alt = 1
+        foo.timestamp = datetime.datetime.now()
+        request.dbSession.writer.add(foo)
+        request.dbSession.writer.flush()
+        request.dbSession.writer.begin_nested().rollback()
+        # the changes flushed before the savepoint are committed
+        self._commit_writer(request, with_changes=False)
+        self.assertIs(request.dbSession.reader, request.dbSession.writer)
+
+    def test_request_store_expires(self):
+        pyramid_sqlassist.enable_read_your_writes(
+            store=pyramid_sqlassist.RequestReadYourWritesStore(), window=0
+        )
+        request = self._new_request()
+        self._commit_writer(request)
+        self.assertIsNot(request.dbSession.reader, request.dbSession.writer)
+
+    def test_cookie_store(self):
+        pyramid_sqlassist.enable_read_your_writes(window=30)
+        request = self._new_request()
+        self._commit_writer(request)
+        self.assertIs(request.dbSession.reader, request.dbSession.writer)
+
+        response = Response()
+        for callback in request.response_callbacks:
+            callback(request, response)
+        cookie = response.headers["Set-Cookie"]
+        self.assertIn("sqlassist_sticky=", cookie)
+        self.assertIn("Max-Age=30", cookie)
+        value = cookie.split(";")[0].split("=")[1]
+
+        request2 = self._new_request(cookies={"sqlassist_sticky": value})
+        self.assertIs(request2.dbSession.reader, request2.dbSession.writer)
+
+        request3 = self._new_request(cookies={"sqlassist_sticky": "1.0"})
+        self.assertIsNot(request3.dbSession.reader, request3.dbSession.writer)
+
+        request4 = self._new_request(cookies={"sqlassist_sticky": "invalid"})
+        self.assertIsNot(request4.dbSession.reader, request4.dbSession.writer)
+
+        # a tampered cookie can not claim more than the window
+        for tampered in ("%.3f" % (time.time() + 3600), "inf", "nan"):
+            request5 = self._new_request(cookies={"sqlassist_sticky": tampered})
+            self.assertIsNot(request5.dbSession.reader, request5.dbSession.writer)
+
+    def test_cookie_store_max_window(self):
+        store = pyramid_sqlassist.CookieReadYourWritesStore(max_window=10)
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.enable_read_your_writes(store=store, window=30)
+        pyramid_sqlassist.enable_read_your_writes(store=store, window=10)
+        request = self._new_request(
+            cookies={"sqlassist_sticky": "%.3f" % (time.time() + 20)}
+        )
+        self.assertIsNot(request.dbSession.reader, request.dbSession.writer)
+
+
+class TestReadYourWrites_Transaction(
+    _TestPyramidAppHarness_Transaction, TestReadYourWrites, unittest.TestCase
+):
+    def _commit_writer(self, request, with_changes=True):
+        if with_changes:
+            foo = model_objects.FooObject()
+            foo.id_alt = 1
+            foo.timestamp = datetime.datetime.now()
+            request.dbSession.writer.add(foo)
+        else:
+            request.dbSession.writer.query(model_objects.FooObject).first()
+        transaction.commit()
+
+
+@unittest.skipUnless(HAS_AIOSQLITE, "requires aiosqlite")
+class TestAsyncInterface(unittest.TestCase):
+    def setUp(self):
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _fd, self._db_path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(_fd)
+        self._async_engine = create_async_engine(
+            "sqlite+aiosqlite:///%s" % self._db_path
+        )
+        pyramid_sqlassist.initialize_async_engine(
+            "writer", self._async_engine, is_default=True
+        )
+        pyramid_sqlassist.initialize_async_engine(
+            "reader", self._async_engine, is_readonly=True
+        )
+
+        async def _create_all():
+            async with self._async_engine.begin() as conn:
+                await conn.run_sync(model_objects.DeclaredTable.metadata.create_all)
+
+        asyncio.run(_create_all())
+
+    def tearDown(self):
+        asyncio.run(pyramid_sqlassist.reinit_async_engine())
+        pyramid_sqlassist._ASYNC_ENGINE_REGISTRY["engines"].clear()
+        pyramid_sqlassist._ASYNC_ENGINE_REGISTRY["!default"] = None
+        os.unlink(self._db_path)
+
+    def test_registry_isolated(self):
+        self.assertNotIn(
+            "analytics", pyramid_sqlassist._ASYNC_ENGINE_REGISTRY["engines"]
+        )
+        self.assertIs(
+            pyramid_sqlassist.get_wrapped_async_engine(),
+            pyramid_sqlassist.get_wrapped_async_engine("writer"),
+        )
+        with self.assertRaises(RuntimeError):
+            pyramid_sqlassist.get_wrapped_async_engine("analytics")
+
+    def test_session_lifecycle(self):
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        async def _run():
+            container = pyramid_sqlassist.AsyncDbSessionsContainer()
+            self.assertEqual(container._engines_started, [])
+            _writer = container.writer
+            self.assertIsInstance(_writer, AsyncSession)
+            self.assertIs(container.writer, _writer)
+            self.assertIs(container.get_session("writer"), _writer)
+            self.assertIsNone(_writer.info["request"])
+            self.assertEqual(
+                container._engine_status_tracker.engines["writer"],
+                pyramid_sqlassist.STATUS_CODES.START,
+            )
+            self.assertEqual(
+                container._engine_status_tracker.engines["reader"],
+                pyramid_sqlassist.STATUS_CODES.INIT,
+            )
+            await container.request_end()
+            self.assertEqual(
+                container._engine_status_tracker.engines["writer"],
+                pyramid_sqlassist.STATUS_CODES.END,
+            )
+            self.assertEqual(container._sessions, {})
+
+        asyncio.run(_run())
+
+    def test_write_then_read(self):
+        async def _run():
+            async with pyramid_sqlassist.AsyncDbSessionsContainer() as dbSession:
+                foo = model_objects.FooObject()
+                foo.id_alt = 1
+                foo.timestamp = datetime.datetime.now()
+                dbSession.writer.add(foo)
+                await dbSession.writer.commit()
+                # `expire_on_commit=False` by default
+                self.assertEqual(foo.id_alt, 1)
+                result = await dbSession.reader.execute(
+                    sqlalchemy.select(sqlalchemy.func.count(model_objects.FooObject.id))
+                )
+                self.assertEqual(result.scalar(), 1)
+            return dbSession
+
+        dbSession = asyncio.run(_run())
+        self.assertEqual(dbSession._sessions, {})
+
+    def test_concurrent_containers(self):
+        async def _handle(idx):
+            async with pyramid_sqlassist.AsyncDbSessionsContainer() as dbSession:
+                result = await dbSession.reader.execute(
+                    sqlalchemy.select(sqlalchemy.literal(idx))
+                )
+                await asyncio.sleep(0)
+                return dbSession.reader, result.scalar()
+
+        async def _run():
+            return await asyncio.gather(*[_handle(i) for i in range(5)])
+
+        results = asyncio.run(_run())
+        self.assertEqual([r[1] for r in results], list(range(5)))
+        self.assertEqual(len({id(r[0]) for r in results}), 5)
+
+    def test_generated_container(self):
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _engine = create_async_engine("sqlite+aiosqlite://")
+        pyramid_sqlassist.initialize_async_engine("analytics", _engine)
+        klass = pyramid_sqlassist.generate_async_container_class()
+        self.assertTrue(issubclass(klass, pyramid_sqlassist.AsyncDbSessionsContainer))
+        self.assertIn("analytics", klass.__dict__)
+
+        async def _run():
+            async with klass() as dbSession:
+                _session = getattr(dbSession, "analytics")
+                self.assertIs(_session, dbSession.get_session("analytics"))
+                result = await _session.execute(sqlalchemy.select(1))
+                self.assertEqual(result.scalar(), 1)
+
+        asyncio.run(_run())
+
+    def test_register_request_method(self):
+        config = testing.setUp()
+        try:
+            pyramid_sqlassist.register_async_request_method(config, "dbSessionAsync")
+            config.commit()
+            request = Request.blank("/")
+            request.registry = config.registry
+            apply_request_extensions(request)
+            dbSession = request.dbSessionAsync
+            self.assertIsInstance(dbSession, pyramid_sqlassist.AsyncDbSessionsContainer)
+            self.assertIs(request.dbSessionAsync, dbSession)
+            self.assertIs(dbSession.reader.info["request"], request)
+            asyncio.run(dbSession.request_end())
+            self.assertEqual(dbSession._sessions, {})
+        finally:
+            testing.tearDown()
+
+
+class TestQueryStats(unittest.TestCase):
+    is_scoped = False
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        model_objects.DeclaredTable.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        for engine_name in ("stats", "reader"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
+        testing.tearDown()
+
+    def _run_request(self, engine_name="stats"):
+        request = testing.DummyRequest()
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        _session = dbSession._get_initialized_session(engine_name)
+        foo = model_objects.FooObject()
+        foo.id_alt = 1
+        foo.timestamp = datetime.datetime.now()
+        _session.add(foo)
+        _session.flush()
+        _session.query(model_objects.FooObject).all()
+        _session.query(model_objects.FooObject).count()
+        pyramid_sqlassist.request_cleanup(request, dbSession)
+        return dbSession
+
+    def test_disabled(self):
+        pyramid_sqlassist.initialize_engine(
+            "stats", self.engine, is_scoped=self.is_scoped
+        )
+        dbSession = self._run_request()
+        self.assertEqual(dbSession.stats, {})
+
+    def test_enabled(self):
+        pyramid_sqlassist.initialize_engine(
+            "stats", self.engine, is_scoped=self.is_scoped, track_query_stats=True
+        )
+        wrapped = pyramid_sqlassist.get_wrapped_engine("stats")
+        self.assertTrue(wrapped.track_query_stats)
+        # listeners are only attached once
+        wrapped.enable_query_stats()
+
+        dbSession = self._run_request()
+        stats = dbSession.stats["stats"]
+        self.assertIsInstance(stats, pyramid_sqlassist.EngineStats)
+        self.assertEqual(stats.statements, 3)
+        self.assertEqual(stats.rows_affected, 1)  # the INSERT
+        self.assertEqual(stats.rows_returned, 2)  # the query and the count
+        self.assertGreater(stats.duration, 0)
+        self.assertEqual(
+            stats.as_dict(),
+            {
+                "statements": 3,
+                "duration": stats.duration,
+                "rows_affected": 1,
+                "rows_returned": 2,
+            },
+        )
+
+        # each container records its own stats
+        dbSession2 = self._run_request()
+        self.assertIsNot(dbSession2.stats["stats"], stats)
+        self.assertEqual(dbSession2.stats["stats"].statements, 3)
+        self.assertEqual(stats.statements, 3)
+
+        # connections outside of a request are not recorded
+        with self.engine.connect() as conn:
+            conn.execute(sqlalchemy.text("SELECT 1"))
+        self.assertEqual(dbSession2.stats["stats"].statements, 3)
+
+    def test_select_not_counted(self):
+        stats = pyramid_sqlassist.EngineStats()
+        conn = mock.Mock(info={pyramid_sqlassist.instrumentation.STATS_KEY: stats})
+        context = mock.Mock(isinsert=False, isupdate=False, isdelete=False)
+        # e.g. `psycopg2` reports the rows of a buffered `SELECT`
+        cursor = mock.Mock(rowcount=5, description=[("id",)])
+        _after_cursor_execute = pyramid_sqlassist.instrumentation._after_cursor_execute
+        _after_cursor_execute(conn, cursor, "SELECT", (), context, False)
+        self.assertEqual(stats.rows_affected, 0)
+        # `INSERT ... RETURNING`
+        context.isinsert = True
+        _after_cursor_execute(conn, cursor, "INSERT", (), context, False)
+        self.assertEqual(stats.rows_affected, 5)
+        # a textual `UPDATE`
+        context.isinsert = False
+        cursor = mock.Mock(rowcount=2, description=None)
+        _after_cursor_execute(conn, cursor, "UPDATE", (), context, False)
+        self.assertEqual(stats.rows_affected, 7)
+        self.assertEqual(stats.statements, 3)
+        self.assertEqual(stats.rows_returned, 0)
+
+    def test_listen_sessionmaker(self):
+        instrumentation = pyramid_sqlassist.instrumentation
+        for i in range(20):
+            # each sessionmaker may reuse the `id()` of the last
+            sa_sessionmaker = sqlalchemy.orm.sessionmaker(bind=self.engine)
+            instrumentation.listen_sessionmaker(sa_sessionmaker)
+            instrumentation.listen_sessionmaker(sa_sessionmaker)
+            with sa_sessionmaker() as _session:
+                _session.info["request"] = request = testing.DummyRequest()
+                connection = _session.connection()
+                self.assertIs(connection.info[instrumentation.REQUEST_KEY], request)
+            del sa_sessionmaker
+
+    def test_rows_returned(self):
+        pyramid_sqlassist.initialize_engine(
+            "stats", self.engine, is_scoped=self.is_scoped, track_query_stats=True
+        )
+        request = testing.DummyRequest()
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        _session = dbSession._get_initialized_session("stats")
+        for i in range(5):
+            foo = model_objects.FooObject()
+            foo.id_alt = i
+            foo.timestamp = datetime.datetime.now()
+            _session.add(foo)
+        _session.flush()
+        stats = dbSession.stats["stats"]
+        self.assertEqual(stats.rows_returned, 0)
+
+        # rows are counted as they are fetched
+        result = _session.execute(sqlalchemy.text("SELECT id FROM foo_object"))
+        result.fetchone()
+        self.assertEqual(stats.rows_returned, 1)
+        result.fetchmany(2)
+        self.assertEqual(stats.rows_returned, 3)
+        result.fetchall()
+        self.assertEqual(stats.rows_returned, 5)
+
+        # a streamed result is counted once per row
+        stmt = sqlalchemy.select(model_objects.FooObject).execution_options(yield_per=2)
+        self.assertEqual(len(_session.scalars(stmt).all()), 5)
+        self.assertEqual(stats.rows_returned, 10)
+
+        # rows which are never fetched are not counted
+        _session.execute(sqlalchemy.text("SELECT id FROM foo_object")).close()
+        self.assertEqual(stats.rows_returned, 10)
+        pyramid_sqlassist.request_cleanup(request, dbSession)
+
+    def test_engine_group(self):
+        engine_group = pyramid_sqlassist.EngineGroup(
+            {"replica1": self.engine, "replica2": sqlalchemy.create_engine("sqlite://")}
+        )
+        model_objects.DeclaredTable.metadata.create_all(
+            engine_group.engines["replica2"]
+        )
+        pyramid_sqlassist.initialize_engine(
+            "reader", engine_group, is_scoped=self.is_scoped, track_query_stats=True
+        )
+        for _i in range(2):
+            dbSession = self._run_request("reader")
+            self.assertEqual(dbSession.stats["reader"].statements, 3)
+
+
+class TestQueryStats_Scoped(TestQueryStats):
+    is_scoped = True
+
+
+class TestSlowQueryLog(unittest.TestCase):
+    is_scoped = False
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        model_objects.DeclaredTable.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("slow", None)
+        testing.tearDown()
+
+    def _run_request(self, route_name=None):
+        request = testing.DummyRequest()
+        if route_name is not None:
+            request.matched_route = mock.Mock()
+            request.matched_route.name = route_name
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        _session = dbSession._get_initialized_session("slow")
+        _session.query(model_objects.FooObject).filter(
+            model_objects.FooObject.status == "secret"
+        ).all()
+        pyramid_sqlassist.request_cleanup(request, dbSession)
+
+    def _records(self, cm):
+        return [r.sqlassist_slow_query for r in cm.records]
+
+    def test_logged(self):
+        pyramid_sqlassist.initialize_engine(
+            "slow", self.engine, is_scoped=self.is_scoped, slow_query_threshold=0
+        )
+        with self.assertLogs(
+            "pyramid_sqlassist.instrumentation.slow_query", level="WARNING"
+        ) as cm:
+            self._run_request(route_name="foo_route")
+        records = self._records(cm)
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record["engine_name"], "slow")
+        self.assertEqual(record["route"], "foo_route")
+        self.assertIn("FROM foo_object", record["statement"])
+        self.assertIn("secret", record["parameters"])
+        self.assertGreaterEqual(record["duration"], 0)
+        self.assertIsNone(record["stack"])
+        self.assertIn("route=foo_route", cm.output[0])
+
+    def test_redacted_with_stack(self):
+        pyramid_sqlassist.initialize_engine(
+            "slow",
+            self.engine,
+            is_scoped=self.is_scoped,
+            slow_query_threshold=0,
+            slow_query_redact_params=True,
+            slow_query_stack_sample_rate=1.0,
+        )
+        with self.assertLogs(
+            "pyramid_sqlassist.instrumentation.slow_query", level="WARNING"
+        ) as cm:
+            self._run_request()
+        record = self._records(cm)[0]
+        self.assertIsNone(record["route"])
+        self.assertEqual(record["parameters"], ("?",))
+        self.assertNotIn("secret", cm.output[0])
+        self.assertIn("_run_request", record["stack"])
+        self.assertNotIn("/sqlalchemy/", record["stack"])
+
+    def test_fast(self):
+        pyramid_sqlassist.initialize_engine(
+            "slow", self.engine, is_scoped=self.is_scoped, slow_query_threshold=60
+        )
+        wrapped = pyramid_sqlassist.get_wrapped_engine("slow")
+        assert wrapped.slow_query_log is not None  # mypy
+        with mock.patch.object(wrapped.slow_query_log, "log") as mocked:
+            self._run_request()
+        self.assertFalse(mocked.called)
+
+        # reconfiguring does not attach the listeners again
+        slow_query_log = wrapped.enable_slow_query_log(0)
+        self.assertIs(slow_query_log, wrapped.slow_query_log)
+        with self.assertLogs(
+            "pyramid_sqlassist.instrumentation.slow_query", level="WARNING"
+        ) as cm:
+            self._run_request()
+        self.assertEqual(len(cm.records), 1)
+
+    def test_invalid_sample_rate(self):
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.initialize_engine(
+                "slow",
+                self.engine,
+                slow_query_threshold=0,
+                slow_query_stack_sample_rate=2,
+            )
+
+
+class TestSlowQueryLog_Scoped(TestSlowQueryLog):
+    is_scoped = True
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def setUp(self):
+        self.config = testing.setUp()
+        self.engine = sqlalchemy.create_engine(
+            "sqlite://",
+            poolclass=sqlalchemy.pool.QueuePool,
+            pool_size=1,
+            max_overflow=1,
+            pool_timeout=0.01,
+        )
+
+    def tearDown(self):
+        for engine_name in ("pooled", "reader"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
+        testing.tearDown()
+
+    def test_disabled(self):
+        pyramid_sqlassist.initialize_engine("pooled", self.engine)
+        self.assertIsNone(pyramid_sqlassist.get_wrapped_engine("pooled").pool_metrics)
+        self.assertNotIn("pooled", pyramid_sqlassist.get_pool_metrics())
+
+    def test_metrics(self):
+        pyramid_sqlassist.initialize_engine(
+            "pooled", self.engine, track_pool_metrics=True
+        )
+        conn1 = self.engine.connect()
+        conn2 = self.engine.connect()
+        with self.assertRaises(sqlalchemy.exc.TimeoutError):
+            self.engine.connect()
+        snapshot = pyramid_sqlassist.get_pool_metrics()["pooled"]["pooled"]
+        self.assertEqual(snapshot["checkouts"], 2)
+        self.assertEqual(snapshot["checkins"], 0)
+        self.assertEqual(snapshot["checked_out"], 2)
+        self.assertEqual(snapshot["pool_size"], 1)
+        self.assertEqual(snapshot["overflow"], 1)
+        self.assertEqual(snapshot["checkout_timeouts"], 1)
+        self.assertEqual(snapshot["checkout_wait"]["count"], 3)
+        self.assertEqual(snapshot["checkout_wait"]["buckets"][-1][1], 3)
+        self.assertEqual(snapshot["connect_time"]["count"], 2)
+
+        conn1.close()
+        conn2.invalidate()
+        conn2.close()
+
+        # the checkout timer survives `dispose`
+        pyramid_sqlassist.reinit_engine("pooled")
+        self.engine.connect().close()
+        snapshot = pyramid_sqlassist.get_pool_metrics()["pooled"]["pooled"]
+        self.assertEqual(snapshot["checkouts"], 3)
+        self.assertEqual(snapshot["checkins"], 3)
+        self.assertEqual(snapshot["checked_out"], 0)
+        self.assertEqual(snapshot["invalidations"], 1)
+        self.assertEqual(snapshot["checkout_wait"]["count"], 4)
+
+    def test_engine_group(self):
+        engine_group = pyramid_sqlassist.EngineGroup(
+            {"replica1": self.engine, "replica2": sqlalchemy.create_engine("sqlite://")}
+        )
+        pyramid_sqlassist.initialize_engine(
+            "reader", engine_group, track_pool_metrics=True
+        )
+        wrapped = pyramid_sqlassist.get_wrapped_engine("reader")
+        # metrics are only attached once
+        self.assertIs(wrapped.enable_pool_metrics(), wrapped.pool_metrics)
+        engine_group.engines["replica2"].connect().close()
+        snapshot = pyramid_sqlassist.get_pool_metrics()["reader"]
+        self.assertEqual(sorted(snapshot.keys()), ["replica1", "replica2"])
+        self.assertEqual(snapshot["replica1"]["checkouts"], 0)
+        self.assertEqual(snapshot["replica2"]["checkouts"], 1)
+        # `SingletonThreadPool` has no size or overflow
+        self.assertIsNone(snapshot["replica2"]["pool_size"])
+        self.assertIsNone(snapshot["replica2"]["overflow"])
+        self.assertEqual(snapshot["replica2"]["checked_out"], 0)
+
+    def test_prometheus(self):
+        pyramid_sqlassist.initialize_engine(
+            "pooled", self.engine, track_pool_metrics=True
+        )
+        self.engine.connect().close()
+        text = pyramid_sqlassist.get_pool_metrics_prometheus()
+        self.assertIn("# TYPE sqlassist_pool_checkouts_total counter\n", text)
+        self.assertIn(
+            'sqlassist_pool_checkouts_total{engine="pooled",member="pooled"} 1\n',
+            text,
+        )
+        self.assertIn('sqlassist_pool_size{engine="pooled",member="pooled"} 1\n', text)
+        self.assertIn(
+            'sqlassist_pool_checkout_wait_seconds_bucket{engine="pooled",member="pooled",le="+Inf"} 1\n',
+            text,
+        )
+        self.assertIn(
+            'sqlassist_pool_connect_seconds_count{engine="pooled",member="pooled"} 1\n',
+            text,
+        )
+        self.assertTrue(text.endswith("\n"))
+
+
+class TestSessionStartPolicy(unittest.TestCase):
+    def setUp(self):
+        self.config = testing.setUp()
+        self.engine = sqlalchemy.create_engine("sqlite://")
+
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("policy", None)
+        testing.tearDown()
+
+    def _start(self, policy, dirty=False):
+        """starts a request; returns the number of `rollback()` calls"""
+        pyramid_sqlassist.initialize_engine(
+            "policy", self.engine, session_start_policy=policy
+        )
+        wrapped = pyramid_sqlassist.get_wrapped_engine("policy")
+        if dirty:
+            # leave a transaction open on the thread's scoped session
+            wrapped.sa_session_scoped().execute(sqlalchemy.text("SELECT 1"))
+        request = testing.DummyRequest()
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        with mock.patch.object(
+            sqlalchemy.orm.Session,
+            "rollback",
+            autospec=True,
+            side_effect=sqlalchemy.orm.Session.rollback,
+        ) as mocked:
+            dbSession._get_initialized_session("policy")
+        pyramid_sqlassist.request_cleanup(request, dbSession)
+        return mocked.call_count
+
+    def test_rollback(self):
+        self.assertEqual(self._start("rollback"), 1)
+        self.assertEqual(self._start("rollback", dirty=True), 1)
+
+    def test_none(self):
+        self.assertEqual(self._start("none"), 0)
+        self.assertEqual(self._start("none", dirty=True), 0)
+
+    def test_verify(self):
+        self.assertEqual(self._start("verify"), 0)
+        self.assertEqual(self._start("verify", dirty=True), 1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.initialize_engine(
+                "policy", self.engine, session_start_policy="commit"
+            )
+        self.assertNotIn(
+            "policy", pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"]
+        )
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.config = testing.setUp()
+
+    def tearDown(self):
+        for engine_name in ("warm", "reader"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
+        pyramid_sqlassist.interface._WARMUP_PENDING.clear()
+        testing.tearDown()
+
+    def _engine(self, connect_hook=None, **kwargs):
+        def _creator():
+            if connect_hook is not None:
+                connect_hook()
+            return sqlite3.connect(":memory:", check_same_thread=False)
+
+        return sqlalchemy.create_engine(
+            "sqlite://",
+            creator=_creator,
+            poolclass=sqlalchemy.pool.QueuePool,
+            pool_size=2,
+            **kwargs,
+        )
+
+    def test_initialize(self):
+        engine = self._engine()
+        pyramid_sqlassist.initialize_engine("warm", engine, warmup_connections=5)
+        # deferred to `warmup_engines`
+        self.assertEqual(engine.pool.checkedin(), 0)
+        results = pyramid_sqlassist.warmup_engines()
+        # capped at the pool size
+        self.assertEqual(results, {"warm": {"warm": 2}})
+        self.assertEqual(engine.pool.checkedin(), 2)
+        self.assertEqual(engine.pool.checkedout(), 0)
+        # only warmed once
+        self.assertEqual(pyramid_sqlassist.warmup_engines(), {})
+
+    def test_initialize_parallel(self):
+        # each engine's connection waits for the other's, so the engines can
+        # only be warmed if they are warmed together
+        barrier = threading.Barrier(2, timeout=5)
+        engines = [self._engine(connect_hook=barrier.wait) for i in range(2)]
+        pyramid_sqlassist.initialize_engine(
+            "warm", engines[0], warmup_connections=1, warmup_timeout=10
+        )
+        pyramid_sqlassist.initialize_engine(
+            "reader", engines[1], warmup_connections=1, warmup_timeout=1
+        )
+        results = pyramid_sqlassist.warmup_engines()
+        self.assertEqual(results, {"warm": {"warm": 1}, "reader": {"reader": 1}})
+
+    def test_initialize_config_action(self):
+        engine = self._engine()
+        pyramid_sqlassist.initialize_engine("warm", engine, warmup_connections=1)
+        config = Configurator()
+        pyramid_sqlassist.register_request_method(config, "dbSession")
+        self.assertEqual(engine.pool.checkedin(), 0)
+        config.commit()
+        self.assertEqual(engine.pool.checkedin(), 1)
+
+    def test_reinit(self):
+        engine = self._engine()
+        pyramid_sqlassist.initialize_engine("warm", engine)
+        self.assertEqual(engine.pool.checkedin(), 0)
+        pyramid_sqlassist.reinit_engine(warmup_connections=1)
+        self.assertEqual(engine.pool.checkedin(), 1)
+        pyramid_sqlassist.reinit_engine("warm", warmup_connections=2)
+        self.assertEqual(engine.pool.checkedin(), 2)
+        pyramid_sqlassist.reinit_engine("warm")
+        self.assertEqual(engine.pool.checkedin(), 0)
+
+    def test_engine_group(self):
+        engine_group = pyramid_sqlassist.EngineGroup(
+            {
+                "replica1": self._engine(),
+                "replica2": self._engine(),
+                "replica3": sqlalchemy.create_engine("sqlite://"),
+            }
+        )
+        pyramid_sqlassist.initialize_engine("reader", engine_group)
+        results = pyramid_sqlassist.warmup_engine("reader", connections=2)
+        # `SingletonThreadPool` is not warmed
+        self.assertEqual(
+            results, {"reader": {"replica1": 2, "replica2": 2, "replica3": 0}}
+        )
+
+    def test_parallel_timeout(self):
+        # the first connection of each engine waits for the other's, so it can
+        # only be opened if the engines are warmed in parallel
+        barrier = threading.Barrier(2, timeout=10)
+        # later connections are blocked until released
+        released = threading.Event()
+
+        def _connect_hook():
+            connects = []
+
+            def _hook():
+                connects.append(1)
+                if len(connects) == 1:
+                    barrier.wait()
+                else:
+                    released.wait(10)
+
+            return _hook
+
+        engines = [self._engine(connect_hook=_connect_hook()) for i in range(2)]
+        pyramid_sqlassist.initialize_engine("warm", engines[0])
+        pyramid_sqlassist.initialize_engine("reader", engines[1])
+        results = pyramid_sqlassist.warmup_engine(connections=1, timeout=10)
+        self.assertEqual(results, {"warm": {"warm": 1}, "reader": {"reader": 1}})
+
+        pyramid_sqlassist.reinit_engine("warm")
+        pyramid_sqlassist.reinit_engine("reader")
+        try:
+            started = time.monotonic()
+            results = pyramid_sqlassist.warmup_engine(connections=1, timeout=0.1)
+            self.assertLess(time.monotonic() - started, 5)
+            # the blocked connections were not opened by the timeout
+            self.assertEqual(results, {"warm": {}, "reader": {}})
+        finally:
+            released.set()
+
+    def test_unknown(self):
+        with self.assertRaises(KeyError):
+            pyramid_sqlassist.warmup_engine("warm")
+
+
+class TestForkSafety(unittest.TestCase):
+    def setUp(self):
+        self.config = testing.setUp()
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        pyramid_sqlassist.initialize_engine("forked", self.engine)
+
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("forked", None)
+        testing.tearDown()
+
+    def _start_request(self):
+        request = testing.DummyRequest()
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        dbSession._get_initialized_session("forked")
+        pyramid_sqlassist.request_cleanup(request, dbSession)
+
+    def test_lazy_dispose(self):
+        wrapped = pyramid_sqlassist.get_wrapped_engine("forked")
+        pool = self.engine.pool
+        self._start_request()
+        self.assertIs(self.engine.pool, pool)
+
+        _pid = os.getpid() + 1
+        with mock.patch.object(pool, "dispose") as mocked_dispose:
+            with mock.patch("pyramid_sqlassist.interface.os.getpid", return_value=_pid):
+                self._start_request()
+                self.assertEqual(wrapped._pid, _pid)
+                pool2 = self.engine.pool
+                self.assertIsNot(pool2, pool)
+                # only once per process
+                self._start_request()
+                self.assertIs(self.engine.pool, pool2)
+        # the parent's connections are not closed
+        self.assertFalse(mocked_dispose.called)
+
+    def test_register_fork_hook(self):
+        pool = self.engine.pool
+        with mock.patch.dict(pyramid_sqlassist.interface._FORK_HOOK, registered=False):
+            with mock.patch("os.register_at_fork") as mocked:
+                self.assertTrue(pyramid_sqlassist.register_fork_hook())
+                self.assertTrue(pyramid_sqlassist.register_fork_hook())
+            self.assertEqual(mocked.call_count, 1)
+            hook = mocked.call_args[1]["after_in_child"]
+        hook()
+        self.assertIsNot(self.engine.pool, pool)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires os.fork")
+    def test_fork(self):
+        pyramid_sqlassist.register_fork_hook()
+        pool_id = id(self.engine.pool)
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            os._exit(0 if id(self.engine.pool) != pool_id else 1)
+        _pid, status = os.waitpid(pid, 0)
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+        self.assertEqual(id(self.engine.pool), pool_id)
+
+
+class TestNonScopedSessions(unittest.TestCase):
+    def setUp(self):
+        self.config = testing.setUp()
+        pyramid_sqlassist.initialize_engine(
+            "unscoped", sqlalchemy.create_engine("sqlite://"), is_scoped=False
+        )
+
+    def tearDown(self):
+        for engine_name in ("unscoped", "unscoped_late"):
+            pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop(
+                engine_name, None
+            )
+        testing.tearDown()
+
+    def test_initialized_after_container(self):
+        request = testing.DummyRequest()
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        pyramid_sqlassist.initialize_engine(
+            "unscoped_late", sqlalchemy.create_engine("sqlite://"), is_scoped=False
+        )
+        _session = dbSession._get_initialized_session("unscoped_late")
+        assert isinstance(_session, sqlalchemy.orm.Session)  # mypy
+        self.assertIs(_session.info["request"], request)
+        self.assertIs(dbSession._get_initialized_session("unscoped_late"), _session)
+        self.assertEqual(
+            [i.engine_name for i in dbSession._engines_started], ["unscoped_late"]
+        )
+        _session.execute(sqlalchemy.text("SELECT 1"))
+        pyramid_sqlassist.request_cleanup(request, dbSession)
+        self.assertFalse(_session.in_transaction())
+
+    def test_session_init_failed(self):
+        wrapped = pyramid_sqlassist.get_wrapped_engine("unscoped")
+        request = testing.DummyRequest()
+        dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+        with mock.patch.object(wrapped, "sa_sessionmaker", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                dbSession._get_initialized_session("unscoped")
+        # the engine was started, but the session is created on the next access
+        _session = dbSession._get_initialized_session("unscoped")
+        self.assertIs(dbSession._sessions["unscoped"], _session)
+        pyramid_sqlassist.request_cleanup(request, dbSession)
+
+    def test_per_container(self):
+        wrapped = pyramid_sqlassist.get_wrapped_engine("unscoped")
+        shared = wrapped.sa_session
+        request1 = testing.DummyRequest()
+        request2 = testing.DummyRequest()
+        dbSession1 = pyramid_sqlassist.DbSessionsContainer(request1)
+        dbSession2 = pyramid_sqlassist.DbSessionsContainer(request2)
+        session1 = dbSession1._get_initialized_session("unscoped")
+        session2 = dbSession2._get_initialized_session("unscoped")
+        assert isinstance(session1, sqlalchemy.orm.Session)  # mypy
+        assert isinstance(session2, sqlalchemy.orm.Session)  # mypy
+        self.assertIsNot(session1, session2)
+        self.assertIs(dbSession1._sessions["unscoped"], session1)
+        self.assertIs(dbSession1._get_initialized_session("unscoped"), session1)
+        self.assertIs(session1.info["request"], request1)
+        self.assertIs(session2.info["request"], request2)
+        # the wrapper's session is not replaced
+        self.assertIs(wrapped.sa_session, shared)
+
+        session1.execute(sqlalchemy.text("SELECT 1"))
+        session2.execute(sqlalchemy.text("SELECT 1"))
+        pyramid_sqlassist.request_cleanup(request1, dbSession1)
+        self.assertFalse(session1.in_transaction())
+        self.assertTrue(session2.in_transaction())
+        pyramid_sqlassist.request_cleanup(request2, dbSession2)
+        self.assertFalse(session2.in_transaction())
+
+    def test_threads(self):
+        results = {}
+        barrier = threading.Barrier(4)
+
+        def _request(idx):
+            request = testing.DummyRequest()
+            dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+            _session = dbSession._get_initialized_session("unscoped")
+            barrier.wait()
+            results[idx] = (_session, _session.info["request"] is request)
+            pyramid_sqlassist.request_cleanup(request, dbSession)
+
+        threads = [threading.Thread(target=_request, args=(i,)) for i in range(4)]
+        for _thread in threads:
+            _thread.start()
+        for _thread in threads:
+            _thread.join()
+        self.assertEqual(len({id(r[0]) for r in results.values()}), 4)
+        self.assertTrue(all(r[1] for r in results.values()))
+
+
+class TestRequestScopefunc(unittest.TestCase):
+    def setUp(self):
+        self.config = testing.setUp()
+        self.engine = sqlalchemy.create_engine("sqlite://")
+
+    def tearDown(self):
+        pyramid_sqlassist.interface._ENGINE_REGISTRY["engines"].pop("ctx", None)
+        testing.tearDown()
+
+    def _run_tasks(self, count=20, check_isolation=True):
+        wrapped = pyramid_sqlassist.get_wrapped_engine("ctx")
+
+        async def _handle():
+            request = testing.DummyRequest()
+            dbSession = pyramid_sqlassist.DbSessionsContainer(request)
+            dbSession._get_initialized_session("ctx")
+            _session = wrapped.sa_session_scoped()
+            # let the other "requests" start on this thread
+            await asyncio.sleep(0)
+            if check_isolation:
+                self.assertIs(wrapped.sa_session_scoped(), _session)
+            _request = _session.info["request"]
+            pyramid_sqlassist.request_cleanup(request, dbSession)
+            return (_session, _request is request)
+
+        async def _run():
+            return await asyncio.gather(*[_handle() for i in range(count)])
+
+        return asyncio.run(_run())
+
+    def test_request_scope(self):
+        pyramid_sqlassist.initialize_engine(
+            "ctx", self.engine, scopefunc=pyramid_sqlassist.request_scopefunc
+        )
+        results = self._run_tasks()
+        self.assertEqual(len({id(r[0]) for r in results}), 20)
+        self.assertTrue(all(r[1] for r in results))
+        # every request's Session was removed
+        wrapped = pyramid_sqlassist.get_wrapped_engine("ctx")
+        self.assertEqual(wrapped.sa_session_scoped.registry.registry, {})  # type: ignore[attr-defined]
+        self.assertIsNone(pyramid_sqlassist.interface._REQUEST_CONTEXT.get())
+
+    def test_thread_scope(self):
+        # the default registry shares a Session between tasks on one thread
+        pyramid_sqlassist.initialize_engine("ctx", self.engine)
+        results = self._run_tasks(count=5, check_isolation=False)
+        self.assertEqual(len({id(r[0]) for r in results}), 1)
+
+    def test_outside_request(self):
+        self.assertEqual(
+            pyramid_sqlassist.request_scopefunc(), ("thread", threading.get_ident())
+        )
+
+    def test_requires_scoped(self):
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.initialize_engine(
+                "ctx",
+                self.engine,
+                is_scoped=False,
+                scopefunc=pyramid_sqlassist.request_scopefunc,
+            )
+
+
+class TestIdentityCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        model_objects.DeclaredTable.metadata.create_all(self.engine)
+        self.sessionmaker = sqlalchemy.orm.sessionmaker(bind=self.engine)
+        with self.sessionmaker() as _session:
+            model.insert_initial_records(_session)
+            _session.commit()
+        self.statements = []
+        sqlalchemy.event.listen(
+            self.engine, "before_cursor_execute", self._before_cursor_execute
+        )
+        self.cache = pyramid_sqlassist.IdentityCache(max_entries=3, ttl=60.0)
+        self._patcher = mock.patch.object(
+            model_objects.FooObject, "__sqlassist_identity_cache__", self.cache
+        )
+        self._patcher.start()
+
+    def tearDown(self):
+        self._patcher.stop()
+        self.engine.dispose()
+
+    def _before_cursor_execute(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_hit(self):
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, 1)
+            assert foo is not None  # mypy
+            self.assertEqual(foo.id_alt, 11)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(len(self.cache), 1)
+
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, 1)
+            assert foo is not None  # mypy
+            self.assertEqual(foo.id, 1)
+            self.assertEqual(foo.id_alt, 11)
+            self.assertIs(foo._sqlalchemy_session, _session)
+            self.assertIn(foo, _session)
+        # no SQL was emitted for the hit
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_bypass(self):
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1, use_cache=False)
+        with self.sessionmaker() as _session:
+            # not the primary key
+            model_objects.FooObject.get__by__id(_session, 11, id_column="id_alt")
+        self.assertEqual(len(self.statements), 3)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_missing(self):
+        with self.sessionmaker() as _session:
+            self.assertIsNone(model_objects.FooObject.get__by__id(_session, 999))
+            self.assertIsNone(model_objects.FooObject.get__by__id(_session, 999))
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        with self.sessionmaker() as _session:
+            for _id in (1, 2, 3):
+                model_objects.FooObject.get__by__id(_session, _id)
+            # `1` is now the most recently used
+            model_objects.FooObject.get__by__id(_session, 1)
+            model_objects.FooObject.get__by__id(_session, 4)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual([key[1] for key in self.cache._entries], [3, 1, 4])
+
+    def test_ttl(self):
+        with mock.patch("pyramid_sqlassist.cache.time.monotonic", return_value=100.0):
+            with self.sessionmaker() as _session:
+                model_objects.FooObject.get__by__id(_session, 1)
+        with mock.patch("pyramid_sqlassist.cache.time.monotonic", return_value=161.0):
+            with self.sessionmaker() as _session:
+                model_objects.FooObject.get__by__id(_session, 1)
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_invalidated_on_commit(self):
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+            model_objects.FooObject.get__by__id(_session, 2)
+        self.assertEqual(len(self.cache), 2)
+
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, 1)
+            assert foo is not None  # mypy
+            foo.status = "changed"
+            _session.flush()
+            # flushed, but not committed
+            self.assertEqual(len(self.cache), 2)
+            # nothing is cached from a Session with uncommitted changes
+            self.cache.clear()
+            model_objects.FooObject.get__by__id(_session, 3)
+            self.assertEqual(len(self.cache), 0)
+            model_objects.FooObject.get__by__id(_session, 2)
+            _session.commit()
+        self.assertEqual(len(self.cache), 0)
+
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, 1)
+            assert foo is not None  # mypy
+            self.assertEqual(foo.status, "changed")
+        self.assertEqual(len(self.cache), 1)
+
+    def test_identity_map_first(self):
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+        self.assertEqual(len(self.cache), 1)
+        with self.sessionmaker() as _session:
+            foo = _session.get(model_objects.FooObject, 1)
+            assert foo is not None  # mypy
+            foo.status = "changed"
+            # not flushed
+            foo2 = model_objects.FooObject.get__by__id(_session, 1)
+            self.assertIs(foo2, foo)
+            self.assertEqual(foo.status, "changed")
+            self.assertIn(foo, _session.dirty)
+        # the cache was not consulted
+        self.assertEqual(self.cache.stats()["hits"], 0)
+        self.assertEqual(len(self.statements), 2)
+
+    def test_commit_invalidates_cached_entries(self):
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+        with self.sessionmaker() as _session:
+            foo = _session.get(model_objects.FooObject, 1)
+            assert foo is not None  # mypy
+            foo.status = "changed"
+            _session.commit()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_rollback(self):
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+            foo = _session.get(model_objects.FooObject, 2)
+            assert foo is not None  # mypy
+            foo.status = "changed"
+            _session.flush()
+            _session.rollback()
+            # the rollback discarded the flushed changes; caching is allowed
+            model_objects.FooObject.get__by__id(_session, 2)
+            self.assertEqual(len(self.cache), 2)
+            _session.commit()
+        self.assertEqual(len(self.cache), 2)
+
+    def test_identity_map_str_id(self):
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+        self.assertEqual(len(self.cache), 1)
+        with self.sessionmaker() as _session:
+            foo = _session.get(model_objects.FooObject, 1)
+            assert foo is not None  # mypy
+            foo.status = "changed"
+            foo2 = model_objects.FooObject.get__by__id(_session, "1")
+            self.assertIs(foo2, foo)
+            self.assertEqual(foo.status, "changed")
+            self.assertIn(foo, _session.dirty)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+        # a str id shares the cache entry of the int id
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, "1")
+            assert foo is not None  # mypy
+            self.assertEqual(foo.id, 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_savepoint_rollback(self):
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+        self.assertEqual(len(self.cache), 1)
+        with self.sessionmaker() as _session:
+            foo = _session.get(model_objects.FooObject, 2)
+            assert foo is not None  # mypy
+            foo.status = "changed"
+            _session.flush()
+            _session.begin_nested().rollback()
+            _session.commit()
+        # the changes flushed before the savepoint were committed
+        self.assertEqual(len(self.cache), 0)
+
+    def test_modified_not_cached(self):
+        with self.sessionmaker() as _session:
+            foo = _session.get(model_objects.FooObject, 1)
+            assert foo is not None  # mypy
+            foo.status = "changed"
+            model_objects.FooObject.get__by__id(_session, 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            pyramid_sqlassist.IdentityCache(max_entries=0)
+
+
+class _TestObjectQueriesHarness(object):
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        model_objects.DeclaredTable.metadata.create_all(self.engine)
+        self.sessionmaker = sqlalchemy.orm.sessionmaker(bind=self.engine)
+        with self.sessionmaker() as _session:
+            model.insert_initial_records(_session)
+            _session.commit()
+        self.executed = []
+        sqlalchemy.event.listen(
+            self.engine, "before_cursor_execute", self._before_cursor_execute
+        )
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, *args):
+        self.executed.append((statement, parameters))
+
+
+class TestGetById(_TestObjectQueriesHarness, unittest.TestCase):
+    def test_identity_map(self):
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, 1)
+            assert foo is not None  # mypy
+            self.assertEqual(len(self.executed), 1)
+            self.assertIs(model_objects.FooObject.get__by__id(_session, 1), foo)
+            self.assertEqual(len(self.executed), 1)
+            self.assertIsNone(model_objects.FooObject.get__by__id(_session, 999))
+            self.assertEqual(len(self.executed), 2)
+
+    def test_id_column(self):
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, 12, id_column="id_alt")
+            assert foo is not None  # mypy
+            self.assertEqual(foo.id, 2)
+            foo2 = model_objects.FooObject.get__by__id(_session, 13, id_column="id_alt")
+            assert foo2 is not None  # mypy
+            self.assertEqual(foo2.id, 3)
+            self.assertIsNone(
+                model_objects.FooObject.get__by__id(_session, 999, id_column="id_alt")
+            )
+        # the statement is built once, and reused with a bound parameter
+        self.assertEqual(len({stmt for (stmt, params) in self.executed}), 1)
+        plans = model_objects.FooObject.__dict__["__sqlassist_plans__"]
+        self.assertIn(("get__by__id", "id_alt"), plans)
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__id(_session, 1)
+        # the primary key uses `Session.get()`
+        self.assertIsNone(plans[("get__by__id", "id")][0])
+
+
+class TestGetByIds(_TestObjectQueriesHarness, unittest.TestCase):
+    def test_order(self):
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.get__by__ids(_session, [3, 1, 3, 999, 2])
+            self.assertEqual([foo.id for foo in foos], [3, 1, 2])
+            foos = model_objects.FooObject.get__by__ids(_session, [])
+            self.assertEqual(foos, [])
+
+    def test_string_ids(self):
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.get__by__ids(_session, ["1", "2", 3, "3"])
+            self.assertEqual([foo.id for foo in foos], [1, 2, 3])
+            # now served from the identity map
+            foos_dict = model_objects.FooObject.get__by__ids(
+                _session, ("2", "1"), as_dict=True
+            )
+            self.assertEqual(list(foos_dict.keys()), ["2", "1"])
+            self.assertEqual(foos_dict["2"].id, 2)
+            foos = model_objects.FooObject.get__by__ids(
+                _session, ("13", "x"), id_column="id_alt"
+            )
+            self.assertEqual([foo.id for foo in foos], [3])
+        self.assertEqual(len(self.executed), 2)
+
+    def test_as_dict(self):
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.get__by__ids(
+                _session, (14, 12, 999), id_column="id_alt", as_dict=True
+            )
+            self.assertEqual(list(foos.keys()), [14, 12])
+            self.assertEqual(foos[14].id, 4)
+
+    def test_identity_map(self):
+        with self.sessionmaker() as _session:
+            foo1 = _session.get(model_objects.FooObject, 1)
+            foo2 = _session.get(model_objects.FooObject, 2)
+            self.assertEqual(len(self.executed), 2)
+            foos = model_objects.FooObject.get__by__ids(_session, [2, 1])
+            self.assertEqual(foos, [foo2, foo1])
+            self.assertEqual(len(self.executed), 2)
+            # only the ids which are not loaded are queried
+            foos = model_objects.FooObject.get__by__ids(_session, [1, 3, 2])
+            self.assertEqual([foo.id for foo in foos], [1, 3, 2])
+            self.assertEqual(len(self.executed), 3)
+            self.assertEqual(self.executed[-1][1], (3,))
+            # expired objects are reloaded
+            _session.expire(foo1)
+            foos = model_objects.FooObject.get__by__ids(_session, [1])
+            self.assertEqual(foos, [foo1])
+            self.assertEqual(len(self.executed), 4)
+
+    def test_chunks(self):
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.get__by__ids(
+                _session, [4, 3, 2, 1], chunk_size=2
+            )
+            self.assertEqual([foo.id for foo in foos], [4, 3, 2, 1])
+        self.assertEqual([p for (s, p) in self.executed], [(4, 3), (2, 1)])
+
+    def test_padding(self):
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.get__by__ids(_session, [1, 2, 3])
+            self.assertEqual([foo.id for foo in foos], [1, 2, 3])
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.get__by__ids(_session, [4, 3, 2, 1])
+            self.assertEqual(len(foos), 4)
+        with self.sessionmaker() as _session:
+            model_objects.FooObject.get__by__ids(_session, [1, 2, 3], chunk_size=3)
+        # 3 ids are padded to 4, so both statements are the same
+        self.assertEqual(self.executed[0][1], (1, 2, 3, 3))
+        self.assertEqual(self.executed[0][0], self.executed[1][0])
+        # but not past `chunk_size`
+        self.assertEqual(self.executed[2][1], (1, 2, 3))
+
+    def test_iter(self):
+        consumed = []
+
+        def _ids():
+            for _id in (1, 2, 3, 4):
+                consumed.append(_id)
+                yield _id
+
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.iter__by__ids(_session, _ids(), chunk_size=2)
+            foo = next(foos)
+            self.assertEqual(foo.id, 1)
+            self.assertEqual(consumed, [1, 2])
+            self.assertEqual(len(self.executed), 1)
+            self.assertEqual([foo.id for foo in foos], [2, 3, 4])
+            self.assertEqual(len(self.executed), 2)
+
+    def test_invalid(self):
+        with self.sessionmaker() as _session:
+            with self.assertRaises(ValueError):
+                model_objects.FooObject.get__by__ids(_session, [1], chunk_size=0)
+
+
+class TestObjectPlans(_TestObjectQueriesHarness, unittest.TestCase):
+    def test_plans(self):
+        FooObject = model_objects.FooObject
+        with self.sessionmaker() as _session:
+            for _seed in ("aaaaa", "bbbbb"):
+                FooObject.get__by__column__lower(
+                    _session, "status", _seed, allow_many=True
+                )
+                FooObject.get__by__column__similar(_session, "status", _seed[:2])
+                FooObject.get__by__column__exact_then_ilike(_session, "status", _seed)
+                FooObject.get__range(
+                    _session, order_col="status", order_case_sensitive=False
+                )
+        plans = FooObject.__dict__["__sqlassist_plans__"]
+        for key in (
+            ("get__by__column__lower", "status"),
+            ("get__by__column__similar", "status", "prefix", False),
+            ("get__by__column__exact_then_ilike", "status"),
+            ("get__range", "status", "asc", False),
+        ):
+            self.assertIn(key, plans)
+        # each plan renders the same statement for different values;
+        # `get__by__column__exact_then_ilike` has two statements
+        statements = [stmt for (stmt, params) in self.executed]
+        self.assertEqual(len(statements), 9)
+        self.assertEqual(len(set(statements)), 5)
+
+    def test_plans_bounded(self):
+        FooObject = model_objects.FooObject
+        with self.sessionmaker() as _session:
+            for order_col in ("id,status", "id,id,status", "id,status,id,status"):
+                foos = FooObject.get__range(_session, order_col=order_col)
+                self.assertEqual([foo.id for foo in foos], [1, 2, 3, 4])
+            plans = FooObject.__dict__["__sqlassist_plans__"]
+            self.assertIn(("get__range", "id,status", "asc", True), plans)
+            for order_col in ("id,id,status", "id,status,id,status"):
+                self.assertNotIn(("get__range", order_col, "asc", True), plans)
+            # past `PLANS_MAX`, plans are built but not cached
+            with mock.patch("pyramid_sqlassist.objects.PLANS_MAX", len(plans)):
+                foos = FooObject.get__range(_session, order_col="status")
+                self.assertEqual([foo.id for foo in foos], [1, 3, 2, 4])
+                self.assertNotIn(("get__range", "status", "asc", True), plans)
+
+    def test_exact_then_ilike_single_query(self):
+        FooObject = model_objects.FooObject
+        with self.sessionmaker() as _session:
+            foo = FooObject.get__by__column__exact_then_ilike(
+                _session, "status", "bbbbb"
+            )
+            self.assertEqual(len(self.executed), 2)
+            for single_query in ("ilike", "lower"):
+                foo_single = FooObject.get__by__column__exact_then_ilike(
+                    _session, "status", "bbbbb", single_query=single_query
+                )
+                self.assertIs(foo_single, foo)
+                self.assertIn("CASE WHEN", self.executed[-1][0])
+            self.assertEqual(len(self.executed), 4)
+
+    def test_range(self):
+        FooObject = model_objects.FooObject
+        with self.sessionmaker() as _session:
+            foos = FooObject.get__range(
+                _session,
+                sort_direction="desc",
+                filters=[FooObject.status_id > 1],
+                limit=2,
+            )
+            self.assertEqual([foo.id for foo in foos], [4, 3])
+            foos = FooObject.get__range(_session, sort_direction="desc", offset=3)
+            self.assertEqual([foo.id for foo in foos], [1])
+            with self.assertRaises(ValueError):
+                FooObject.get__range(_session, sort_direction="up")
+        plans = FooObject.__dict__["__sqlassist_plans__"]
+        self.assertNotIn(("get__range", "id", "up", True), plans)
+
+    def test_unknown_column(self):
+        with self.sessionmaker() as _session:
+            with self.assertRaises(AttributeError):
+                model_objects.FooObject.get__by__column__lower(_session, "missing", "a")
+        plans = model_objects.FooObject.__dict__["__sqlassist_plans__"]
+        self.assertNotIn(("get__by__column__lower", "missing"), plans)
+
+
+class TestColumnsAsBulk(_TestObjectQueriesHarness, unittest.TestCase):
+    def test_shapes(self):
+        FooObject = model_objects.FooObject
+        with self.sessionmaker() as _session:
+            foos = FooObject.get__by__ids(_session, [1, 2])
+            names = FooObject.columns_as_bulk_names()
+            self.assertEqual(names[:2], ("id", "id_alt"))
+            self.assertEqual(
+                FooObject.columns_as_bulk(foos),
+                [foo.columns_as_dict() for foo in foos],
+            )
+            as_tuples = FooObject.columns_as_bulk(foos, shape="tuples")
+            self.assertEqual(
+                as_tuples, [tuple(foo.columns_as_dict().values()) for foo in foos]
+            )
+            as_columns = FooObject.columns_as_bulk(foos, shape="columns")
+            self.assertEqual(list(as_columns.keys()), list(names))
+            self.assertEqual(as_columns["id"], [1, 2])
+            self.assertEqual(as_columns["status"], ["AAAAA", "aaaaa"])
+            # generators are accepted
+            self.assertEqual(
+                FooObject.columns_as_bulk((foo for foo in foos), shape="tuples"),
+                as_tuples,
+            )
+            self.assertEqual(
+                FooObject.columns_as_bulk([], shape="columns"),
+                {name: [] for name in names},
+            )
+            with self.assertRaises(ValueError):
+                FooObject.columns_as_bulk(foos, shape="rows")  # type: ignore[call-overload]
+
+    def test_loads_expired(self):
+        with self.sessionmaker() as _session:
+            foo = model_objects.FooObject.get__by__id(_session, 1)
+            assert foo is not None  # mypy
+            _session.expire(foo)
+            self.assertEqual(foo.loaded_columns_as_dict(), {})
+            (as_dict,) = model_objects.FooObject.columns_as_bulk([foo])
+            self.assertEqual(as_dict["id_alt"], 11)
+
+
+class _TestObjectRangeHarness(_TestObjectQueriesHarness):
+    def setUp(self):
+        _TestObjectQueriesHarness.setUp(self)
+        with self.sessionmaker() as _session:
+            _utcnow = datetime.datetime.utcnow()
+            for _id in range(5, 26):
+                _session.add(
+                    model_objects.FooObject(id=_id, id_alt=_id + 10, timestamp=_utcnow)
+                )
+            _session.commit()
+        del self.executed[:]
+
+
+class TestIterRange(_TestObjectRangeHarness, unittest.TestCase):
+    def test_iter(self):
+        with self.sessionmaker() as _session:
+            ids = [
+                foo.id
+                for foo in model_objects.FooObject.iter__range(
+                    _session, batch_size=4, sort_direction="desc"
+                )
+            ]
+            self.assertEqual(ids, list(range(25, 0, -1)))
+            self.assertEqual(len(self.executed), 1)
+            self.assertEqual(
+                [
+                    foo.id
+                    for foo in model_objects.FooObject.iter__range(
+                        _session,
+                        batch_size=2,
+                        offset=2,
+                        limit=5,
+                        filters=[model_objects.FooObject.id > 10],
+                    )
+                ],
+                [13, 14, 15, 16, 17],
+            )
+
+    def test_expunge(self):
+        with self.sessionmaker() as _session:
+            sizes = []
+            foos = []
+            for foo in model_objects.FooObject.iter__range(
+                _session, batch_size=4, expunge=True
+            ):
+                foos.append(foo)
+                sizes.append(len(_session.identity_map))
+            self.assertEqual(len(foos), 25)
+            self.assertLessEqual(max(sizes), 4)
+            self.assertEqual(len(_session.identity_map), 0)
+            # the detached objects keep their loaded columns
+            self.assertEqual(foos[-1].id_alt, 35)
+            self.assertNotIn(foos[-1], _session)
+
+    def test_close(self):
+        with self.sessionmaker() as _session:
+            foos = model_objects.FooObject.iter__range(_session, batch_size=4)
+            self.assertEqual(next(foos).id, 1)
+            foos.close()
+            # the Session is usable after the generator is closed early
+            self.assertEqual(len(model_objects.FooObject.get__range(_session)), 25)
+            with self.assertRaises(ValueError):
+                next(model_objects.FooObject.iter__range(_session, batch_size=0))
+
+
+class TestGetRangeKeyset(_TestObjectRangeHarness, unittest.TestCase):
+    def _pages(self, _session, **kwargs):
+        pages = []
+        cursor = None
+        while True:
+            (foos, cursor) = model_objects.FooObject.get__range__keyset(
+                _session, cursor=cursor, **kwargs
+            )
+            pages.append([foo.id for foo in foos])
+            if cursor is None:
+                return pages
+
+    def test_pages(self):
+        with self.sessionmaker() as _session:
+            pages = self._pages(_session, limit=10)
+            self.assertEqual(
+                pages, [list(range(1, 11)), list(range(11, 21)), list(range(21, 26))]
+            )
+            pages = self._pages(
+                _session,
+                limit=4,
+                sort_direction="desc",
+                filters=[model_objects.FooObject.id <= 10],
+            )
+            self.assertEqual(pages, [[10, 9, 8, 7], [6, 5, 4, 3], [2, 1]])
+            # an exact last page has no next cursor
+            self.assertEqual(self._pages(_session, limit=25), [list(range(1, 26))])
+        # the cursor is applied as a row value comparison
+        self.assertIn("(foo_object.id) > (?)", self.executed[1][0])
+
+    def test_multiple_columns(self):
+        with self.sessionmaker() as _session:
+            # ties on `timestamp` and `status` are broken by the primary key;
+            # `timestamp` is a `datetime` in the cursor
+            pages = self._pages(
+                _session,
+                limit=3,
+                order_col="timestamp,status_alt",
+                order_case_sensitive=False,
+                filters=[model_objects.FooObject.id <= 4],
+            )
+            # "aaaaa", "AAAAA", "cDDDD", "Dbbbb"
+            self.assertEqual(pages, [[1, 2, 4], [3]])
+
+    def test_cursor(self):
+        with self.sessionmaker() as _session:
+            (foos, cursor) = model_objects.FooObject.get__range__keyset(
+                _session, limit=2
+            )
+            assert cursor is not None  # mypy
+            self.assertRegex(cursor, r"^[\w\-=]+$")
+            with self.assertRaises(ValueError):
+                model_objects.FooObject.get__range__keyset(
+                    _session, limit=2, cursor=cursor, order_col="status"
+                )
+            with self.assertRaises(ValueError):
+                model_objects.FooObject.get__range__keyset(
+                    _session, limit=2, cursor="garbage"
+                )
+
+
+class TestSimilarPrefixRange(_TestObjectQueriesHarness, unittest.TestCase):
+    def setUp(self):
+        _TestObjectQueriesHarness.setUp(self)
+        with self.sessionmaker() as _session:
+            _utcnow = datetime.datetime.utcnow()
+            for _id, status in enumerate(
+                ("ab%c", "ab_c", "abxc", "abz", "ac", "ab\U0010ffff", "AB"), 5
+            ):
+                _session.add(
+                    model_objects.FooObject(
+                        id=_id, id_alt=_id + 10, timestamp=_utcnow, status=status
+                    )
+                )
+            _session.commit()
+            _session.execute(
+                sqlalchemy.text(
+                    "CREATE INDEX ix_foo_object_status_lower ON foo_object (lower(status))"
+                )
+            )
+            _session.commit()
+        del self.executed[:]
+
+    def _similar(self, _session, seed, **kwargs):
+        return sorted(
+            foo.status
+            for foo in model_objects.FooObject.get__by__column__similar(
+                _session, "status", seed, **kwargs
+            )
+        )
+
+    def test_range(self):
+        with self.sessionmaker() as _session:
+            for seed in ("ab", "AB%", "ab_", "a", "ab\U0010ffff", ""):
+                self.assertEqual(
+                    self._similar(_session, seed, prefix_range=True),
+                    sorted(
+                        foo.status
+                        for foo in model_objects.FooObject.get__range(_session)
+                        if (foo.status is not None)
+                        and foo.status.lower().startswith(seed.lower())
+                    ),
+                )
+            self.assertEqual(
+                self._similar(_session, "AB%", prefix_range=True), ["ab%c"]
+            )
+
+    def test_autoescape(self):
+        with self.sessionmaker() as _session:
+            self.assertEqual(
+                self._similar(_session, "ab%"),
+                ["AB", "ab%c", "ab_c", "abxc", "abz", "ab\U0010ffff"],
+            )
+            self.assertEqual(self._similar(_session, "ab%", autoescape=True), ["ab%c"])
+            self.assertEqual(
+                self._similar(_session, "b_", prefix_only=False),
+                ["BBBBB", "ab%c", "ab_c", "abxc", "abz", "ab\U0010ffff"],
+            )
+            self.assertEqual(
+                self._similar(_session, "b_", prefix_only=False, autoescape=True),
+                ["ab_c"],
+            )
+
+    def test_upper_bound(self):
+        _prefix_upper_bound = pyramid_sqlassist.objects._prefix_upper_bound
+        self.assertEqual(_prefix_upper_bound("ab"), "ac")
+        self.assertEqual(_prefix_upper_bound("a\U0010ffff"), "b")
+        self.assertEqual(_prefix_upper_bound("a\ud7ff"), "a\ue000")
+        self.assertIsNone(_prefix_upper_bound("\U0010ffff"))
+        self.assertIsNone(_prefix_upper_bound(""))
+
+    def test_query_plan(self):
+        def _plan(**kwargs):
+            with self.sessionmaker() as _session:
+                del self.executed[:]
+                self._similar(_session, "ab", **kwargs)
+                ((statement, parameters),) = self.executed
+                rows = _session.connection().exec_driver_sql(
+                    "EXPLAIN QUERY PLAN " + statement, parameters
+                )
+                return " ".join(row[-1] for row in rows)
+
+        # the range uses the index on `lower(status)`; `LIKE` can not
+        self.assertIn(
+            "USING INDEX ix_foo_object_status_lower", _plan(prefix_range=True)
+        )
+        self.assertNotIn("ix_foo_object_status_lower", _plan())
+
+
+class TestBulkUpsert(_TestObjectQueriesHarness, unittest.TestCase):
+    def _rows(self, ids, status, consumed=None):
+        _utcnow = datetime.datetime.utcnow()
+        for _id in ids:
+            if consumed is not None:
+                consumed.append(_id)
+            yield {
+                "id": _id,
+                "id_alt": _id + 10,
+                "timestamp": _utcnow,
+                "status": status,
+            }
+
+    def _statuses(self):
+        with self.sessionmaker() as _session:
+            return {
+                foo.id: foo.status
+                for foo in model_objects.FooObject.get__range(_session)
+            }
+
+    def test_upsert(self):
+        consumed: List[int] = []
+        with self.sessionmaker() as _session:
+            rows = self._rows(range(3, 9), "upserted", consumed)
+            self.assertIsNone(
+                model_objects.FooObject.bulk_upsert(_session, rows, batch_size=4)
+            )
+            # the rows are read one batch at a time
+            self.assertEqual(consumed, [3, 4, 5, 6, 7, 8])
+            _session.commit()
+        self.assertEqual(len(self.executed), 2)
+        self.assertIn("ON CONFLICT (id) DO UPDATE", self.executed[0][0])
+        self.assertEqual(
+            self._statuses(),
+            {
+                1: "AAAAA",
+                2: "aaaaa",
+                3: "upserted",
+                4: "upserted",
+                5: "upserted",
+                6: "upserted",
+                7: "upserted",
+                8: "upserted",
+            },
+        )
+
+    def test_returning(self):
+        with self.sessionmaker() as _session:
+            pkeys = model_objects.FooObject.bulk_upsert(
+                _session, self._rows([1, 9], "returned"), returning=True
+            )
+            assert pkeys is not None  # mypy
+            self.assertEqual(sorted(pkeys), [(1,), (9,)])
+            # conflicting rows are skipped
+            pkeys = model_objects.FooObject.bulk_upsert(
+                _session,
+                self._rows([2, 10], "skipped"),
+                update_columns=(),
+                returning=True,
+            )
+            self.assertEqual(pkeys, [(10,)])
+            # only the listed columns are updated
+            model_objects.FooObject.bulk_upsert(
+                _session,
+                [{"id": 3, "id_alt": 99, "timestamp": datetime.datetime.utcnow()}],
+                update_columns=["id_alt"],
+            )
+            self.assertEqual(
+                model_objects.FooObject.bulk_upsert(_session, [], returning=True), []
+            )
+            _session.commit()
+        statuses = self._statuses()
+        self.assertEqual(statuses[1], "returned")
+        self.assertEqual(statuses[2], "aaaaa")
+        self.assertEqual(statuses[3], "BBBBB")
+        self.assertEqual(statuses[10], "skipped")
+
+    def test_duplicates(self):
+        rows = [
+            row
+            for (ids, status) in (([3, 11], "first"), ([3, 11], "last"), ([12], "only"))
+            for row in self._rows(ids, status)
+        ]
+        with self.sessionmaker() as _session:
+            pkeys = model_objects.FooObject.bulk_upsert(
+                _session, rows, batch_size=4, returning=True
+            )
+            assert pkeys is not None  # mypy
+            self.assertEqual(sorted(pkeys), [(3,), (11,), (12,)])
+            _session.commit()
+        # the first batch was reduced to one row per `id`
+        self.assertEqual(len(self.executed), 2)
+        self.assertEqual(len(self.executed[0][1]), 2 * 4)
+        statuses = self._statuses()
+        self.assertEqual(statuses[3], "last")
+        self.assertEqual(statuses[11], "last")
+        self.assertEqual(statuses[12], "only")
+
+    def test_invalid(self):
+        with self.sessionmaker() as _session:
+            with self.assertRaises(ValueError):
+                model_objects.FooObject.bulk_upsert(
+                    _session, [{"id": 11}, {"id": 12, "id_alt": 22}]
+                )
+            with self.assertRaises(ValueError):
+                model_objects.FooObject.bulk_upsert(_session, [], batch_size=0)
+            with mock.patch.object(self.engine.dialect, "name", "mysql"):
+                with self.assertRaises(ValueError):
+                    model_objects.FooObject.bulk_upsert(_session, [{"id": 11}])
+
+    def test_identity_cache(self):
+        cache = pyramid_sqlassist.IdentityCache()
+        with mock.patch.object(
+            model_objects.FooObject, "__sqlassist_identity_cache__", cache
+        ):
+            with self.sessionmaker() as _session:
+                model_objects.FooObject.get__by__id(_session, 1)
+            self.assertEqual(len(cache), 1)
+            with self.sessionmaker() as _session:
+                model_objects.FooObject.bulk_upsert(_session, self._rows([1], "new"))
+                _session.commit()
+            self.assertEqual(len(cache), 0)
+            with self.sessionmaker() as _session:
+                foo = model_objects.FooObject.get__by__id(_session, 1)
+                assert foo is not None  # mypy
+                self.assertEqual(foo.status, "new")
+
+
+class TestJoinedEagerCollection(_TestObjectQueriesHarness, unittest.TestCase):
+    def setUp(self):
+        _TestObjectQueriesHarness.setUp(self)
+        with self.sessionmaker() as _session:
+            for _id, status in ((1, "AAAAA"), (2, "aaaaa"), (3, "BBBBB"), (4, "ccccc")):
+                _session.add(
+                    model_objects.EagerObject(id=_id, id_alt=_id + 10, status=status)
+                )
+            for _id, eager_object_id in ((1, 1), (2, 1), (3, 2)):
+                _session.add(
+                    model_objects.EagerChild(id=_id, eager_object_id=eager_object_id)
+                )
+            _session.commit()
+        self.executed = []
+
+    def test_classmethods(self):
+        EagerObject = model_objects.EagerObject
+        with self.sessionmaker() as _session:
+            items = EagerObject.get__range(_session)
+            self.assertEqual([item.id for item in items], [1, 2, 3, 4])
+            self.assertEqual([child.id for child in items[0].children], [1, 2])
+            items = EagerObject.get__by__ids(_session, [2, 1])
+            self.assertEqual([item.id for item in items], [2, 1])
+        with self.sessionmaker() as _session:
+            items = EagerObject.get__by__ids(_session, [2, 1])
+            self.assertEqual([item.id for item in items], [2, 1])
+            item = EagerObject.get__by__id(_session, 11, id_column="id_alt")
+            assert item is not None  # mypy
+            self.assertEqual(len(item.children), 2)
+            items_lower = EagerObject.get__by__column__lower(
+                _session, "status", "aaaaa", allow_many=True
+            )
+            assert isinstance(items_lower, list)  # mypy
+            self.assertEqual(sorted(item.id for item in items_lower), [1, 2])
+            items = EagerObject.get__by__column__similar(_session, "status", "a")
+            self.assertEqual(sorted(item.id for item in items), [1, 2])
+            item = EagerObject.get__by__column__exact_then_ilike(
+                _session, "status", "aaaaa"
+            )
+            assert item is not None  # mypy
+            self.assertEqual(item.id, 2)
+            for single_query in ("ilike", "lower"):
+                item = EagerObject.get__by__column__exact_then_ilike(
+                    _session, "status", "AAAAA", single_query=single_query
+                )
+                assert item is not None  # mypy
+                self.assertEqual(item.id, 1)
+                self.assertEqual(len(item.children), 2)
+
+    def test_iter_range(self):
+        with self.sessionmaker() as _session:
+            items = list(model_objects.EagerObject.iter__range(_session, batch_size=2))
+            self.assertEqual([item.id for item in items], [1, 2, 3, 4])
+            self.assertEqual([child.id for child in items[0].children], [1, 2])
+        # one query for the rows; `children` is loaded per batch
+        self.assertEqual(len(self.executed), 3)
+
+    def test_keyset(self):
+        EagerObject = model_objects.EagerObject
+        with self.sessionmaker() as _session:
+            (items, cursor) = EagerObject.get__range__keyset(_session, 2)
+            self.assertEqual([item.id for item in items], [1, 2])
+            self.assertEqual([child.id for child in items[0].children], [1, 2])
+            (items, cursor) = EagerObject.get__range__keyset(_session, 2, cursor=cursor)
+            self.assertEqual([item.id for item in items], [3, 4])
+            self.assertIsNone(cursor)
+
+
+class TestSubqueryEagerRelationships(_TestObjectQueriesHarness, unittest.TestCase):
+    def setUp(self):
+        _TestObjectQueriesHarness.setUp(self)
+        with self.sessionmaker() as _session:
+            for _id, parent_id in ((1, None), (2, 1), (3, 1), (4, 2)):
+                _session.add(model_objects.SubqueryObject(id=_id, parent_id=parent_id))
+            _session.commit()
+        self.executed = []
+
+    def test_iter_range(self):
+        SubqueryObject = model_objects.SubqueryObject
+        with self.sessionmaker() as _session:
+            items = list(SubqueryObject.iter__range(_session, batch_size=2))
+            self.assertEqual([item.id for item in items], [1, 2, 3, 4])
+            executed = len(self.executed)
+            # the relationships were loaded with each batch
+            self.assertEqual([child.id for child in items[0].children], [2, 3])
+            self.assertIsNone(items[0].parent)
+            assert items[3].parent is not None  # mypy
+            self.assertEqual(items[3].parent.id, 2)
+            self.assertEqual(len(self.executed), executed)
+
+
 class TestModelObjectFunctions(_TestPyramidAppHarness, unittest.TestCase):
     def setUp(self):
         _TestPyramidAppHarness.setUp(self)
@@ -555,6 +3011,30 @@ class TestModelObjectFunctions(_TestPyramidAppHarness, unittest.TestCase):
         assert foo3b is not None  # mypy
         self.assertEqual(foo3b.id, 3)
 
+        # a single statement finds the same items
+        for single_query in ("ilike", "lower"):
+            for seed, _id in (("AAAAA", 1), ("aaaaa", 2), ("BBBBB", 3), ("bbbbb", 3)):
+                foo = model_objects.FooObject.get__by__column__exact_then_ilike(
+                    self.request.dbSession.writer,
+                    "status",
+                    seed,
+                    single_query=single_query,
+                )
+                assert foo is not None  # mypy
+                self.assertEqual(foo.id, _id)
+            self.assertIsNone(
+                model_objects.FooObject.get__by__column__exact_then_ilike(
+                    self.request.dbSession.writer,
+                    "status",
+                    "zzzzz",
+                    single_query=single_query,
+                )
+            )
+        with self.assertRaises(ValueError):
+            model_objects.FooObject.get__by__column__exact_then_ilike(
+                self.request.dbSession.writer, "status", "zzzzz", single_query="like"
+            )
+
     def test__get__range(self):
         # get them all
         foos = model_objects.FooObject.get__range(self.request.dbSession.writer)
@@ -790,5 +3270,81 @@ class TestDebugtoolbarPanel(_TestPyramidAppHarness, unittest.TestCase):
             resp2.text,
         )
 
+    def test_panel_engine_group(self):
+        engine_group = pyramid_sqlassist.EngineGroup(
+            {
+                "replica1": sqlalchemy.create_engine("sqlite://"),
+                "replica2": sqlalchemy.create_engine("sqlite://"),
+            }
+        )
+        pyramid_sqlassist.initialize_engine(
+            "reader",
+            engine_group,
+            is_scoped=bool(self.settings.get("sqlassist.is_scoped")),
+        )
+        pyramid_sqlassist.register_request_method(self.config, "dbSession")
+
+        # create a view
+        def empty_view(request):
+            touched = request.dbSession.reader  # noqa
+            return Response(
+                "<html><head></head><body>OK</body></html>", content_type="text/html"
+            )
+
+        self.config.add_view(empty_view)
+
+        # make the app
+        app = self.config.make_wsgi_app()
+        # make a request
+        req1 = Request.blank("/")
+        req1.remote_addr = "127.0.0.1"
+        resp1 = req1.get_response(app)
+        self.assertEqual(resp1.status_code, 200)
+        links = re_toolbar_link.findall(resp1.text)
+        self.assertEqual(len(links), 1)
+
+        req2 = Request.blank(links[0])
+        req2.remote_addr = "127.0.0.1"
+        resp2 = req2.get_response(app)
+        self.assertEqual(resp2.status_code, 200)
+        self.assertIn("<h4>Engine Group Selections</h4>", resp2.text)
+        self.assertIn("<code>replica1</code>", resp2.text)
+        self.assertIn("<b>replica2:</b>", resp2.text)
+        self.assertIn("<code>RoundRobinSelector</code>", resp2.text)
+
+    def test_panel_query_stats(self):
+        pyramid_sqlassist.initialize_engine(
+            "reader",
+            sqlalchemy.create_engine("sqlite://"),
+            is_scoped=bool(self.settings.get("sqlassist.is_scoped")),
+            track_query_stats=True,
+        )
+        pyramid_sqlassist.register_request_method(self.config, "dbSession")
+
+        # create a view
+        def empty_view(request):
+            request.dbSession.reader.execute(sqlalchemy.text("SELECT 1"))
+            return Response(
+                "<html><head></head><body>OK</body></html>", content_type="text/html"
+            )
+
+        self.config.add_view(empty_view)
+
+        # make the app
+        app = self.config.make_wsgi_app()
+        # make a request
+        req1 = Request.blank("/")
+        req1.remote_addr = "127.0.0.1"
+        resp1 = req1.get_response(app)
+        self.assertEqual(resp1.status_code, 200)
+        links = re_toolbar_link.findall(resp1.text)
+        self.assertEqual(len(links), 1)
+
+        req2 = Request.blank(links[0])
+        req2.remote_addr = "127.0.0.1"
+        resp2 = req2.get_response(app)
+        self.assertEqual(resp2.status_code, 200)
+        self.assertIn("<h4>Query Stats</h4>", resp2.text)
+
 
 # = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = = =